@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Alert, AlertNotification, Recommendation
+from .models import Alert, AlertNotification, NotificationJob, Recommendation
 
 @admin.register(Alert)
 class AlertAdmin(admin.ModelAdmin):
@@ -19,4 +19,10 @@ class RecommendationAdmin(admin.ModelAdmin):
 class AlertNotificationAdmin(admin.ModelAdmin):
     list_display = ['alert', 'user', 'sent_via', 'sent_at', 'is_read']
     list_filter = ['sent_via', 'is_read', 'sent_at']
-    search_fields = ['user__username', 'alert__title']
\ No newline at end of file
+    search_fields = ['user__username', 'alert__title']
+
+@admin.register(NotificationJob)
+class NotificationJobAdmin(admin.ModelAdmin):
+    list_display = ['alert', 'status', 'attempts', 'notifications_created', 'created_at', 'finished_at']
+    list_filter = ['status']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
\ No newline at end of file
@@ -0,0 +1,169 @@
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Upper
+from core.geo import (
+    bounding_box, covering_geohashes, haversine_km, point_in_polygon, polygon_bounding_box
+)
+from users.models import UserProfile
+
+# Canal d'envoi -> préférence correspondante du profil
+CHANNEL_PREFERENCES = {
+    'push': 'receive_push',
+    'sms': 'receive_sms',
+}
+
+class AudienceResolver:
+    """
+    Résolution de l'audience d'une alerte
+    
+    Une seule requête sur toutes les villes (égalité exacte, insensible à la
+    casse, servie par l'index UPPER(city) des profils), lue en flux avec
+    .iterator() : seuls les identifiants utilisateurs sont chargés, par lots.
+    Une alerte peut aussi cibler une zone (cercle, polygone) : les profils
+    candidats sont lus par cellules geohash, puis filtrés sur leur position.
+    """
+    
+    def __init__(self):
+        self.chunk_size = int(getattr(settings, 'ALERT_NOTIFICATION_CHUNK_SIZE', 1000))
+    
+    @staticmethod
+    def _city_keys(cities):
+        return {city.strip().upper() for city in cities if isinstance(city, str) and city.strip()}
+    
+    def profiles_for_cities(self, cities, channel=None, profile_types=None):
+        """Profils des villes données, filtrés par canal accepté et type de profil"""
+        profiles = UserProfile.objects.annotate(
+            city_key=Upper('city')
+        ).filter(city_key__in=self._city_keys(cities))
+        
+        if channel:
+            profiles = profiles.filter(**{CHANNEL_PREFERENCES[channel]: True})
+        if profile_types:
+            profiles = profiles.filter(profile_type__in=profile_types)
+        
+        return profiles
+    
+    def iter_user_ids(self, profiles, chunk_size=None):
+        """Parcourir les identifiants utilisateurs d'un queryset de profils, par lots"""
+        chunk_size = chunk_size or self.chunk_size
+        chunk = []
+        
+        user_ids = profiles.order_by().values_list('user_id', flat=True)
+        for user_id in user_ids.iterator(chunk_size=chunk_size):
+            chunk.append(user_id)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        
+        if chunk:
+            yield chunk
+    
+    def iter_alert_audience(self, alert, channel=None, profile_types=None, chunk_size=None):
+        """
+        Identifiants des utilisateurs concernés par une alerte, par lots
+        
+        Les profils des villes de l'alerte, puis ceux dont la position est
+        dans sa zone (cercle et/ou polygone) sans être déjà atteints par leur
+        ville : chaque utilisateur n'apparaît qu'une fois.
+        """
+        profiles = self.profiles_for_cities(alert.affected_cities, channel, profile_types)
+        yield from self.iter_user_ids(profiles, chunk_size)
+        
+        zones = self.alert_zones(alert)
+        if zones:
+            prefixes = set()
+            for box, _ in zones:
+                prefixes.update(covering_geohashes(*box))
+            # Profils déjà atteints par leur ville exclus (sans écarter ceux sans ville)
+            candidates = self._profiles_in_cells(prefixes, channel, profile_types).annotate(
+                city_key=Upper('city')
+            ).filter(Q(city__isnull=True) | ~Q(city_key__in=self._city_keys(alert.affected_cities)))
+            yield from self._iter_matching_user_ids(
+                candidates,
+                lambda user_lat, user_lng: any(matches(user_lat, user_lng) for _, matches in zones),
+                chunk_size
+            )
+    
+    def alert_zones(self, alert):
+        """Zones ciblées par une alerte : [(rectangle englobant, test d'appartenance)]"""
+        zones = []
+        if alert.circle:
+            lat, lon, radius_km = alert.circle
+            zones.append((bounding_box(lat, lon, radius_km), self._within_radius(lat, lon, radius_km)))
+        if alert.polygon:
+            polygon = alert.polygon
+            zones.append((polygon_bounding_box(polygon), self._in_polygon(polygon)))
+        return zones
+    
+    @staticmethod
+    def _within_radius(lat, lon, radius_km):
+        return lambda user_lat, user_lng: haversine_km(lat, lon, user_lat, user_lng) <= radius_km
+    
+    @staticmethod
+    def _in_polygon(polygon):
+        return lambda user_lat, user_lng: point_in_polygon(user_lat, user_lng, polygon)
+    
+    def profiles_in_box(self, min_lat, min_lon, max_lat, max_lon, channel=None, profile_types=None):
+        """
+        Profils des cellules geohash qui couvrent un rectangle (candidats)
+        
+        Seules les lignes de ces cellules sont lues, grâce à l'index sur
+        UserProfile.geohash ; le filtrage exact se fait ensuite en Python.
+        """
+        return self._profiles_in_cells(
+            covering_geohashes(min_lat, min_lon, max_lat, max_lon), channel, profile_types
+        )
+    
+    def _profiles_in_cells(self, prefixes, channel=None, profile_types=None):
+        """Profils dont le geohash commence par l'un des préfixes"""
+        profiles = UserProfile.objects.filter(
+            reduce(or_, [Q(geohash__startswith=prefix) for prefix in sorted(prefixes)])
+        )
+        
+        if channel:
+            profiles = profiles.filter(**{CHANNEL_PREFERENCES[channel]: True})
+        if profile_types:
+            profiles = profiles.filter(profile_type__in=profile_types)
+        
+        return profiles
+    
+    def _iter_matching_user_ids(self, profiles, matches, chunk_size=None):
+        """Identifiants des profils candidats dont la position vérifie matches(lat, lng)"""
+        chunk_size = chunk_size or self.chunk_size
+        chunk = []
+        
+        rows = profiles.order_by().values_list('user_id', 'location_lat', 'location_lng')
+        for user_id, lat, lng in rows.iterator(chunk_size=chunk_size):
+            if lat is None or lng is None or not matches(lat, lng):
+                continue
+            chunk.append(user_id)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        
+        if chunk:
+            yield chunk
+    
+    def iter_users_within_radius(self, lat, lon, radius_km, channel=None, profile_types=None, chunk_size=None):
+        """Identifiants des utilisateurs situés à moins de radius_km d'un point, par lots"""
+        profiles = self.profiles_in_box(*bounding_box(lat, lon, radius_km), channel, profile_types)
+        return self._iter_matching_user_ids(profiles, self._within_radius(lat, lon, radius_km), chunk_size)
+    
+    def iter_users_in_polygon(self, polygon, channel=None, profile_types=None, chunk_size=None):
+        """Identifiants des utilisateurs situés dans un polygone [(lat, lon), ...], par lots"""
+        profiles = self.profiles_in_box(*polygon_bounding_box(polygon), channel, profile_types)
+        return self._iter_matching_user_ids(profiles, self._in_polygon(polygon), chunk_size)
+    
+    def count_alert_audience(self, alert, channel=None, profile_types=None):
+        """
+        Taille de l'audience d'une alerte : une requête COUNT pour les villes,
+        plus le parcours des profils candidats de la zone s'il y en a une
+        """
+        if not self.alert_zones(alert):
+            return self.profiles_for_cities(alert.affected_cities, channel, profile_types).count()
+        return sum(len(chunk) for chunk in self.iter_alert_audience(alert, channel, profile_types))
+
+# Instance globale du résolveur
+audience_resolver = AudienceResolver()
@@ -0,0 +1,74 @@
+import time
+from django.core.management.base import BaseCommand
+from alerts.services import alert_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = "Traite la file d'attente des notifications d'alertes (worker)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Traiter les tâches en attente puis s'arrêter",
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5,
+            help="Attente entre deux vérifications de la file (secondes)",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Nombre de notifications créées par requête (bulk_create)',
+        )
+        parser.add_argument(
+            '--stale-minutes',
+            type=int,
+            default=30,
+            help='Remettre en file les tâches « en cours » depuis plus de N minutes',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("📨 Worker notifications démarré")
+
+        requeued = alert_service.requeue_stale_notification_jobs(options['stale_minutes'])
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"   - {requeued} tâches interrompues remises en file"))
+
+        try:
+            while True:
+                job = alert_service.claim_notification_job()
+
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                self._process(job, options['chunk_size'])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt du worker")
+
+    def _process(self, job, chunk_size):
+        """Traiter une tâche et afficher le débit obtenu"""
+        try:
+            sent, duration = alert_service.process_notification_job(job, chunk_size=chunk_size)
+        except Exception as e:
+            retry = f" (nouvel essai à {job.retry_at:%H:%M:%S})" if job.status == 'pending' else ''
+            self.stdout.write(
+                self.style.ERROR(f"❌ Job {job.id} (alerte {job.alert_id}) : {e}{retry}")
+            )
+            return
+
+        rate = sent / duration if duration > 0 else sent
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Job {job.id} (alerte {job.alert_id}) : {sent} notifications "
+                f"en {duration:.2f}s ({rate:.0f}/s)"
+            )
+        )
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0002_communityreport'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['start_time', 'end_time'], name='alert_active_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['severity', 'start_time'], name='alert_active_severity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alertnotification',
+            index=models.Index(fields=['user', 'is_read', '-sent_at'], name='notif_user_read_sent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='communityreport',
+            index=models.Index(fields=['city', 'is_verified', '-created_at'], name='report_city_verified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='communityreport',
+            index=models.Index(fields=['user', '-created_at'], name='report_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_alert_cities(apps, schema_editor):
+    Alert = apps.get_model("alerts", "Alert")
+    AlertCity = apps.get_model("alerts", "AlertCity")
+
+    links = []
+    for alert_id, affected_cities in Alert.objects.values_list("id", "affected_cities").iterator():
+        keys = set()
+        for city in affected_cities or []:
+            if isinstance(city, str) and city.strip():
+                key = city.strip().casefold()
+                if key not in keys:
+                    keys.add(key)
+                    links.append(AlertCity(alert_id=alert_id, city=city.strip(), city_key=key))
+
+    AlertCity.objects.bulk_create(links, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0003_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertCity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('city_key', models.CharField(max_length=100)),
+                ('alert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cities', to='alerts.alert')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['city_key', 'alert'], name='alertcity_key_alert_idx')],
+                'unique_together': {('alert', 'city_key')},
+            },
+        ),
+        migrations.RunPython(backfill_alert_cities, migrations.RunPython.noop),
+    ]
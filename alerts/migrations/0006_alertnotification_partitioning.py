@@ -0,0 +1,19 @@
+from django.db import migrations
+from core.partitions import convert_to_partitioned
+
+
+def partition_alertnotification(apps, schema_editor):
+    # PostgreSQL uniquement : partitions mensuelles sur sent_at
+    convert_to_partitioned(schema_editor, 'alerts_alertnotification', 'sent_at')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0005_notificationjob'),
+    ]
+
+    operations = [
+        # Sans retour arrière : la table partitionnée reste utilisable telle quelle
+        migrations.RunPython(partition_alertnotification, migrations.RunPython.noop),
+    ]
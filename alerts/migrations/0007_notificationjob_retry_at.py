@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0006_alertnotification_partitioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationjob',
+            name='retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0007_notificationjob_retry_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='area',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='center_lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='center_lon',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='radius_km',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='alert',
+            name='affected_cities',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -1,4 +1,6 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from core.cache import invalidate
 from django.contrib.auth.models import User
 
 class Alert(models.Model):
@@ -19,7 +21,12 @@ class Alert(models.Model):
     message = models.TextField()
     alert_type = models.CharField(max_length=20, choices=ALERT_TYPES)
     severity = models.CharField(max_length=10, choices=SEVERITY_LEVELS)
-    affected_cities = models.JSONField(default=list)  # Liste des villes concernées
+    affected_cities = models.JSONField(default=list, blank=True)  # Liste des villes concernées
+    # Zone ciblée, en plus des villes : cercle (centre + rayon) et/ou polygone
+    center_lat = models.FloatField(blank=True, null=True)
+    center_lon = models.FloatField(blank=True, null=True)
+    radius_km = models.FloatField(blank=True, null=True)
+    area = models.JSONField(default=list, blank=True)  # Polygone [[lat, lon], ...]
     start_time = models.DateTimeField()
     end_time = models.DateTimeField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
@@ -28,10 +35,135 @@ class Alert(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Alertes en cours : is_active + fenêtre start_time/end_time
+            models.Index(
+                fields=['start_time', 'end_time'],
+                condition=models.Q(is_active=True),
+                name='alert_active_window_idx'
+            ),
+            models.Index(
+                fields=['severity', 'start_time'],
+                condition=models.Q(is_active=True),
+                name='alert_active_severity_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.severity})"
 
+    def clean(self):
+        super().clean()
+        circle = (self.center_lat, self.center_lon, self.radius_km)
+        if any(value is not None for value in circle) and None in circle:
+            raise ValidationError('Un ciblage par rayon demande center_lat, center_lon et radius_km.')
+        if self.radius_km is not None and self.radius_km <= 0:
+            raise ValidationError({'radius_km': 'Le rayon doit être positif.'})
+        if self.area:
+            if len(self.area) < 3 or not all(
+                isinstance(point, (list, tuple)) and len(point) == 2 for point in self.area
+            ):
+                raise ValidationError({'area': 'Le polygone doit compter au moins 3 points [lat, lon].'})
+        if not self.affected_cities and not self.circle and not self.area:
+            raise ValidationError('Une alerte cible au moins une ville ou une zone.')
+
+    @property
+    def circle(self):
+        """Cercle ciblé (lat, lon, rayon en km), ou None"""
+        if None in (self.center_lat, self.center_lon, self.radius_km):
+            return None
+        return self.center_lat, self.center_lon, self.radius_km
+
+    @property
+    def polygon(self):
+        """Polygone ciblé [(lat, lon), ...], ou None"""
+        if not self.area or len(self.area) < 3:
+            return None
+        return [(float(lat), float(lon)) for lat, lon in self.area]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # État chargé, pour détecter une désactivation à l'enregistrement
+        if 'is_active' in field_names:
+            instance._loaded_is_active = instance.is_active
+        return instance
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        was_active = getattr(self, '_loaded_is_active', None)
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'affected_cities' in update_fields:
+            self.sync_cities()
+        invalidate('alerts')
+
+        if created:
+            self.publish_event('alert.created')
+        elif was_active and not self.is_active:
+            self.publish_event('alert.deactivated')
+        self._loaded_is_active = self.is_active
+
+    def event_payload(self):
+        """Données diffusées aux clients en direct (voir core.events)"""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'message': self.message,
+            'alert_type': self.alert_type,
+            'severity': self.severity,
+            'affected_cities': self.affected_cities,
+            'start_time': self.start_time.isoformat() if self.start_time else None,
+            'end_time': self.end_time.isoformat() if self.end_time else None,
+            'is_active': self.is_active,
+        }
+
+    def publish_event(self, event_type):
+        from core.events import publish
+
+        publish(event_type, self.event_payload(), cities=self.affected_cities)
+
+    def sync_cities(self):
+        """Synchroniser la table AlertCity avec la liste affected_cities"""
+        wanted = {}
+        for city in self.affected_cities or []:
+            if isinstance(city, str) and city.strip():
+                wanted.setdefault(AlertCity.normalize(city), city.strip())
+
+        existing = set(self.cities.values_list('city_key', flat=True))
+
+        if existing - wanted.keys():
+            self.cities.exclude(city_key__in=wanted.keys()).delete()
+        AlertCity.objects.bulk_create([
+            AlertCity(alert=self, city=city, city_key=key)
+            for key, city in wanted.items() if key not in existing
+        ])
+
+class AlertCity(models.Model):
+    """
+    Ville concernée par une alerte : version indexée de Alert.affected_cities
+    
+    Permet de filtrer les alertes d'une ville par jointure exacte au lieu
+    d'une recherche de sous-chaîne dans le JSON.
+    """
+    alert = models.ForeignKey(Alert, on_delete=models.CASCADE, related_name='cities')
+    city = models.CharField(max_length=100)
+    city_key = models.CharField(max_length=100)  # Nom normalisé (minuscules, sans espaces autour)
+
+    class Meta:
+        unique_together = ['alert', 'city_key']
+        indexes = [
+            models.Index(fields=['city_key', 'alert'], name='alertcity_key_alert_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.city} -> {self.alert_id}"
+
+    @staticmethod
+    def normalize(city_name):
+        """Clé de recherche d'une ville, insensible à la casse"""
+        return city_name.strip().casefold()
+
 class AlertNotification(models.Model):
     """Notifications d'alertes envoyées aux utilisateurs"""
     alert = models.ForeignKey(Alert, on_delete=models.CASCADE)
@@ -44,9 +176,49 @@ class AlertNotification(models.Model):
     sent_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_read', '-sent_at'], name='notif_user_read_sent_idx'),
+        ]
+
     def __str__(self):
         return f"Alert {self.alert.title} -> {self.user.username}"
 
+class NotificationJob(models.Model):
+    """
+    Envoi des notifications d'une alerte, en file d'attente
+    
+    Créé par AlertService lors de la création d'une alerte et traité en
+    arrière-plan par la commande process_notifications. Une tâche en échec
+    est remise en file (retry_at, délai croissant) jusqu'à
+    ALERT_NOTIFICATION_MAX_ATTEMPTS tentatives.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échec'),
+    ]
+
+    alert = models.ForeignKey(Alert, on_delete=models.CASCADE, related_name='notification_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    notifications_created = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    retry_at = models.DateTimeField(blank=True, null=True)  # Prochaine tentative après un échec
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='notifjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Notifications alerte {self.alert_id} ({self.status})"
+
 class Recommendation(models.Model):
     """Recommandations personnalisées selon les profils"""
     profile_type = models.CharField(max_length=20, choices=[
@@ -99,6 +271,10 @@ class CommunityReport(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['city', 'is_verified', '-created_at'], name='report_city_verified_idx'),
+            models.Index(fields=['user', '-created_at'], name='report_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"Signalement {self.city} - {self.get_symptoms_display()}"
\ No newline at end of file
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Alert, AlertNotification, Recommendation, CommunityReport
 from django.contrib.auth.models import User
+from core.cities import resolve_city
 
 class AlertSerializer(serializers.ModelSerializer):
     """Serializer pour les alertes"""
@@ -11,8 +12,9 @@ class AlertSerializer(serializers.ModelSerializer):
         model = Alert
         fields = [
             'id', 'title', 'message', 'alert_type', 'alert_type_display',
-            'severity', 'severity_display', 'affected_cities', 'start_time',
-            'end_time', 'is_active', 'created_at', 'updated_at'
+            'severity', 'severity_display', 'affected_cities', 'center_lat',
+            'center_lon', 'radius_km', 'area', 'start_time', 'end_time',
+            'is_active', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
@@ -63,6 +65,16 @@ class CommunityReportCreateSerializer(serializers.ModelSerializer):
             'latitude', 'longitude', 'city', 'symptoms', 'description',
             'temperature_felt', 'has_shade', 'has_water_access'
         ]
+        extra_kwargs = {'city': {'required': False}}
+    
+    def validate(self, attrs):
+        # Rattacher le signalement à la ville connue la plus proche
+        city = resolve_city(attrs['latitude'], attrs['longitude'])
+        if city:
+            attrs['city'] = city
+        elif not attrs.get('city'):
+            raise serializers.ValidationError({'city': 'Ville requise (aucune ville connue à proximité).'})
+        return attrs
     
     def create(self, validated_data):
         # Ajouter l'utilisateur depuis le contexte de la request
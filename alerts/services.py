@@ -1,9 +1,14 @@
+import time
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Q, F
 from datetime import datetime, timedelta
-from .models import Alert, AlertNotification, Recommendation
-from weather.models import WeatherData
-from users.models import UserProfile
+from .models import Alert, AlertCity, AlertNotification, NotificationJob, Recommendation
+from weather.classification import classify_temperature, get_thresholds
+from weather.models import LatestWeather
+from .audience import audience_resolver, CHANNEL_PREFERENCES
+from core.cache import invalidate
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,12 +17,12 @@ class AlertService:
     """Service pour gérer les alertes automatiques"""
     
     def __init__(self):
-        # Seuils de température pour le Sénégal
-        self.temperature_thresholds = {
-            'yellow': 35,  # Très inconfortable
-            'orange': 40,  # Dangereux  
-            'red': 45      # Très dangereux
-        }
+        # Envoi des notifications : en file d'attente (process_notifications)
+        # ou directement, par lots de notification_chunk_size
+        self.notifications_async = getattr(settings, 'ALERT_NOTIFICATIONS_ASYNC', True)
+        self.notification_chunk_size = int(getattr(settings, 'ALERT_NOTIFICATION_CHUNK_SIZE', 1000))
+        self.notification_max_attempts = int(getattr(settings, 'ALERT_NOTIFICATION_MAX_ATTEMPTS', 5))
+        self.notification_retry_delay = float(getattr(settings, 'ALERT_NOTIFICATION_RETRY_DELAY', 60))
         
         # Messages d'alerte par niveau
         self.alert_messages = {
@@ -42,21 +47,15 @@ class AlertService:
         generated_alerts = []
         now = timezone.now()
         
-        # Récupérer les données météo récentes (dernières 2 heures)
-        recent_weather = WeatherData.objects.filter(
+        # Dernière lecture de chaque ville, si elle date de moins de 2 heures
+        recent_weather = LatestWeather.objects.filter(
             recorded_at__gte=now - timedelta(hours=2)
         )
         
         if cities_list:
             recent_weather = recent_weather.filter(city__in=cities_list)
         
-        # Grouper par ville et prendre la plus récente
-        cities_weather = {}
-        for weather in recent_weather:
-            if weather.city not in cities_weather:
-                cities_weather[weather.city] = weather
-            elif weather.recorded_at > cities_weather[weather.city].recorded_at:
-                cities_weather[weather.city] = weather
+        cities_weather = {weather.city: weather for weather in recent_weather}
         
         # Générer les alertes pour chaque ville
         for city, weather_data in cities_weather.items():
@@ -71,17 +70,19 @@ class AlertService:
         Créer une alerte si les seuils sont dépassés et qu'aucune alerte similaire n'existe
         """
         temp_max = weather_data.temp_max
-        alert_level = self._determine_alert_level(temp_max)
+        alert_level = self._determine_alert_level(temp_max, weather_data.humidity, weather_data.city)
         
         if alert_level == 'green':
             return None  # Pas d'alerte nécessaire
         
         # Vérifier s'il existe déjà une alerte active similaire
+        start_of_day = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
         existing_alert = Alert.objects.filter(
             severity=alert_level,
-            affected_cities__icontains=weather_data.city,
+            cities__city_key=AlertCity.normalize(weather_data.city),
             is_active=True,
-            start_time__date=timezone.now().date()
+            start_time__gte=start_of_day,
+            start_time__lt=start_of_day + timedelta(days=1)
         ).first()
         
         if existing_alert:
@@ -109,89 +110,162 @@ class AlertService:
         
         return alert
 
-    def _determine_alert_level(self, temperature):
-        """Déterminer le niveau d'alerte basé sur la température"""
-        if temperature >= self.temperature_thresholds['red']:
-            return 'red'
-        elif temperature >= self.temperature_thresholds['orange']:
-            return 'orange'
-        elif temperature >= self.temperature_thresholds['yellow']:
-            return 'yellow'
-        else:
-            return 'green'
+    @property
+    def temperature_thresholds(self):
+        """Seuils de température pour le Sénégal (weather.classification)"""
+        return get_thresholds()
+
+    def _determine_alert_level(self, temperature, humidity=None, city=None):
+        """Déterminer le niveau d'alerte basé sur la température (seuils de la ville)"""
+        return classify_temperature(temperature, humidity, city)
 
     def _schedule_notifications(self, alert):
         """
         Programmer l'envoi de notifications pour une alerte
         """
         try:
-            # Pour le MVP, envoi synchrone direct
-            self.send_alert_notifications_sync(alert)
-            logger.info(f"Notifications envoyées pour l'alerte {alert.id}")
+            if self.notifications_async:
+                # Traité en arrière-plan par la commande process_notifications
+                job = NotificationJob.objects.create(alert=alert)
+                logger.info(f"Notifications de l'alerte {alert.id} mises en file (job {job.id})")
+            else:
+                self.send_alert_notifications_sync(alert)
+                logger.info(f"Notifications envoyées pour l'alerte {alert.id}")
         except Exception as e:
             logger.error(f"Erreur programmation notifications: {e}")
 
-    def send_alert_notifications_sync(self, alert):
+    def send_alert_notifications_sync(self, alert, chunk_size=None, skip_existing=False, profile_types=None):
         """
-        Envoyer les notifications de manière synchrone
-        """
-        # Récupérer les utilisateurs concernés par cette alerte
-        affected_users = self._get_affected_users(alert)
+        Envoyer les notifications d'une alerte par lots (bulk_create)
         
+        Une notification par utilisateur et par canal accepté dans son profil
+        (receive_push / receive_sms). Avec skip_existing, les utilisateurs déjà
+        notifiés sur un canal sont ignorés (reprise d'un envoi interrompu).
+        """
+        chunk_size = chunk_size or self.notification_chunk_size
         notifications_sent = 0
-        for user in affected_users:
-            try:
-                # Créer l'enregistrement de notification
-                notification = AlertNotification.objects.create(
-                    alert=alert,
-                    user=user,
-                    sent_via='push',  # Type par défaut
-                    is_read=False
-                )
-                
-                # Pour le MVP, on simule l'envoi
-                logger.info(f"📱 Notification simulée pour {user.username}")
-                notifications_sent += 1
+        
+        for channel in CHANNEL_PREFERENCES:
+            for chunk in self._get_affected_users(alert, channel, profile_types, chunk_size):
+                if skip_existing:
+                    already_sent = set(AlertNotification.objects.filter(
+                        alert=alert, sent_via=channel, user_id__in=chunk
+                    ).values_list('user_id', flat=True))
+                    chunk = [user_id for user_id in chunk if user_id not in already_sent]
                 
-            except Exception as e:
-                logger.error(f"Erreur envoi notification user {user.id}: {e}")
+                # Pour le MVP, on simule l'envoi : seul l'enregistrement est créé
+                AlertNotification.objects.bulk_create([
+                    AlertNotification(alert=alert, user_id=user_id, sent_via=channel, is_read=False)
+                    for user_id in chunk
+                ])
+                notifications_sent += len(chunk)
         
         logger.info(f"📱 {notifications_sent} notifications envoyées pour l'alerte {alert.id}")
         return notifications_sent
 
-    def _get_affected_users(self, alert):
+    def claim_notification_job(self):
         """
-        Récupérer les utilisateurs affectés par une alerte
+        Réserver la prochaine tâche de notification en attente
+        
+        La réservation est un UPDATE conditionnel : deux workers ne peuvent
+        pas obtenir la même tâche.
         """
-        affected_users = []
+        now = timezone.now()
+        pending_ids = NotificationJob.objects.filter(
+            Q(retry_at__isnull=True) | Q(retry_at__lte=now),
+            status='pending'
+        ).order_by('created_at').values_list('id', flat=True)[:10]
         
-        for city in alert.affected_cities:
-            # Utilisateurs dans la ville concernée
-            try:
-                city_users = UserProfile.objects.filter(
-                    city__icontains=city,
-                    receive_push=True
-                ).select_related('user')
-                
-                affected_users.extend([profile.user for profile in city_users])
-            except Exception as e:
-                logger.error(f"Erreur récupération users pour {city}: {e}")
+        for job_id in pending_ids:
+            claimed = NotificationJob.objects.filter(id=job_id, status='pending').update(
+                status='running',
+                started_at=timezone.now(),
+                attempts=F('attempts') + 1
+            )
+            if claimed:
+                return NotificationJob.objects.select_related('alert').get(id=job_id)
         
-        # Supprimer les doublons
-        return list(set(affected_users))
+        return None
+
+    def requeue_stale_notification_jobs(self, max_age_minutes=30):
+        """Remettre en file les tâches restées « en cours » (worker interrompu)"""
+        return NotificationJob.objects.filter(
+            status='running',
+            started_at__lt=timezone.now() - timedelta(minutes=max_age_minutes)
+        ).update(status='pending')
+
+    def process_notification_job(self, job, chunk_size=None):
+        """
+        Exécuter une tâche réservée et enregistrer son résultat
+        
+        Retourne (nombre de notifications, durée en secondes).
+        """
+        start = time.monotonic()
+        try:
+            # Chaque lot est validé séparément : une reprise repart du dernier lot
+            sent = self.send_alert_notifications_sync(
+                job.alert, chunk_size=chunk_size, skip_existing=job.attempts > 1
+            )
+        except Exception as e:
+            job.error = str(e)
+            if job.attempts < self.notification_max_attempts:
+                # Erreur passagère possible (push, SMTP) : nouvel essai, délai doublé à chaque échec
+                delay = self.notification_retry_delay * 2 ** (job.attempts - 1)
+                job.status = 'pending'
+                job.retry_at = timezone.now() + timedelta(seconds=delay)
+                job.save(update_fields=['status', 'error', 'retry_at'])
+                logger.warning(
+                    f"Erreur envoi notifications (job {job.id}, tentative {job.attempts}), "
+                    f"nouvel essai dans {delay:.0f}s: {e}"
+                )
+            else:
+                job.status = 'failed'
+                job.finished_at = timezone.now()
+                job.save(update_fields=['status', 'error', 'finished_at'])
+                logger.error(f"Erreur envoi notifications (job {job.id}, abandon après {job.attempts} tentatives): {e}")
+            raise
+        
+        job.status = 'done'
+        job.notifications_created = sent
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'notifications_created', 'finished_at'])
+        
+        return sent, time.monotonic() - start
+
+    def _get_affected_users(self, alert, channel='push', profile_types=None, chunk_size=None):
+        """
+        Identifiants des utilisateurs affectés par une alerte pour un canal
+        donné, par lots (voir AudienceResolver)
+        """
+        return audience_resolver.iter_alert_audience(
+            alert, channel=channel, profile_types=profile_types,
+            chunk_size=chunk_size or self.notification_chunk_size
+        )
 
     def deactivate_expired_alerts(self):
         """
         Désactiver les alertes expirées
         """
         now = timezone.now()
-        expired_alerts = Alert.objects.filter(
+        # Alertes lues avant la mise à jour : chacune est diffusée en direct
+        expired_alerts = list(Alert.objects.filter(
             is_active=True,
             end_time__lt=now
-        )
+        ).only(
+            'id', 'title', 'message', 'alert_type', 'severity',
+            'affected_cities', 'start_time', 'end_time', 'is_active'
+        ))
         
-        count = expired_alerts.count()
-        expired_alerts.update(is_active=False)
+        count = len(expired_alerts)
+        if count:
+            with transaction.atomic():
+                Alert.objects.filter(
+                    id__in=[alert.id for alert in expired_alerts]
+                ).update(is_active=False)
+                for alert in expired_alerts:
+                    alert.is_active = False
+                    alert.publish_event('alert.deactivated')
+            invalidate('alerts')
         
         logger.info(f"🔄 {count} alertes expirées désactivées")
         return count
@@ -223,7 +297,7 @@ class AlertService:
         """
         now = timezone.now()
         return Alert.objects.filter(
-            affected_cities__icontains=city_name,
+            cities__city_key=AlertCity.normalize(city_name),
             is_active=True,
             start_time__lte=now
         ).filter(
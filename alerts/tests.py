@@ -1,3 +1,273 @@
+import asyncio
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.test import TestCase
+from django.utils import timezone
+from core.events import EventHub, EventStream, LocalEventBackend, hub as global_hub
+from core.geo import KM_PER_DEGREE_LAT
+from users.models import UserProfile
+from .audience import audience_resolver
+from .models import Alert, AlertNotification, CommunityReport, NotificationJob
+from .services import AlertService
 
-# Create your tests here.
+
+class AlertLiveEventTests(TestCase):
+    """Événements diffusés en direct à la création et à la désactivation d'une alerte"""
+
+    def create_alert(self, **kwargs):
+        fields = {
+            'title': 'Vague de chaleur', 'message': 'Restez au frais',
+            'alert_type': 'heat_wave', 'severity': 'orange',
+            'affected_cities': ['Dakar'], 'start_time': timezone.now(),
+        }
+        fields.update(kwargs)
+        return Alert.objects.create(**fields)
+
+    def test_create_and_deactivate_publish_events(self):
+        with mock.patch('core.events.publish') as publish:
+            alert = self.create_alert()
+            alert.title = 'Vague de chaleur (mise à jour)'
+            alert.save()
+            alert = Alert.objects.get(id=alert.id)
+            alert.is_active = False
+            alert.save()
+
+        self.assertEqual(
+            [call.args[0] for call in publish.call_args_list],
+            ['alert.created', 'alert.deactivated'],
+        )
+        self.assertEqual(publish.call_args.kwargs['cities'], ['Dakar'])
+        self.assertFalse(publish.call_args.args[1]['is_active'])
+
+    def test_expired_alerts_publish_deactivation(self):
+        alert = self.create_alert(end_time=timezone.now() - timedelta(hours=1))
+        with mock.patch('core.events.publish') as publish:
+            self.assertEqual(AlertService().deactivate_expired_alerts(), 1)
+
+        publish.assert_called_once()
+        self.assertEqual(publish.call_args.args[0], 'alert.deactivated')
+        self.assertEqual(publish.call_args.args[1]['id'], alert.id)
+
+    def test_hub_filters_by_city_and_replays(self):
+        hub = EventHub(backend=LocalEventBackend())
+
+        async def scenario():
+            dakar = hub.subscribe(['dakar'])
+            everyone = hub.subscribe()
+            hub.dispatch({'id': 1, 'type': 'alert.created', 'data': {'id': 1}, 'cities': ['matam']})
+            hub.dispatch({'id': 2, 'type': 'alert.created', 'data': {'id': 2}, 'cities': ['dakar']})
+            await asyncio.sleep(0)
+            received = (
+                [dakar.queue.get_nowait()['id'] for _ in range(dakar.queue.qsize())],
+                [everyone.queue.get_nowait()['id'] for _ in range(everyone.queue.qsize())],
+                [event['id'] for event in hub.replay(0, dakar.cities)],
+            )
+            hub.unsubscribe(dakar)
+            hub.unsubscribe(everyone)
+            return received
+
+        dakar, everyone, replay = asyncio.run(scenario())
+        self.assertEqual(dakar, [2])
+        self.assertEqual(everyone, [1, 2])
+        self.assertEqual(replay, [2])
+        self.assertEqual(hub.subscriber_count, 0)
+
+    def test_event_stream_frames(self):
+        hub = EventHub(backend=LocalEventBackend())
+        global_count = global_hub.subscriber_count
+
+        async def scenario():
+            stream = EventStream(hub, ['Dakar'], heartbeat=0.01)
+            frames = aiter(stream)
+            received = [await anext(frames)]
+            # Abonné au début de l'itération
+            self.assertEqual(hub.subscriber_count, 1)
+            hub.dispatch({'id': 7, 'type': 'alert.deactivated', 'data': {'id': 3}, 'cities': []})
+            received += [await anext(frames), await anext(frames)]
+            await frames.aclose()
+            return received
+
+        frames = asyncio.run(scenario())
+        self.assertTrue(frames[0].startswith(b'retry: '))
+        self.assertEqual(frames[1], b'id: 7\nevent: alert.deactivated\ndata: {"id": 3}\n\n')
+        self.assertEqual(frames[2], b': ping\n\n')
+        self.assertEqual(hub.subscriber_count, 0)
+        self.assertEqual(global_hub.subscriber_count, global_count)
+
+    def test_event_stream_close_releases_subscription(self):
+        hub = EventHub(backend=LocalEventBackend())
+
+        async def scenario():
+            # Client parti avant la première trame : rien n'est abonné
+            EventStream(hub).close()
+            stream = EventStream(hub)
+            frames = aiter(stream)
+            await anext(frames)
+            # Fermeture de la réponse pendant le flux, puis fin du générateur
+            stream.close()
+            stream.close()
+            await frames.aclose()
+
+        asyncio.run(scenario())
+        self.assertEqual(hub.subscriber_count, 0)
+
+
+class NotificationJobRetryTests(TestCase):
+    """Une tâche de notification en échec est retentée avec un délai croissant"""
+
+    def setUp(self):
+        alert = Alert.objects.create(
+            title='Vague de chaleur', message='Restez au frais', alert_type='heat_wave',
+            severity='red', affected_cities=['Matam'], start_time=timezone.now(),
+        )
+        self.job = NotificationJob.objects.create(alert=alert)
+        self.service = AlertService()
+        self.service.notification_max_attempts = 2
+        self.service.notification_retry_delay = 60
+
+    def _fail_next_job(self):
+        job = self.service.claim_notification_job()
+        with mock.patch.object(self.service, 'send_alert_notifications_sync', side_effect=ConnectionError('SMTP')):
+            with self.assertRaises(ConnectionError):
+                self.service.process_notification_job(job)
+        job.refresh_from_db()
+        return job
+
+    def test_failed_job_is_retried_then_abandoned(self):
+        job = self._fail_next_job()
+        self.assertEqual(job.status, 'pending')
+        self.assertEqual(job.error, 'SMTP')
+        self.assertGreater(job.retry_at, timezone.now() + timedelta(seconds=50))
+        # Pas avant le délai
+        self.assertIsNone(self.service.claim_notification_job())
+
+        NotificationJob.objects.filter(id=job.id).update(retry_at=timezone.now())
+        job = self._fail_next_job()
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.status, 'failed')
+        self.assertIsNone(self.service.claim_notification_job())
+
+    def test_retry_skips_existing_notifications(self):
+        self._fail_next_job()
+        NotificationJob.objects.filter(id=self.job.id).update(retry_at=timezone.now())
+        job = self.service.claim_notification_job()
+        with mock.patch.object(self.service, 'send_alert_notifications_sync', return_value=0) as send:
+            self.service.process_notification_job(job)
+        self.assertTrue(send.call_args.kwargs['skip_existing'])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+
+
+class AlertStatisticsVersionTests(TestCase):
+    """Statistiques à jour sans invalidate() (signalement créé dans un autre processus)"""
+
+    def test_statistics_follow_reports(self):
+        user = User.objects.create_user('citoyen')
+        report = CommunityReport(
+            user=user, latitude=15.65, longitude=-13.25, city='Matam',
+            symptoms='dehydration', temperature_felt=44.0,
+        )
+        response = self.client.get('/api/alerts/statistics/')
+        self.assertEqual(response.data['total_reports'], 0)
+
+        # bulk_create : pas de signal, donc pas d'invalidation
+        CommunityReport.objects.bulk_create([report])
+        response = self.client.get('/api/alerts/statistics/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_reports'], 1)
+
+        CommunityReport.objects.update(is_verified=True)
+        self.assertEqual(self.client.get('/api/alerts/statistics/').data['verified_reports'], 1)
+
+
+class AlertZoneAudienceTests(TestCase):
+    """Audience d'une alerte ciblant un cercle ou un polygone, en plus de ses villes"""
+
+    CENTER = (15.6558, -13.2550)  # Matam
+
+    def setUp(self):
+        self.users = {}
+        for name, km_north, city in [
+            ('proche', 5, None), ('dedans', 9.5, None), ('dehors', 10.5, None),
+            ('loin', 50, None), ('citadin', 2, 'Matam'), ('sans_position', None, 'Podor'),
+        ]:
+            user = User.objects.create_user(name)
+            UserProfile.objects.create(
+                user=user, city=city,
+                location_lat=None if km_north is None else self.CENTER[0] + km_north / KM_PER_DEGREE_LAT,
+                location_lng=None if km_north is None else self.CENTER[1],
+            )
+            self.users[name] = user.id
+
+    def _alert(self, **kwargs):
+        return Alert.objects.create(
+            title='Vague de chaleur', message='Restez au frais', alert_type='heat_wave',
+            severity='red', start_time=timezone.now(), **kwargs
+        )
+
+    def _names(self, chunks):
+        ids = [user_id for chunk in chunks for user_id in chunk]
+        names = [name for name, user_id in self.users.items() if user_id in ids]
+        # Chaque utilisateur une seule fois
+        self.assertEqual(len(ids), len(names))
+        return sorted(names)
+
+    def test_users_within_radius(self):
+        chunks = audience_resolver.iter_users_within_radius(*self.CENTER, 10, chunk_size=2)
+        self.assertEqual(self._names(chunks), ['citadin', 'dedans', 'proche'])
+
+    def test_users_in_polygon(self):
+        lat, lon = self.CENTER
+        # Encoche au nord entre 9,5 et 10,5 km : 'dehors' est dans le rectangle englobant, pas dans le polygone
+        polygon = [
+            (lat - 0.01, lon - 0.1), (lat - 0.01, lon + 0.1), (lat + 0.12, lon + 0.1),
+            (lat + 0.09, lon), (lat + 0.12, lon - 0.1),
+        ]
+        self.assertEqual(
+            self._names(audience_resolver.iter_users_in_polygon(polygon)),
+            ['citadin', 'dedans', 'proche']
+        )
+
+    def test_alert_audience_includes_zone(self):
+        alert = self._alert(
+            affected_cities=['Matam', 'Podor'],
+            center_lat=self.CENTER[0], center_lon=self.CENTER[1], radius_km=10,
+        )
+        expected = ['citadin', 'dedans', 'proche', 'sans_position']
+        self.assertEqual(self._names(audience_resolver.iter_alert_audience(alert, chunk_size=1)), expected)
+        self.assertEqual(audience_resolver.count_alert_audience(alert), len(expected))
+
+        lat, lon = self.CENTER
+        alert.center_lat = alert.center_lon = alert.radius_km = None
+        alert.area = [[lat + 0.4, lon - 0.1], [lat + 0.4, lon + 0.1], [lat + 0.5, lon]]
+        alert.affected_cities = []
+        self.assertEqual(self._names(audience_resolver.iter_alert_audience(alert)), ['loin'])
+
+    def test_notifications_reach_zone_once(self):
+        alert = self._alert(
+            affected_cities=['Matam'], center_lat=self.CENTER[0], center_lon=self.CENTER[1], radius_km=10,
+        )
+        AlertService().send_alert_notifications_sync(alert)
+        self.assertEqual(
+            AlertNotification.objects.filter(alert=alert, sent_via='push').count(), 3
+        )
+
+    def test_zone_validation(self):
+        alert = Alert(
+            title='Vague de chaleur', message='Restez au frais', alert_type='heat_wave',
+            severity='red', start_time=timezone.now(), center_lat=15.6, center_lon=-13.2,
+        )
+        with self.assertRaises(ValidationError):
+            alert.full_clean()
+        alert.radius_km = 10
+        alert.area = [[15.6, -13.2], [15.7, -13.2]]
+        with self.assertRaises(ValidationError):
+            alert.full_clean()
+        alert.area = []
+        alert.full_clean()
+        # Ni ville ni zone
+        alert.center_lat = alert.center_lon = alert.radius_km = None
+        with self.assertRaises(ValidationError):
+            alert.full_clean()
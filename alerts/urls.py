@@ -9,6 +9,7 @@ urlpatterns = [
     path('<int:pk>/', views.AlertDetailView.as_view(), name='alert_detail'),
     path('city/<str:city_name>/', views.alerts_by_city, name='alerts_by_city'),
     path('statistics/', views.alert_statistics, name='alert_statistics'),
+    path('stream/', views.alert_events, name='alert_events'),
     
     # Notifications utilisateur
     path('notifications/', views.user_notifications, name='user_notifications'),
@@ -21,4 +22,5 @@ urlpatterns = [
     # Signalements communautaires
     path('reports/', views.CommunityReportListCreateView.as_view(), name='community_reports'),
     path('reports/my/', views.my_reports, name='my_reports'),
+    path('reports/export/<str:export_format>/', views.export_community_reports, name='community_reports_export'),
 ]
\ No newline at end of file
@@ -2,9 +2,14 @@ from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Q
-from .models import Alert, AlertNotification, Recommendation, CommunityReport
+from django.views.decorators.http import require_GET
+from django.db.models import Q, Max, Min, Count
+from core.cache import cached_response, invalidate, version_token
+from core.events import EventStream, hub
+from core.export import ExportError, export_response, get_dataset
+from .models import Alert, AlertCity, AlertNotification, Recommendation, CommunityReport
 from .serializers import (
     AlertSerializer, AlertNotificationSerializer, RecommendationSerializer,
     CommunityReportSerializer, CommunityReportCreateSerializer, ActiveAlertsSerializer
@@ -15,8 +20,24 @@ class StandardResultsPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+def alerts_version(request):
+    """
+    Jeton de version des alertes actives, en une seule requête d'agrégat :
+    dernière modification, nombre d'alertes, et prochaines dates de début et
+    de fin (une alerte qui commence ou expire change la liste sans être modifiée)
+    """
+    now = timezone.now()
+    state = Alert.objects.aggregate(
+        last_update=Max('updated_at'),
+        total=Count('id'),
+        next_start=Min('start_time', filter=Q(is_active=True, start_time__gt=now)),
+        next_end=Min('end_time', filter=Q(is_active=True, end_time__gte=now)),
+    )
+    return version_token(state['last_update'], state['total'], state['next_start'], state['next_end'])
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@cached_response('alerts', version_func=alerts_version)
 def active_alerts(request):
     """Récupérer les alertes actives"""
     city = request.query_params.get('city', None)
@@ -29,10 +50,10 @@ def active_alerts(request):
         Q(end_time__isnull=True) | Q(end_time__gte=timezone.now())
     )
     
-    # Filtrer par ville si spécifiée
+    # Filtrer par ville si spécifiée (les alertes sans ville concernent tout le pays)
     if city:
         alerts = alerts.filter(
-            Q(affected_cities__icontains=city) | Q(affected_cities=[])
+            Q(cities__city_key=AlertCity.normalize(city)) | Q(cities__isnull=True)
         )
     
     serializer = ActiveAlertsSerializer(alerts, many=True)
@@ -144,6 +165,25 @@ class CommunityReportListCreateView(generics.ListCreateAPIView):
         if self.request.method == 'POST':
             return CommunityReportCreateSerializer
         return CommunityReportSerializer
+    
+    def perform_create(self, serializer):
+        serializer.save()
+        # Les statistiques d'alertes comptent les signalements
+        invalidate('alerts')
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def export_community_reports(request, export_format):
+    """
+    Export des signalements en flux (csv, parquet ou arrow), réservé aux administrateurs
+    
+    Sans utilisateur ni description. Filtres : ?city=, ?start= / ?end=,
+    ?symptoms=, ?verified=true|false.
+    """
+    try:
+        return export_response(get_dataset('reports'), export_format, request.query_params)
+    except ExportError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -159,8 +199,18 @@ def my_reports(request):
     
     return paginator.get_paginated_response(serializer.data)
 
+def statistics_version(request):
+    """Jeton des statistiques : alertes actives et signalements (nouveaux ou vérifiés)"""
+    state = CommunityReport.objects.aggregate(
+        last_report=Max('created_at'),
+        total=Count('id'),
+        verified=Count('id', filter=Q(is_verified=True)),
+    )
+    return version_token(alerts_version(request), state['last_report'], state['total'], state['verified'])
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@cached_response('alerts', version_func=statistics_version)
 def alert_statistics(request):
     """Statistiques des alertes"""
     now = timezone.now()
@@ -196,11 +246,46 @@ def alerts_by_city(request, city_name):
     """Alertes spécifiques à une ville"""
     alerts = Alert.objects.filter(
         is_active=True,
-        affected_cities__icontains=city_name
+        cities__city_key=AlertCity.normalize(city_name)
     ).order_by('-created_at')
     
     serializer = AlertSerializer(alerts, many=True)
     return Response({
         'city': city_name,
         'alerts': serializer.data
-    })
\ No newline at end of file
+    })
+
+@require_GET
+async def alert_events(request):
+    """
+    Flux en direct des alertes (Server-Sent Events) : événements
+    alert.created et alert.deactivated
+    
+    ?city= (répétable ou séparé par des virgules) limite le flux à ces
+    villes ; les alertes sans ville sont envoyées à tous. À la reconnexion,
+    l'en-tête Last-Event-ID (ou ?last_event_id=) renvoie les événements
+    manqués encore en mémoire. Nécessite un serveur ASGI.
+    """
+    cities = [
+        city for value in request.GET.getlist('city') for city in value.split(',') if city.strip()
+    ]
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return JsonResponse({'error': 'Last-Event-ID invalide'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if hub.is_full:
+        response = JsonResponse(
+            {'error': 'Trop de connexions en direct, réessayez plus tard'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+        response['Retry-After'] = '30'
+        return response
+
+    response = StreamingHttpResponse(
+        EventStream(hub, cities, last_event_id), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Pas de mise en tampon par nginx
+    return response
@@ -1,3 +1,11 @@
 from django.contrib import admin
+from .models import AppSettings
 
-# Register your models here.
+
+@admin.register(AppSettings)
+class AppSettingsAdmin(admin.ModelAdmin):
+    """Réglages modifiables à chaud (lus par core.registry)"""
+    list_display = ['key', 'value', 'description', 'updated_at']
+    search_fields = ['key', 'description']
+    ordering = ['key']
+    readonly_fields = ['updated_at']
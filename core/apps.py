@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        # Reconstruction de l'index des villes quand SenegalCity change
+        from . import cities  # noqa: F401
+        # Rechargement du registre des réglages quand AppSettings change
+        from . import registry  # noqa: F401
@@ -0,0 +1,157 @@
+"""
+Cache des réponses des endpoints publics
+
+Les réponses sont stockées dans le cache Django (mémoire locale par défaut,
+Redis si REDIS_URL est défini), par espace de noms ('weather', 'alerts').
+Chaque espace a un numéro de version : invalidate() en change et toutes les
+réponses de l'espace deviennent obsolètes d'un coup. Les réponses servies
+portent un ETag et un Last-Modified, et un client qui renvoie l'un ou
+l'autre reçoit 304 Not Modified.
+
+Un endpoint peut aussi fournir un version_func : un jeton calculé à partir de
+l'état de la base (quelques agrégats, sans sérialiser la réponse). Combiné
+à la version de l'espace, il sert alors d'ETag : la réponse 304 est renvoyée
+avant toute lecture du cache, et le jeton fait partie de la clé. Une réponse
+n'est jamais servie après une modification, même si l'invalidation vient
+d'un autre processus, ni après un invalidate() (réglages modifiés à chaud).
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def _get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def _version_key(namespace):
+    return f"apicache:{namespace}:version"
+
+
+def get_namespace_version(namespace):
+    """
+    Version courante d'un espace de noms (horodatage de la dernière invalidation)
+    """
+    cache = _get_cache()
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        cache.add(_version_key(namespace), time.time(), timeout=None)
+        version = cache.get(_version_key(namespace), time.time())
+    return version
+
+
+def invalidate(*namespaces):
+    """Rendre obsolètes toutes les réponses en cache des espaces donnés"""
+    cache = _get_cache()
+    for namespace in namespaces:
+        cache.set(_version_key(namespace), time.time(), timeout=None)
+
+
+def _request_key(request, view_name, kwargs):
+    """Clé stable pour un endpoint, ses paramètres d'URL et de requête"""
+    params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+    raw = json.dumps([view_name, sorted(kwargs.items()), params], default=str)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _not_modified(request, etag, last_modified):
+    """Vérifier If-None-Match / If-Modified-Since"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    if last_modified is None:
+        return False
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(last_modified) <= if_modified_since
+
+
+def _not_modified_response(etag):
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    response['ETag'] = etag
+    return response
+
+
+def _cached_response(request, entry):
+    if _not_modified(request, entry['etag'], entry['last_modified']):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(entry['data'], status=entry['status'])
+    response['ETag'] = entry['etag']
+    if entry['last_modified'] is not None:
+        response['Last-Modified'] = http_date(entry['last_modified'])
+    return response
+
+
+def version_token(*values):
+    """Construire un jeton de version à partir de quelques valeurs (dates, compteurs)"""
+    raw = '|'.join('' if value is None else str(value) for value in values)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def cached_response(namespace, timeout=None, version_func=None):
+    """
+    Décorateur de vue (sous @api_view) qui met en cache les réponses 200 en GET
+
+    L'invalidation est explicite (invalidate(namespace)) ; le délai d'expiration
+    API_CACHE_TIMEOUT n'est qu'un filet de sécurité. version_func(request),
+    s'il est fourni, renvoie le jeton de version utilisé comme ETag.
+    """
+    def decorator(view_func):
+        view_name = f"{view_func.__module__}.{view_func.__qualname__}"
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            cache = _get_cache()
+            version = get_namespace_version(namespace)
+            key = f"apicache:{namespace}:{version}:{_request_key(request, view_name, kwargs)}"
+
+            token_etag = None
+            if version_func is not None:
+                # La version de l'espace couvre ce que le jeton ne voit pas (réglages, invalidate())
+                token = version_token(version_func(request), version)
+                token_etag = quote_etag(token)
+                # Rien n'a changé pour ce client : ni cache ni sérialisation
+                if _not_modified(request, token_etag, None):
+                    return _not_modified_response(token_etag)
+                key = f"{key}:{token}"
+
+            entry = cache.get(key)
+            if entry is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+
+                if token_etag is not None:
+                    etag, last_modified = token_etag, None
+                else:
+                    body = json.dumps(response.data, cls=JSONEncoder, sort_keys=True)
+                    etag = quote_etag(hashlib.md5(body.encode()).hexdigest())
+                    last_modified = version
+
+                entry = {
+                    'data': response.data,
+                    'status': response.status_code,
+                    'etag': etag,
+                    'last_modified': last_modified,
+                }
+                cache.set(
+                    key, entry,
+                    timeout if timeout is not None else getattr(settings, 'API_CACHE_TIMEOUT', 300)
+                )
+
+            return _cached_response(request, entry)
+
+        return wrapper
+    return decorator
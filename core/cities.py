@@ -0,0 +1,163 @@
+"""
+Index en mémoire des villes du Sénégal pour retrouver la ville la plus proche
+
+Les coordonnées de SenegalCity sont chargées une fois par processus dans une
+grille régulière ; une recherche ne parcourt que les cellules voisines du
+point. L'index est reconstruit quand une ville est créée, modifiée ou
+supprimée : immédiatement dans le processus courant, et dans les autres
+processus via un numéro de version partagé dans le cache (vérifié au plus
+toutes les CITY_INDEX_CHECK_INTERVAL secondes).
+"""
+import math
+import threading
+import time
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import invalidate
+from .geo import KM_PER_DEGREE_LAT, haversine_km
+from .models import SenegalCity
+
+NearestCity = namedtuple('NearestCity', ['name', 'region', 'latitude', 'longitude', 'distance_km'])
+
+VERSION_KEY = 'core:cities:version'
+
+
+class NearestCityIndex:
+    """Grille de villes (cellules de cell_size degrés) avec recherche par anneaux"""
+
+    def __init__(self, cell_size=0.5):
+        self.cell_size = cell_size
+        self.check_interval = float(getattr(settings, 'CITY_INDEX_CHECK_INTERVAL', 30))
+        self._grid = None
+        self._bounds = None
+        self._regions = {}
+        self._version = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def _load(self):
+        grid = {}
+        cities = SenegalCity.objects.values_list('name', 'region', 'latitude', 'longitude')
+        for name, region, lat, lon in cities:
+            grid.setdefault(self._cell(lat, lon), []).append((name, region, lat, lon))
+        return grid
+
+    def _ring_cells(self, center_row, center_col, ring):
+        """Cellules situées exactement à ring cellules du centre (périmètre)"""
+        if ring == 0:
+            yield center_row, center_col
+            return
+        for col in range(center_col - ring, center_col + ring + 1):
+            yield center_row - ring, col
+            yield center_row + ring, col
+        for row in range(center_row - ring + 1, center_row + ring):
+            yield row, center_col - ring
+            yield row, center_col + ring
+
+    def _ensure_loaded(self):
+        now = time.monotonic()
+        if self._grid is not None and now - self._checked_at < self.check_interval:
+            return
+
+        with self._lock:
+            if self._grid is not None and now - self._checked_at < self.check_interval:
+                return
+
+            version = cache.get(VERSION_KEY)
+            if self._grid is None or version != self._version:
+                grid = self._load()
+                rows = [row for row, col in grid] or [0]
+                cols = [col for row, col in grid] or [0]
+                self._bounds = (min(rows), max(rows), min(cols), max(cols))
+                self._regions = {
+                    name.casefold(): region
+                    for cell in grid.values() for name, region, lat, lon in cell
+                }
+                self._grid = grid
+                self._version = version
+            self._checked_at = now
+
+    def invalidate(self):
+        """Forcer le rechargement à la prochaine recherche"""
+        with self._lock:
+            self._grid = None
+
+    def region_of(self, city_name):
+        """Région d'une ville connue (insensible à la casse), ou None"""
+        if not city_name:
+            return None
+        self._ensure_loaded()
+        return self._regions.get(city_name.strip().casefold())
+
+    def nearest(self, lat, lon, max_distance_km=None):
+        """
+        Ville connue la plus proche d'un point (NearestCity), ou None si aucune
+        ville n'est à moins de max_distance_km
+        """
+        self._ensure_loaded()
+        grid, bounds = self._grid, self._bounds
+        if not grid:
+            return None
+
+        center_row, center_col = self._cell(lat, lon)
+        # Plus petite dimension d'une cellule en km, près du point recherché
+        cell_km = self.cell_size * KM_PER_DEGREE_LAT * max(math.cos(math.radians(abs(lat) + self.cell_size)), 0.01)
+
+        # Au-delà de ce rayon (en cellules), la grille ne contient plus de villes
+        min_row, max_row, min_col, max_col = bounds
+        max_ring = max(
+            center_row - min_row, max_row - center_row,
+            center_col - min_col, max_col - center_col, 0
+        )
+
+        best = None
+        best_distance = None
+
+        for ring in range(max_ring + 1):
+            # Le point peut être au bord de sa cellule : les villes de l'anneau
+            # ring (et des suivants) sont à au moins ring - 1 cellules
+            if best is not None and best_distance <= (ring - 1) * cell_km:
+                break
+            if max_distance_km is not None and (ring - 1) * cell_km > max_distance_km:
+                break
+
+            for cell in self._ring_cells(center_row, center_col, ring):
+                for name, region, city_lat, city_lon in grid.get(cell, ()):
+                    distance = haversine_km(lat, lon, city_lat, city_lon)
+                    if best_distance is None or distance < best_distance:
+                        best = (name, region, city_lat, city_lon)
+                        best_distance = distance
+
+        if best is None or (max_distance_km is not None and best_distance > max_distance_km):
+            return None
+        return NearestCity(*best, distance_km=round(best_distance, 3))
+
+
+def resolve_city(lat, lon, max_distance_km=None):
+    """
+    Nom de la ville connue la plus proche, ou None si elle est à plus de
+    max_distance_km (NEAREST_CITY_MAX_KM par défaut)
+    """
+    if max_distance_km is None:
+        max_distance_km = float(getattr(settings, 'NEAREST_CITY_MAX_KM', 30))
+    nearest = city_index.nearest(lat, lon, max_distance_km)
+    return nearest.name if nearest else None
+
+
+@receiver(post_save, sender=SenegalCity)
+@receiver(post_delete, sender=SenegalCity)
+def senegal_city_changed(sender, **kwargs):
+    """Reconstruire l'index (et invalider les listes de villes en cache)"""
+    cache.set(VERSION_KEY, time.time(), timeout=None)
+    city_index.invalidate()
+    invalidate('weather')
+
+
+# Instance globale de l'index
+city_index = NearestCityIndex()
@@ -0,0 +1,367 @@
+"""
+Diffusion d'événements en direct (Server-Sent Events) aux clients connectés
+
+Chaque processus ASGI a un EventHub : les connexions SSE s'y abonnent
+(toutes villes, ou une liste de villes) et reçoivent les événements qui les
+concernent dans une file asyncio. Une connexion inactive ne coûte qu'une
+coroutine en attente et un battement de cœur périodique ; un événement
+n'est encodé qu'une fois, quel que soit le nombre d'abonnés.
+
+Les événements passent d'un processus à l'autre par un backend :
+- 'db' (défaut) : une ligne LiveEvent par événement, relue par un thread de
+  chaque serveur ASGI toutes les LIVE_EVENTS_POLL_INTERVAL secondes (une
+  requête par processus, pas par client) ;
+- 'redis' (si REDIS_URL est défini) : PUBLISH / SUBSCRIBE ;
+- 'local' : un seul processus (tests, développement).
+
+Le thread d'écoute ne démarre qu'au premier abonné : les commandes et les
+workers qui ne font que publier n'en ont pas. Un client qui se reconnecte
+avec Last-Event-ID reçoit les événements manqués encore en mémoire.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+from .models import LiveEvent
+
+logger = logging.getLogger(__name__)
+
+
+def city_key(city_name):
+    """Clé d'une ville, insensible à la casse (même règle que AlertCity)"""
+    return city_name.strip().casefold()
+
+
+class Subscription:
+    """Abonnement d'une connexion : file d'événements dans sa boucle asyncio"""
+
+    def __init__(self, cities, loop, max_pending):
+        self.cities = cities  # Ensemble de clés, ou None pour toutes les villes
+        self.loop = loop
+        self.queue = asyncio.Queue(max_pending)
+        self.overflowed = False
+        self.active = True
+
+    def deliver(self, event):
+        """Dans la boucle de l'abonné ; un client trop lent est déconnecté (il rattrapera via Last-Event-ID)"""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class EventHub:
+    """Abonnés du processus, indexés par ville, et derniers événements pour la reprise"""
+
+    def __init__(self, backend=None):
+        self.max_pending = int(getattr(settings, 'LIVE_EVENTS_MAX_PENDING', 100))
+        self.max_subscribers = int(getattr(settings, 'LIVE_EVENTS_MAX_SUBSCRIBERS', 10000))
+        self._backend = backend
+        self._by_city = defaultdict(set)
+        self._all_cities = set()
+        self._count = 0
+        self._recent = deque(maxlen=int(getattr(settings, 'LIVE_EVENTS_REPLAY_SIZE', 500)))
+        self._lock = threading.Lock()
+        self._listening = False
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = build_event_backend()
+        return self._backend
+
+    @property
+    def subscriber_count(self):
+        return self._count
+
+    @property
+    def is_full(self):
+        return self._count >= self.max_subscribers
+
+    def subscribe(self, cities=None):
+        """Nouvel abonnement (à appeler dans la boucle asyncio) ; None si le processus est plein"""
+        keys = {city_key(city) for city in cities if city.strip()} if cities else None
+        subscription = Subscription(keys or None, asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            if subscription.cities is None:
+                self._all_cities.add(subscription)
+            else:
+                for key in subscription.cities:
+                    self._by_city[key].add(subscription)
+            self._count += 1
+            start = not self._listening
+            self._listening = True
+        if start:
+            self.backend.start(self)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Retirer un abonnement (sans effet s'il l'est déjà)"""
+        with self._lock:
+            if not subscription.active:
+                return
+            subscription.active = False
+            if subscription.cities is None:
+                self._all_cities.discard(subscription)
+            else:
+                for key in subscription.cities:
+                    subscribers = self._by_city.get(key)
+                    if subscribers is not None:
+                        subscribers.discard(subscription)
+                        if not subscribers:
+                            del self._by_city[key]
+            self._count -= 1
+
+    @staticmethod
+    def _matches(event, cities):
+        return cities is None or not event['cities'] or bool(cities.intersection(event['cities']))
+
+    def replay(self, after_id, cities=None):
+        """Événements en mémoire postérieurs à after_id, pour une reprise de connexion"""
+        with self._lock:
+            recent = list(self._recent)
+        return [event for event in recent if event['id'] > after_id and self._matches(event, cities)]
+
+    def dispatch(self, event):
+        """
+        Pousser un événement aux abonnés concernés (depuis n'importe quel thread)
+
+        Un seul rappel par boucle asyncio, quel que soit le nombre d'abonnés.
+        """
+        event['frame'] = encode_frame(event)
+        with self._lock:
+            self._recent.append(event)
+            if event['cities']:
+                targets = set(self._all_cities)
+                for key in event['cities']:
+                    targets.update(self._by_city.get(key, ()))
+            else:
+                targets = set(self._all_cities).union(*self._by_city.values())
+
+        by_loop = defaultdict(list)
+        for subscription in targets:
+            by_loop[subscription.loop].append(subscription)
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver_all, subscriptions, event)
+            except RuntimeError:
+                # Boucle fermée (arrêt du serveur)
+                pass
+
+
+def _deliver_all(subscriptions, event):
+    for subscription in subscriptions:
+        subscription.deliver(event)
+
+
+def encode_frame(event):
+    """Trame SSE d'un événement (encodée une fois pour tous les abonnés)"""
+    payload = JSONEncoder(ensure_ascii=False).encode(event['data'])
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n".encode()
+
+
+class LocalEventBackend:
+    """Un seul processus : les événements sont distribués après le commit"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._hub = None
+
+    def publish(self, event_type, data, cities):
+        event = {'id': next(self._ids), 'type': event_type, 'data': data, 'cities': cities}
+        transaction.on_commit(lambda: (self._hub or hub).dispatch(event))
+
+    def start(self, event_hub):
+        self._hub = event_hub
+
+
+class DatabaseEventBackend:
+    """
+    Événements dans la table LiveEvent, relus par un thread par processus
+
+    Insérés dans la transaction de l'appelant : un événement n'est visible
+    qu'avec l'alerte qui l'a produit. Les ids récents sont relus sur une
+    petite fenêtre pour ne pas manquer une transaction validée dans le
+    désordre.
+    """
+    GAP_WINDOW = 50
+
+    def __init__(self, poll_interval=None, retention_hours=None):
+        self.poll_interval = float(
+            poll_interval if poll_interval is not None else getattr(settings, 'LIVE_EVENTS_POLL_INTERVAL', 1.0)
+        )
+        self.retention_hours = float(
+            retention_hours if retention_hours is not None else getattr(settings, 'LIVE_EVENTS_RETENTION_HOURS', 24)
+        )
+
+    def publish(self, event_type, data, cities):
+        # Point de sauvegarde : un échec n'annule pas la transaction de l'appelant
+        with transaction.atomic():
+            LiveEvent.objects.create(event_type=event_type, data=data, cities=cities)
+
+    def start(self, event_hub):
+        thread = threading.Thread(target=self._listen, args=(event_hub,), name='live-events', daemon=True)
+        thread.start()
+
+    def _listen(self, event_hub):
+        last_id = None
+        seen = deque(maxlen=1000)
+        pruned_at = 0
+        while True:
+            try:
+                if last_id is None:
+                    # Au démarrage, seuls les événements à venir sont diffusés
+                    last_id = LiveEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+                    seen.extend(LiveEvent.objects.filter(
+                        id__gt=last_id - self.GAP_WINDOW
+                    ).order_by('id').values_list('id', flat=True))
+                rows = LiveEvent.objects.filter(id__gt=last_id - self.GAP_WINDOW).order_by('id')[:500]
+                for row in rows:
+                    if row.id in seen or row.id <= last_id - self.GAP_WINDOW:
+                        continue
+                    seen.append(row.id)
+                    last_id = max(last_id, row.id)
+                    event_hub.dispatch({
+                        'id': row.id, 'type': row.event_type, 'data': row.data, 'cities': row.cities,
+                    })
+
+                if time.monotonic() - pruned_at > 600:
+                    pruned_at = time.monotonic()
+                    LiveEvent.objects.filter(
+                        created_at__lt=timezone.now() - timedelta(hours=self.retention_hours)
+                    ).delete()
+            except Exception as e:
+                logger.warning(f"Lecture des événements en direct impossible: {e}")
+                connections.close_all()
+            time.sleep(self.poll_interval)
+
+
+class RedisEventBackend:
+    """Événements publiés sur un canal Redis, écoutés par un thread par processus"""
+    CHANNEL = 'fagaru:live-events'
+
+    def __init__(self, url):
+        import redis  # Dépendance optionnelle, seulement avec ce backend
+
+        self.client = redis.Redis.from_url(url)
+
+    def publish(self, event_type, data, cities):
+        def send():
+            event_id = self.client.incr(f"{self.CHANNEL}:id")
+            message = {'id': event_id, 'type': event_type, 'data': data, 'cities': cities}
+            self.client.publish(self.CHANNEL, JSONEncoder().encode(message))
+        transaction.on_commit(send)
+
+    def start(self, event_hub):
+        thread = threading.Thread(target=self._listen, args=(event_hub,), name='live-events', daemon=True)
+        thread.start()
+
+    def _listen(self, event_hub):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                for message in pubsub.listen():
+                    event_hub.dispatch(json.loads(message['data']))
+            except Exception as e:
+                logger.warning(f"Écoute Redis des événements en direct interrompue: {e}")
+                time.sleep(1)
+
+
+def build_event_backend():
+    """LIVE_EVENTS_BACKEND ('db', 'redis', 'local') ; redis si REDIS_URL est défini, base sinon"""
+    backend = getattr(settings, 'LIVE_EVENTS_BACKEND', '') or (
+        'redis' if getattr(settings, 'REDIS_URL', '') else 'db'
+    )
+    if backend == 'redis':
+        return RedisEventBackend(settings.REDIS_URL)
+    if backend == 'local':
+        return LocalEventBackend()
+    return DatabaseEventBackend()
+
+
+def publish(event_type, data, cities=None):
+    """
+    Publier un événement (depuis du code synchrone, éventuellement dans une transaction)
+
+    cities : noms des villes concernées ; vide = tous les abonnés.
+    """
+    keys = sorted({city_key(city) for city in cities or [] if isinstance(city, str) and city.strip()})
+    try:
+        hub.backend.publish(event_type, data, keys)
+    except Exception as e:
+        # La diffusion en direct ne doit jamais faire échouer l'enregistrement
+        logger.warning(f"Publication de l'événement {event_type} impossible: {e}")
+
+
+class EventStream:
+    """
+    Trames SSE d'une connexion : reprise, puis événements au fil de l'eau
+
+    L'abonnement n'est pris qu'au début de l'itération, auprès du hub donné,
+    et rendu à la fin du flux ou par close() : StreamingHttpResponse
+    l'appelle à la fermeture de la réponse, même si le client s'est
+    déconnecté avant la première trame. Un commentaire est envoyé toutes les
+    heartbeat secondes sans événement (garde la connexion ouverte à travers
+    les proxys).
+    """
+
+    def __init__(self, event_hub, cities=None, last_event_id=None, heartbeat=None):
+        self.hub = event_hub
+        self.cities = cities
+        self.last_event_id = last_event_id
+        self.heartbeat = heartbeat or float(getattr(settings, 'LIVE_EVENTS_HEARTBEAT', 15))
+        self.subscription = None
+
+    def __aiter__(self):
+        return self._frames()
+
+    def close(self):
+        if self.subscription is not None:
+            self.hub.unsubscribe(self.subscription)
+
+    async def _frames(self):
+        self.subscription = self.hub.subscribe(self.cities)
+        try:
+            yield f"retry: {int(getattr(settings, 'LIVE_EVENTS_RETRY_MS', 5000))}\n\n".encode()
+            if self.subscription is None:
+                # Processus plein depuis la vérification de la vue : le client se reconnectera
+                return
+            # Abonné avant la reprise : un événement peut arriver par les deux voies
+            replayed = set()
+            if self.last_event_id is not None:
+                for event in self.hub.replay(self.last_event_id, self.subscription.cities):
+                    replayed.add(event['id'])
+                    yield event['frame']
+            while True:
+                try:
+                    event = await asyncio.wait_for(self.subscription.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                if event is None:
+                    # Client trop lent : fin du flux, il se reconnectera
+                    return
+                if event['id'] not in replayed:
+                    yield event['frame']
+        finally:
+            self.close()
+
+
+# Instance globale du hub (une par processus)
+hub = EventHub()
@@ -0,0 +1,302 @@
+"""
+Export en masse des tables de séries (CSV, Parquet, Arrow), en flux
+
+Les lignes sont lues avec values_list().iterator(chunk_size) : pas d'objets
+modèles, curseur côté serveur sous PostgreSQL. Elles sont écrites lot par
+lot, si bien que la mémoire reste bornée à un lot quel que soit le volume
+exporté. CSV ne demande que la bibliothèque standard. Parquet (un groupe de
+lignes par lot) et Arrow (format IPC en flux) utilisent pyarrow, dépendance
+optionnelle.
+
+Les jeux exportables sont déclarés dans DATASETS ; l'endpoint de chaque
+application et la commande export_data s'en servent.
+"""
+import csv
+import io
+import itertools
+from datetime import datetime, time, timedelta
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db.models import BooleanField, CharField
+from django.db.models.functions import Cast
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+# format : (type MIME, extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+DEFAULT_CHUNK_SIZE = 20000
+
+BOOLEAN_VALUES = {'true': True, '1': True, 'oui': True, 'false': False, '0': False, 'non': False}
+
+
+class ExportError(ValueError):
+    """Format, filtre ou dépendance invalide pour un export"""
+
+
+class ExportDataset:
+    """
+    Table exportable : colonnes (nom, type Arrow), champ de date et filtres
+
+    Types : 'int64', 'float64', 'string', 'bool', 'timestamp'.
+    filters associe un paramètre (?alert_level=) à un champ du modèle.
+    """
+
+    def __init__(self, name, model_label, date_field, columns, filters=None):
+        self.name = name
+        self.model_label = model_label
+        self.date_field = date_field
+        self.columns = columns
+        self.filters = filters or {}
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def column_names(self):
+        return [name for name, _ in self.columns]
+
+    def queryset(self, city=None, start=None, end=None, **filters):
+        """
+        Lignes à exporter (tuples dans l'ordre des colonnes), triées par date puis id
+
+        start / end : date (AAAA-MM-JJ, jour local entier pour end) ou date-heure ISO.
+        """
+        queryset = self.model.objects.all()
+        if city:
+            queryset = queryset.filter(city__iexact=city)
+        if start:
+            queryset = queryset.filter(**{f'{self.date_field}__gte': _parse_bound(start)})
+        if end:
+            queryset = queryset.filter(**{f'{self.date_field}__lt': _parse_bound(end, end=True)})
+
+        for param, value in filters.items():
+            if value in (None, ''):
+                continue
+            if param not in self.filters:
+                raise ExportError(f"Filtre inconnu pour {self.name}: {param}")
+            field = self.filters[param]
+            try:
+                model_field = self.model._meta.get_field(field)
+                if isinstance(model_field, BooleanField):
+                    value = BOOLEAN_VALUES[value.strip().lower()]
+                value = model_field.to_python(value)
+            except (KeyError, ValidationError):
+                raise ExportError(f"Valeur invalide pour {param}: {value}")
+            queryset = queryset.filter(**{field: value})
+
+        # Dates lues comme texte ISO : évite la conversion Python ligne à ligne
+        # (le coût dominant) ; pyarrow les convertit ensuite par colonne
+        as_text = {
+            f'{name}_text': Cast(name, CharField())
+            for name, kind in self.columns if kind == 'timestamp'
+        }
+        return queryset.order_by(self.date_field, 'id').annotate(**as_text).values_list(*[
+            f'{name}_text' if kind == 'timestamp' else name for name, kind in self.columns
+        ])
+
+
+def _parse_bound(value, end=False):
+    """Borne de date : une date seule couvre le jour local entier"""
+    moment = parse_datetime(value)
+    if moment is not None:
+        return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+    day = parse_date(value)
+    if day is None:
+        raise ExportError(f"Date invalide: {value}")
+    if end:
+        day += timedelta(days=1)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+DATASETS = {
+    'weather': ExportDataset(
+        'weather', 'weather.WeatherData', 'recorded_at',
+        columns=[
+            ('id', 'int64'), ('city', 'string'), ('latitude', 'float64'), ('longitude', 'float64'),
+            ('temperature', 'float64'), ('temp_max', 'float64'), ('temp_min', 'float64'),
+            ('feels_like', 'float64'), ('humidity', 'float64'), ('description', 'string'),
+            ('alert_level', 'string'), ('source', 'string'), ('recorded_at', 'timestamp'),
+        ],
+        filters={'alert_level': 'alert_level', 'source': 'source'},
+    ),
+    # Ni utilisateur ni texte libre : seulement ce qui sert aux études
+    'reports': ExportDataset(
+        'reports', 'alerts.CommunityReport', 'created_at',
+        columns=[
+            ('id', 'int64'), ('city', 'string'), ('latitude', 'float64'), ('longitude', 'float64'),
+            ('symptoms', 'string'), ('temperature_felt', 'float64'), ('has_shade', 'bool'),
+            ('has_water_access', 'bool'), ('is_verified', 'bool'), ('created_at', 'timestamp'),
+        ],
+        filters={'symptoms': 'symptoms', 'verified': 'is_verified'},
+    ),
+}
+
+
+def get_dataset(name):
+    try:
+        return DATASETS[name]
+    except KeyError:
+        raise ExportError(f"Jeu de données inconnu: {name} ({', '.join(DATASETS)})")
+
+
+def _batches(queryset, chunk_size, stats):
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        batch = list(itertools.islice(rows, chunk_size))
+        if not batch:
+            return
+        stats['rows'] = stats.get('rows', 0) + len(batch)
+        yield batch
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # Dépendance optionnelle, seulement pour Parquet / Arrow
+    except ImportError:
+        raise ExportError("pyarrow n'est pas installé : exports Parquet et Arrow indisponibles")
+    return pyarrow
+
+
+class _ChunkSink:
+    """Fichier en écriture seule dont on récupère le contenu au fil de l'eau"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _iter_csv(dataset, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(dataset.column_names)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Aucune ligne : l'en-tête seul
+        yield buffer.getvalue().encode()
+
+
+def _arrow_schema(pa, dataset):
+    types = {
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'string': pa.string(),
+        'bool': pa.bool_(),
+        'timestamp': pa.timestamp('us', tz='UTC'),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in dataset.columns])
+
+
+def _timestamp_array(pa, values, timestamp_type):
+    """Dates texte -> timestamps UTC (SQLite les stocke en UTC sans décalage)"""
+    strings = pa.array(values, type=pa.string())
+    # Décalage horaire présent (PostgreSQL : '...+00') ou non (SQLite)
+    sample = next((value for value in values if value), '')
+    if any(marker in sample[19:] for marker in ('+', '-', 'Z')):
+        return strings.cast(timestamp_type)
+    return strings.cast(pa.timestamp(timestamp_type.unit)).cast(timestamp_type)
+
+
+def _record_batch(pa, schema, batch):
+    arrays = []
+    for column, field in zip(zip(*batch), schema):
+        if pa.types.is_timestamp(field.type):
+            arrays.append(_timestamp_array(pa, column, field.type))
+        else:
+            arrays.append(pa.array(column, type=field.type))
+    return pa.record_batch(arrays, schema=schema)
+
+
+def _iter_columnar(dataset, batches, export_format):
+    pa = _require_pyarrow()
+    schema = _arrow_schema(pa, dataset)
+    sink = _ChunkSink()
+
+    if export_format == 'parquet':
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema, compression='snappy')
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), schema)
+        write = writer.write_batch
+
+    for batch in batches:
+        write(_record_batch(pa, schema, batch))
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+def stream_export(dataset, export_format, queryset, chunk_size=DEFAULT_CHUNK_SIZE, stats=None):
+    """
+    Générateur d'octets du fichier exporté
+
+    stats (dict optionnel) reçoit le nombre de lignes écrites ('rows').
+    Les erreurs de format et de dépendance sont levées avant le premier octet.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"Format inconnu: {export_format} ({', '.join(EXPORT_FORMATS)})")
+    if export_format != 'csv':
+        _require_pyarrow()
+
+    batches = _batches(queryset, chunk_size, stats if stats is not None else {})
+    if export_format == 'csv':
+        return _iter_csv(dataset, batches)
+    return _iter_columnar(dataset, batches, export_format)
+
+
+def export_filename(dataset, export_format):
+    extension = EXPORT_FORMATS[export_format][1]
+    return f"fagaru_{dataset.name}_{timezone.localdate():%Y%m%d}.{extension}"
+
+
+def export_response(dataset, export_format, params, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Réponse HTTP en flux (pièce jointe) pour un jeu de données
+
+    params : paramètres de requête (city, start, end et filtres du jeu).
+    Lève ExportError avant toute lecture si un paramètre est invalide.
+    """
+    filters = {param: params.get(param) for param in dataset.filters}
+    queryset = dataset.queryset(
+        city=params.get('city'), start=params.get('start'), end=params.get('end'), **filters
+    )
+    response = StreamingHttpResponse(
+        stream_export(dataset, export_format, queryset, chunk_size),
+        content_type=EXPORT_FORMATS[export_format][0],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(dataset, export_format)}"'
+    return response
@@ -0,0 +1,140 @@
+"""
+Outils géographiques : geohash, distances et couverture de zones
+
+Le geohash découpe le globe en cellules rectangulaires imbriquées : deux
+points proches partagent un préfixe commun. Stocké et indexé sur un modèle,
+il permet de limiter une recherche « autour d'un point » aux seules lignes
+des cellules candidates (filtre geohash__startswith).
+"""
+import math
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Précision stockée sur les profils : cellules d'environ 150 m x 150 m
+GEOHASH_PRECISION = 7
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def encode_geohash(lat, lon, precision=GEOHASH_PRECISION):
+    """Encoder des coordonnées en geohash"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True  # Les bits pairs portent la longitude
+
+    while len(geohash) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if lon >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits = bits << 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits = bits << 1
+                lat_range[1] = mid
+
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(geohash)
+
+
+def geohash_cell_size(precision):
+    """Taille (hauteur, largeur) en degrés d'une cellule geohash"""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def covering_geohashes(min_lat, min_lon, max_lat, max_lon, max_cells=32, max_precision=GEOHASH_PRECISION):
+    """
+    Préfixes geohash couvrant un rectangle
+
+    Choisit la précision la plus fine pour laquelle au plus max_cells cellules
+    suffisent, puis énumère ces cellules.
+    """
+    precision = 1
+    for candidate in range(max_precision, 0, -1):
+        cell_height, cell_width = geohash_cell_size(candidate)
+        rows = math.ceil((max_lat - min_lat) / cell_height) + 1
+        cols = math.ceil((max_lon - min_lon) / cell_width) + 1
+        if rows * cols <= max_cells:
+            precision = candidate
+            break
+
+    cell_height, cell_width = geohash_cell_size(precision)
+
+    # Un point tous les « une cellule » dans chaque direction, plus les bords
+    lats = _steps(min_lat, max_lat, cell_height)
+    lons = _steps(min_lon, max_lon, cell_width)
+
+    return sorted({encode_geohash(lat, lon, precision) for lat in lats for lon in lons})
+
+
+def _steps(start, stop, step):
+    values = []
+    value = start
+    while value < stop:
+        values.append(value)
+        value += step
+    values.append(stop)
+    return values
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distance orthodromique en kilomètres"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lon2 - lon1)
+
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lon, radius_km):
+    """Rectangle (min_lat, min_lon, max_lat, max_lon) contenant un cercle"""
+    d_lat = radius_km / KM_PER_DEGREE_LAT
+    d_lon = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+    return (
+        max(-90.0, lat - d_lat), max(-180.0, lon - d_lon),
+        min(90.0, lat + d_lat), min(180.0, lon + d_lon),
+    )
+
+
+def polygon_bounding_box(polygon):
+    """Rectangle englobant d'un polygone [(lat, lon), ...]"""
+    lats = [point[0] for point in polygon]
+    lons = [point[1] for point in polygon]
+    return min(lats), min(lons), max(lats), max(lons)
+
+
+def point_in_polygon(lat, lon, polygon):
+    """Test d'appartenance d'un point à un polygone [(lat, lon), ...] (lancer de rayon)"""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[j]
+        if (lat_i > lat) != (lat_j > lat):
+            crossing_lon = (lon_j - lon_i) * (lat - lat_i) / (lat_j - lat_i) + lon_i
+            if lon < crossing_lon:
+                inside = not inside
+        j = i
+    return inside
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core.cache import invalidate
+from core.partitions import partitioning_enabled
+from core.retention import RETENTION_POLICIES, apply_retention, ensure_future_partitions, partition_table
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive (CSV gzip mensuel) puis retire des tables les mois plus anciens que la "
+        "durée de rétention ; sous PostgreSQL, crée aussi les partitions des mois à venir"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dataset', choices=sorted(RETENTION_POLICIES), action='append',
+            help='Jeu à traiter (répétable ; défaut: tous)',
+        )
+        parser.add_argument(
+            '--days', type=int,
+            help='Durée de rétention en jours (défaut: WEATHER_DATA_RETENTION_DAYS / NOTIFICATION_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Lignes lues et supprimées par lot (défaut: 10000)',
+        )
+        parser.add_argument(
+            '--months-ahead', type=int,
+            help='Partitions à créer d\'avance (PostgreSQL ; défaut: PARTITION_MONTHS_AHEAD)',
+        )
+        parser.add_argument(
+            '--partition', action='store_true',
+            help='Partitionner d\'abord les tables pas encore partitionnées (PostgreSQL, PARTITION_TABLES=True)',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Compter les lignes à archiver sans rien écrire ni supprimer',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size doit être positif')
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError('--days doit être positif')
+
+        dry_run = options['dry_run']
+        if options['partition'] and not partitioning_enabled(connection):
+            raise CommandError('--partition nécessite PostgreSQL et PARTITION_TABLES=True')
+        prefix = '[simulation] ' if dry_run else ''
+        archived_weather = False
+
+        for name in options['dataset'] or sorted(RETENTION_POLICIES):
+            policy = RETENTION_POLICIES[name]
+            if options['partition'] and not dry_run and partition_table(policy):
+                self.stdout.write(f"   Table partitionnée: {policy.table}")
+            if not dry_run:
+                for partition in ensure_future_partitions(policy, options['months_ahead']):
+                    self.stdout.write(f"   Partition prête: {partition}")
+
+            results = apply_retention(policy, options['days'], options['chunk_size'], dry_run)
+            total = sum(rows for _, rows in results)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {prefix}{name}: {total} lignes archivées "
+                f"(avant {policy.cutoff(options['days']):%Y-%m-%d})"
+            ))
+            for month, rows in results:
+                if rows:
+                    self.stdout.write(f"   - {month:%Y-%m}: {rows} → {policy.archive_path(month)}")
+            archived_weather = archived_weather or (name == 'weather' and total and not dry_run)
+
+        if archived_weather:
+            invalidate('weather')
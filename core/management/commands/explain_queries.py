@@ -0,0 +1,81 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from weather.models import WeatherData
+from alerts.models import Alert, AlertNotification, CommunityReport
+
+
+class Command(BaseCommand):
+    help = "Affiche le plan d'exécution (EXPLAIN) des requêtes les plus fréquentes de l'API"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--city',
+            type=str,
+            default='Dakar',
+            help='Ville utilisée dans les filtres',
+        )
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            default=1,
+            help='Utilisateur utilisé pour les requêtes de notifications',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Exécuter les requêtes (EXPLAIN ANALYZE, PostgreSQL uniquement)',
+        )
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options['analyze'] = True
+
+        self.stdout.write(f"🔎 Plans d'exécution ({connection.vendor})")
+
+        for label, queryset in self._hot_queries(options['city'], options['user_id']):
+            self.stdout.write(self.style.SUCCESS(f"\n▶ {label}"))
+            try:
+                self.stdout.write(queryset.explain(**explain_options))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"❌ {e}"))
+
+    def _hot_queries(self, city, user_id):
+        """Requêtes des vues publiques et des services, telles qu'elles sont exécutées"""
+        now = timezone.now()
+        start_of_day = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        active_window = Q(end_time__isnull=True) | Q(end_time__gte=now)
+
+        return [
+            ('weather_by_city : dernière lecture (city__iexact)',
+             WeatherData.objects.filter(city__iexact=city).order_by('-recorded_at')[:1]),
+            ('weather_history : plage de 7 jours',
+             WeatherData.objects.filter(
+                 city__iexact=city, recorded_at__gte=now - timedelta(days=7)
+             ).order_by('recorded_at')),
+            ("weather_stats : lectures d'aujourd'hui",
+             WeatherData.objects.filter(
+                 recorded_at__gte=start_of_day, recorded_at__lt=start_of_day + timedelta(days=1)
+             ).order_by('-temp_max')[:1]),
+            ('WeatherDataListView : filtre alert_level',
+             WeatherData.objects.filter(alert_level='red').order_by('-recorded_at')[:20]),
+            ('active_alerts : alertes en cours',
+             Alert.objects.filter(is_active=True, start_time__lte=now).filter(active_window)),
+            ('alert_statistics : alertes en cours par sévérité',
+             Alert.objects.filter(
+                 is_active=True, severity='red', start_time__lte=now
+             ).filter(active_window)),
+            ('user_notifications : notifications de l\'utilisateur',
+             AlertNotification.objects.filter(user_id=user_id).order_by('-sent_at')[:10]),
+            ('user_stats : notifications non lues',
+             AlertNotification.objects.filter(user_id=user_id, is_read=False)),
+            ('CommunityReportListCreateView : signalements vérifiés par ville',
+             CommunityReport.objects.filter(
+                 city=city, is_verified=True
+             ).order_by('-created_at')[:10]),
+            ('my_reports : signalements de l\'utilisateur',
+             CommunityReport.objects.filter(user_id=user_id).order_by('-created_at')[:10]),
+        ]
@@ -0,0 +1,77 @@
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.export import DATASETS, DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, ExportError, get_dataset, stream_export
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporte en flux les lectures météo ou les signalements (CSV, Parquet ou Arrow), "
+        "avec une mémoire bornée à un lot"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS), help='Jeu de données à exporter')
+        parser.add_argument(
+            '--format', dest='export_format', choices=sorted(EXPORT_FORMATS), default='csv',
+            help='Format de sortie (défaut: csv)',
+        )
+        parser.add_argument(
+            '-o', '--output', type=str, default='-',
+            help='Fichier de sortie (défaut: sortie standard)',
+        )
+        parser.add_argument('--city', type=str, help='Ne garder que cette ville')
+        parser.add_argument('--start', type=str, help='Date de début (AAAA-MM-JJ ou date-heure ISO)')
+        parser.add_argument('--end', type=str, help='Date de fin, incluse (AAAA-MM-JJ ou date-heure ISO)')
+        parser.add_argument(
+            '--filter', action='append', default=[], metavar='CLÉ=VALEUR',
+            help='Filtre propre au jeu (weather: alert_level, source ; reports: symptoms, verified)',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help=f'Lignes lues et écrites par lot (défaut: {DEFAULT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size doit être positif')
+
+        filters = {}
+        for item in options['filter']:
+            key, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f"Filtre invalide (CLÉ=VALEUR attendu): {item}")
+            filters[key] = value
+
+        stats = {}
+        try:
+            dataset = get_dataset(options['dataset'])
+            queryset = dataset.queryset(
+                city=options['city'], start=options['start'], end=options['end'], **filters
+            )
+            content = stream_export(
+                dataset, options['export_format'], queryset, options['chunk_size'], stats
+            )
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        start = time.monotonic()
+        to_stdout = options['output'] == '-'
+        output = sys.stdout.buffer if to_stdout else open(options['output'], 'wb')
+        written = 0
+        try:
+            for chunk in content:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if not to_stdout:
+                output.close()
+
+        # Le résumé ne doit pas se mêler aux données sur la sortie standard
+        report = self.stderr if to_stdout else self.stdout
+        elapsed = max(time.monotonic() - start, 1e-6)
+        rows = stats.get('rows', 0)
+        report.write(self.style.SUCCESS(
+            f"✅ {rows} lignes exportées ({written / 1e6:.1f} Mo) en {elapsed:.1f}s "
+            f"({rows / elapsed:,.0f} lignes/s)"
+        ))
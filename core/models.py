@@ -17,9 +17,46 @@ class SenegalCity(models.Model):
     latitude = models.FloatField()
     longitude = models.FloatField()
     is_priority = models.BooleanField(default=False)  # Villes prioritaires (Matam, Podor, etc.)
+    updated_at = models.DateTimeField(auto_now=True)  # Jeton de version de la liste des villes
     
     class Meta:
         verbose_name_plural = "Senegal Cities"
     
     def __str__(self):
-        return f"{self.name} ({self.region})"
\ No newline at end of file
+        return f"{self.name} ({self.region})"
+
+class ApiQuota(models.Model):
+    """
+    État partagé d'un seau à jetons limitant les appels vers une API externe
+
+    Une ligne par limiteur (core.quota.TokenBucketLimiter) ; les mises à jour
+    sont conditionnées par `revision` pour rester correctes entre processus.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    tokens = models.FloatField(default=0)
+    refilled_at = models.FloatField(default=0)  # Horodatage Unix du dernier remplissage
+    day = models.DateField(null=True, blank=True)  # Jour (UTC) des compteurs ci-dessous
+    used_today = models.PositiveIntegerField(default=0)
+    usage = models.JSONField(default=dict, blank=True)  # {priorité: {'allowed': n, 'denied': n}}
+    revision = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.tokens:.1f} jetons, {self.used_today} appels aujourd'hui"
+
+
+class LiveEvent(models.Model):
+    """
+    Événement diffusé aux clients connectés en direct (core.events)
+
+    Sert de bus entre processus avec le backend 'db' : la commande qui crée
+    une alerte insère une ligne, chaque serveur ASGI la relit et la pousse à
+    ses abonnés. Les lignes ne sont gardées que LIVE_EVENTS_RETENTION_HOURS.
+    """
+    event_type = models.CharField(max_length=50)
+    cities = models.JSONField(default=list, blank=True)  # Clés de villes normalisées ; vide = toutes
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.event_type} #{self.id}"
@@ -0,0 +1,180 @@
+"""
+Pagination par clé (keyset) et réponses JSON en flux pour les séries chronologiques
+
+Le curseur encode la dernière ligne servie (valeur de tri, id). La page
+suivante est lue par
+    WHERE tri <= valeur AND (tri < valeur OR id < id_vu) ORDER BY tri, id LIMIT n
+(sens inverse pour un tri croissant) : l'index sur la colonne de tri est
+parcouru à partir de la position, sans OFFSET ni COUNT(*). Une page profonde
+coûte donc le même prix que la première, et une ligne insérée entre deux
+pages ne décale pas les suivantes.
+
+La pagination ne va que vers l'avant (lien `next`), ce qui suffit aux
+graphiques et aux exports. stream_keyset() parcourt de la même façon
+toutes les lignes par lots, pour streaming_json_response().
+"""
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+
+def _ordering_fields(ordering):
+    """('-recorded_at', '-id') -> ('recorded_at', 'id', True)"""
+    field, tiebreak = ordering
+    descending = field.startswith('-')
+    if tiebreak.startswith('-') != descending:
+        raise ValueError("Les deux champs de tri doivent avoir le même sens")
+    return field.lstrip('-'), tiebreak.lstrip('-'), descending
+
+
+def keyset_filter(queryset, ordering, position):
+    """Lignes strictement après position = (valeur, id) dans l'ordre donné"""
+    queryset = queryset.order_by(*ordering)
+    if position is None:
+        return queryset
+    field, tiebreak, descending = _ordering_fields(ordering)
+    value, last_id = position
+    lookup = 'lt' if descending else 'gt'
+    # Borne large d'abord : c'est elle qui permet le parcours de l'index
+    return queryset.filter(
+        Q(**{f'{field}__{lookup}e': value}),
+        Q(**{f'{field}__{lookup}': value}) | Q(**{f'{tiebreak}__{lookup}': last_id}),
+    )
+
+
+def row_position(obj, ordering):
+    field, tiebreak, _ = _ordering_fields(ordering)
+    return getattr(obj, field), getattr(obj, tiebreak)
+
+
+def encode_cursor(position):
+    value, last_id = position
+    raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value, last_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, ordering):
+    """Position encodée dans un curseur ; NotFound s'il est invalide"""
+    field, tiebreak, _ = _ordering_fields(ordering)
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        value, last_id = json.loads(raw)
+        return (
+            model._meta.get_field(field).to_python(value),
+            model._meta.get_field(tiebreak).to_python(last_id),
+        )
+    except (TypeError, ValueError, UnicodeDecodeError, ValidationError):
+        raise NotFound('Curseur invalide')
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par curseur sur (champ de tri, id)
+
+    La vue déclare `keyset_ordering` (par défaut ('-recorded_at', '-id')).
+    Réponse : {'next': <url ou null>, 'results': [...]}.
+    """
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('-recorded_at', '-id')
+
+    def __init__(self, ordering=None, page_size=None, max_page_size=None):
+        if ordering is not None:
+            self.ordering = ordering
+        if page_size is not None:
+            self.page_size = page_size
+        if max_page_size is not None:
+            self.max_page_size = max_page_size
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = getattr(view, 'keyset_ordering', None) or self.ordering
+        self.ordering = ordering
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        position = decode_cursor(cursor, queryset.model, ordering) if cursor else None
+        size = self.get_page_size(request)
+
+        # Une ligne de plus que la page : savoir s'il y a une suite sans COUNT(*)
+        rows = list(keyset_filter(queryset, ordering, position)[:size + 1])
+        self.has_next = len(rows) > size
+        rows = rows[:size]
+        self.next_position = row_position(rows[-1], ordering) if self.has_next else None
+        return rows
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+def stream_keyset(queryset, ordering, batch_size=2000):
+    """
+    Toutes les lignes par lots successifs (listes), lues par clé
+
+    Jamais plus d'un lot en mémoire, et aucun curseur de base de données
+    gardé ouvert entre deux lots.
+    """
+    position = None
+    while True:
+        batch = list(keyset_filter(queryset, ordering, position)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        position = row_position(batch[-1], ordering)
+
+
+def streaming_json_response(batches, serializer_class, envelope=None, key='results', context=None):
+    """
+    Réponse JSON écrite au fil des lots : {<envelope>, key: [...], "data_points": n}
+
+    batches : itérable de listes d'objets (stream_keyset). Chaque lot est
+    sérialisé puis envoyé avant la lecture du suivant.
+    """
+    encoder = JSONEncoder(ensure_ascii=False)
+
+    def content():
+        head = encoder.encode(dict(envelope or {}))[:-1]
+        yield head + (', ' if envelope else '') + encoder.encode(key) + ': ['
+        count = 0
+        for batch in batches:
+            data = serializer_class(batch, many=True, context=context or {}).data
+            if not data:
+                continue
+            yield (', ' if count else '') + ', '.join(encoder.encode(item) for item in data)
+            count += len(data)
+        yield '], "data_points": ' + str(count) + '}'
+
+    return StreamingHttpResponse(content(), content_type='application/json')
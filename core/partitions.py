@@ -0,0 +1,169 @@
+"""
+Partitionnement mensuel natif (PostgreSQL) des tables chronologiques
+
+Une table partitionnée par plage (PARTITION BY RANGE sur sa colonne de date)
+a une partition par mois, `<table>_pAAAAMM`, plus une partition par défaut
+pour les lignes hors plage. Chaque partition a ses propres index : leur
+profondeur ne dépend que du volume d'un mois, et une partition archivée se
+supprime en un DROP au lieu d'un DELETE.
+
+Django ne gère pas ces tables lui-même : convert_to_partitioned() est appelé
+depuis une migration (ou par `apply_retention --partition` sur une base déjà
+migrée), et la commande apply_retention crée à l'avance les partitions des
+mois à venir. Sur les autres bases, tout est sans effet.
+
+La conversion n'a lieu qu'avec PARTITION_TABLES=True : elle réécrit la
+table entière et doit d'abord être validée sur une copie de la base de
+production. Sans partitionnement, la rétention fonctionne par DELETE.
+
+Contraintes de PostgreSQL : la clé primaire devient (id, <date>) et chaque
+contrainte d'unicité doit contenir la colonne de date.
+"""
+from datetime import date, datetime, timezone as dt_timezone
+from django.conf import settings
+
+
+def is_postgresql(connection):
+    return connection.vendor == 'postgresql'
+
+
+def partitioning_enabled(connection):
+    return is_postgresql(connection) and bool(getattr(settings, 'PARTITION_TABLES', False))
+
+
+def month_start(value):
+    """Premier jour du mois (date) d'une date ou date-heure"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def _bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc).isoformat()
+
+
+def is_partitioned(connection, table):
+    if not is_postgresql(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def create_partition(connection, table, month):
+    """Partition du mois (sans effet si elle existe déjà)"""
+    name = partition_name(table, month)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{_bound(month)}') TO ('{_bound(add_months(month, 1))}')"
+        )
+    return name
+
+
+def ensure_partitions(connection, table, first_month, last_month):
+    """Partitions de first_month à last_month inclus ; retourne leurs noms"""
+    names = []
+    month = first_month
+    while month <= last_month:
+        names.append(create_partition(connection, table, month))
+        month = add_months(month, 1)
+    return names
+
+
+def drop_partition_if_empty(connection, table, month):
+    """Détacher puis supprimer la partition d'un mois vide ; True si supprimée"""
+    name = partition_name(table, month)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is None:
+            return False
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM "{name}")')
+        if cursor.fetchone()[0]:
+            return False
+        cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+        cursor.execute(f'DROP TABLE "{name}"')
+    return True
+
+
+def convert_to_partitioned(schema_editor, table, column, months_ahead=3):
+    """
+    Remplacer une table ordinaire par une table partitionnée par mois sur column
+
+    Les lignes, index, contraintes et la séquence d'id sont repris. Les
+    index et contraintes gardent leur nom : les migrations suivantes de
+    Django continuent de s'appliquer. Retourne True si la table a été convertie.
+    """
+    connection = schema_editor.connection
+    if not partitioning_enabled(connection) or is_partitioned(connection, table):
+        return False
+
+    old_table = f"{table}_unpartitioned"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE confrelid = %s::regclass", [table]
+        )
+        referencing = [row[0] for row in cursor.fetchall()]
+        if referencing:
+            raise RuntimeError(
+                f"{table} est référencée par des clés étrangères ({', '.join(referencing)}) : "
+                "partitionnement impossible"
+            )
+
+        # Définitions à recréer, lues avant le renommage (noms de table intacts)
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f', 'c')",
+            [table],
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+            [table, table],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0), MIN("{column}") FROM "{table}"')
+        max_id, first_value = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old_table}"')
+        cursor.execute(
+            f'CREATE TABLE "{table}" (LIKE "{old_table}" INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE ("{column}")'
+        )
+        cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+
+        # Une partition par mois déjà présent en base, et quelques mois d'avance
+        today = datetime.now(dt_timezone.utc).date()
+        first_month = month_start(first_value) if first_value else month_start(today)
+        ensure_partitions(connection, table, first_month, add_months(month_start(today), months_ahead))
+
+        cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{old_table}"')
+        cursor.execute(f'DROP TABLE "{old_table}" CASCADE')
+
+        # Séquence d'id propre à la nouvelle table (l'identité ne passe pas par LIKE)
+        sequence = f"{table}_id_seq"
+        cursor.execute(f'CREATE SEQUENCE "{sequence}" START WITH {max_id + 1} OWNED BY "{table}".id')
+        cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id SET DEFAULT nextval(\'"{sequence}"\')')
+
+        for name, kind, definition in constraints:
+            if kind == 'p':
+                definition = f'PRIMARY KEY (id, "{column}")'
+            elif kind == 'u' and column not in definition:
+                raise RuntimeError(f"Contrainte {name} sans {column} : incompatible avec le partitionnement")
+            cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+
+        for name, definition in indexes:
+            cursor.execute(definition)
+    return True
@@ -0,0 +1,308 @@
+"""
+Limiteur d'appels partagé entre processus pour les API externes (seau à jetons)
+
+Le seau se remplit de rate_per_minute jetons par minute jusqu'à burst ; chaque
+appel consomme un jeton. Un plafond journalier optionnel s'y ajoute. L'état
+vit en base (ApiQuota, mises à jour conditionnelles) ou dans Redis (script
+Lua atomique) : cron, workers web et commandes partagent le même budget.
+
+Les appels ont une classe de priorité. Une classe moins prioritaire ne peut
+pas descendre le seau sous sa réserve (fraction de burst, et de la limite
+journalière) et attend moins longtemps qu'un jeton se libère : le
+rafraîchissement planifié passe toujours avant les appels de test.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from .models import ApiQuota
+
+# reserve : part du seau (et du plafond journalier) inaccessible à la classe
+# max_wait : attente maximale d'un jeton (secondes) avant refus
+PRIORITY_CLASSES = {
+    'scheduled': {'reserve': 0.0, 'max_wait': 10.0},    # Rafraîchissement planifié des villes prioritaires
+    'interactive': {'reserve': 0.25, 'max_wait': 1.0},  # Requêtes d'utilisateurs, mises à jour manuelles
+    'test': {'reserve': 0.5, 'max_wait': 0.0},          # Appels de test
+}
+DEFAULT_PRIORITY = 'interactive'
+
+_current_priority = contextvars.ContextVar('quota_priority', default=DEFAULT_PRIORITY)
+
+
+class QuotaExceeded(Exception):
+    """Budget d'appels épuisé pour cette classe de priorité"""
+
+    def __init__(self, name, priority, retry_after):
+        self.name = name
+        self.priority = priority
+        self.retry_after = retry_after
+        super().__init__(
+            f"Quota {name} épuisé pour la priorité '{priority}' (nouvel essai dans {retry_after:.0f}s)"
+        )
+
+
+@contextmanager
+def quota_priority(priority):
+    """Classe de priorité des appels faits dans ce bloc (et ses threads, si le contexte est copié)"""
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Priorité inconnue: {priority}")
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority():
+    return _current_priority.get()
+
+
+def _today():
+    return datetime.now(dt_timezone.utc).date()
+
+
+def _seconds_until_tomorrow():
+    now = datetime.now(dt_timezone.utc)
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=dt_timezone.utc)
+    return (tomorrow - now).total_seconds()
+
+
+class DatabaseQuotaBackend:
+    """
+    État du seau dans la table ApiQuota
+
+    Lecture, calcul, puis UPDATE ... WHERE revision = <lue> : si un autre
+    processus est passé entre-temps, on recommence. Aucun verrou de ligne
+    n'est nécessaire (SQLite n'en a pas).
+    """
+
+    def __init__(self, max_attempts=20):
+        self.max_attempts = max_attempts
+
+    def _load(self, name, capacity):
+        quota, _ = ApiQuota.objects.get_or_create(
+            name=name, defaults={'tokens': capacity, 'refilled_at': time.time(), 'day': _today()}
+        )
+        return quota
+
+    def _compare_and_set(self, quota, **values):
+        return ApiQuota.objects.filter(pk=quota.pk, revision=quota.revision).update(
+            revision=F('revision') + 1, updated_at=timezone.now(), **values
+        )
+
+    def take(self, name, cost, priority, capacity, rate, floor, daily_cap):
+        """
+        Consommer cost jetons si possible
+
+        Retourne 0 si l'appel est accordé, sinon le délai (secondes) avant
+        qu'il puisse l'être.
+        """
+        for _ in range(self.max_attempts):
+            quota = self._load(name, capacity)
+            now = time.time()
+            today = _today()
+            tokens = min(capacity, quota.tokens + max(0.0, now - quota.refilled_at) * rate)
+            used_today, usage = (quota.used_today, quota.usage) if quota.day == today else (0, {})
+
+            if daily_cap and used_today + cost > daily_cap:
+                retry_after = _seconds_until_tomorrow()
+            elif tokens - cost < floor:
+                retry_after = (floor + cost - tokens) / rate if rate > 0 else _seconds_until_tomorrow()
+            else:
+                retry_after = 0
+                tokens -= cost
+                used_today += cost
+                counters = usage.setdefault(priority, {'allowed': 0, 'denied': 0})
+                counters['allowed'] += 1
+
+            if self._compare_and_set(
+                quota, tokens=tokens, refilled_at=now, day=today, used_today=used_today, usage=usage
+            ):
+                return retry_after
+
+        # Trop de concurrence : réessayer un peu plus tard
+        return 0.05
+
+    def record_denied(self, name, priority, capacity):
+        for _ in range(self.max_attempts):
+            quota = self._load(name, capacity)
+            today = _today()
+            usage = quota.usage if quota.day == today else {}
+            used_today = quota.used_today if quota.day == today else 0
+            counters = usage.setdefault(priority, {'allowed': 0, 'denied': 0})
+            counters['denied'] += 1
+            if self._compare_and_set(quota, day=today, used_today=used_today, usage=usage):
+                return
+
+    def state(self, name, capacity, rate):
+        quota = self._load(name, capacity)
+        fresh = quota.day == _today()
+        return {
+            'tokens': min(capacity, quota.tokens + max(0.0, time.time() - quota.refilled_at) * rate),
+            'used_today': quota.used_today if fresh else 0,
+            'usage': quota.usage if fresh else {},
+        }
+
+
+class RedisQuotaBackend:
+    """État du seau dans Redis, mis à jour par un script Lua atomique"""
+
+    TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local floor = tonumber(ARGV[4])
+local daily_cap = tonumber(ARGV[5])
+local now = tonumber(ARGV[6])
+local today = ARGV[7]
+local priority = ARGV[8]
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'refilled_at', 'day', 'used_today')
+local tokens = tonumber(state[1]) or capacity
+local refilled_at = tonumber(state[2]) or now
+local used_today = 0
+if state[3] == today then used_today = tonumber(state[4]) or 0 end
+tokens = math.min(capacity, tokens + math.max(0, now - refilled_at) * rate)
+
+local status = 'ok'
+local retry_after = 0
+if daily_cap > 0 and used_today + cost > daily_cap then
+    status = 'daily'
+elseif tokens - cost < floor then
+    status = 'wait'
+    retry_after = (floor + cost - tokens) / rate
+else
+    tokens = tokens - cost
+    used_today = used_today + cost
+    redis.call('HINCRBY', KEYS[2], priority .. ':allowed', 1)
+    redis.call('EXPIRE', KEYS[2], 172800)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'refilled_at', tostring(now),
+    'day', today, 'used_today', tostring(used_today))
+return {status, tostring(retry_after)}
+"""
+
+    def __init__(self, url):
+        import redis  # Dépendance optionnelle, seulement avec ce backend
+
+        self.client = redis.Redis.from_url(url)
+        self._take = self.client.register_script(self.TAKE_SCRIPT)
+
+    def _keys(self, name):
+        return f"quota:{name}", f"quota:{name}:usage:{_today().isoformat()}"
+
+    def take(self, name, cost, priority, capacity, rate, floor, daily_cap):
+        status, retry_after = self._take(
+            keys=list(self._keys(name)),
+            args=[capacity, rate, cost, floor, daily_cap or 0, time.time(), _today().isoformat(), priority],
+        )
+        status = status.decode() if isinstance(status, bytes) else status
+        if status == 'ok':
+            return 0
+        if status == 'daily' or rate <= 0:
+            return _seconds_until_tomorrow()
+        return float(retry_after)
+
+    def record_denied(self, name, priority, capacity):
+        usage_key = self._keys(name)[1]
+        pipeline = self.client.pipeline()
+        pipeline.hincrby(usage_key, f"{priority}:denied", 1)
+        pipeline.expire(usage_key, 172800)
+        pipeline.execute()
+
+    def state(self, name, capacity, rate):
+        bucket_key, usage_key = self._keys(name)
+        tokens, refilled_at, day, used_today = self.client.hmget(
+            bucket_key, 'tokens', 'refilled_at', 'day', 'used_today'
+        )
+        fresh = day is not None and day.decode() == _today().isoformat()
+        if tokens is None:
+            tokens = capacity
+        else:
+            tokens = min(capacity, float(tokens) + max(0.0, time.time() - float(refilled_at)) * rate)
+
+        usage = {}
+        for field, count in self.client.hgetall(usage_key).items():
+            priority, outcome = field.decode().split(':', 1)
+            usage.setdefault(priority, {'allowed': 0, 'denied': 0})[outcome] = int(count)
+
+        return {
+            'tokens': tokens,
+            'used_today': int(used_today) if fresh and used_today is not None else 0,
+            'usage': usage,
+        }
+
+
+def build_quota_backend():
+    """Backend Redis si WEATHER_API_QUOTA_BACKEND='redis' (ou REDIS_URL défini), base sinon"""
+    backend = getattr(settings, 'WEATHER_API_QUOTA_BACKEND', '') or (
+        'redis' if getattr(settings, 'REDIS_URL', '') else 'db'
+    )
+    if backend == 'redis':
+        return RedisQuotaBackend(settings.REDIS_URL)
+    return DatabaseQuotaBackend()
+
+
+class TokenBucketLimiter:
+    """
+    Seau à jetons nommé, partagé par tous les processus
+
+    acquire() attend (au plus max_wait de la classe de priorité) qu'un jeton
+    soit disponible au-dessus de la réserve de la classe, sinon lève
+    QuotaExceeded.
+    """
+
+    def __init__(self, name, rate_per_minute, burst, daily_limit=0, backend=None):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst)
+        self.daily_limit = int(daily_limit or 0)
+        self._backend = backend
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = build_quota_backend()
+        return self._backend
+
+    def acquire(self, cost=1, priority=None):
+        priority = priority or current_priority()
+        policy = PRIORITY_CLASSES[priority]
+        floor = self.capacity * policy['reserve']
+        daily_cap = int(self.daily_limit * (1 - policy['reserve'])) if self.daily_limit else 0
+        deadline = time.monotonic() + policy['max_wait']
+
+        while True:
+            retry_after = self.backend.take(self.name, cost, priority, self.capacity, self.rate, floor, daily_cap)
+            if retry_after <= 0:
+                return
+            if time.monotonic() + retry_after > deadline:
+                self.backend.record_denied(self.name, priority, self.capacity)
+                raise QuotaExceeded(self.name, priority, retry_after)
+            time.sleep(retry_after)
+
+    def status(self):
+        """Budget restant et consommation du jour par classe de priorité"""
+        state = self.backend.state(self.name, self.capacity, self.rate)
+        return {
+            'name': self.name,
+            'backend': type(self.backend).__name__,
+            'tokens_available': round(state['tokens'], 2),
+            'burst': self.capacity,
+            'rate_per_minute': round(self.rate * 60, 2),
+            'daily_limit': self.daily_limit or None,
+            'used_today': state['used_today'],
+            'remaining_today': max(0, self.daily_limit - state['used_today']) if self.daily_limit else None,
+            'priorities': {
+                priority: {
+                    'reserve': policy['reserve'],
+                    'max_wait': policy['max_wait'],
+                    **state['usage'].get(priority, {'allowed': 0, 'denied': 0}),
+                }
+                for priority, policy in PRIORITY_CLASSES.items()
+            },
+        }
@@ -0,0 +1,149 @@
+"""
+Registre des réglages modifiables à chaud (table AppSettings)
+
+Tous les réglages sont chargés en une requête et gardés en mémoire : une
+lecture ne coûte qu'un accès à un dictionnaire. Ils sont rechargés :
+- immédiatement dans le processus courant quand un AppSettings est
+  enregistré ou supprimé (signaux) ;
+- dans les autres processus, au plus CHECK_INTERVAL secondes plus tard :
+  un agrégat (date de dernière modification, nombre de lignes) sert de
+  numéro de version et n'est relu qu'à cette fréquence.
+
+Les clés peuvent être déclinées par région ou par ville :
+`weather.alert.red`, `weather.alert.red@region:Matam`,
+`weather.alert.red@city:Podor` ; get_scoped_*() cherche la ville, puis sa
+région, puis la clé globale.
+"""
+import json
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import invalidate
+from .cities import city_index
+from .models import AppSettings
+
+logger = logging.getLogger(__name__)
+
+TRUE_VALUES = ('true', '1', 'yes', 'on', 'oui')
+FALSE_VALUES = ('false', '0', 'no', 'off', 'non', '')
+
+
+class SettingsRegistry:
+    """Réglages AppSettings en mémoire, avec accesseurs typés"""
+
+    def __init__(self):
+        self.check_interval = float(getattr(settings, 'APP_SETTINGS_CHECK_INTERVAL', 30))
+        self._values = None
+        self._version = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        state = AppSettings.objects.aggregate(last_update=Max('updated_at'), count=Count('id'))
+        return state['last_update'], state['count']
+
+    def _ensure_loaded(self):
+        now = time.monotonic()
+        if self._values is not None and now - self._checked_at < self.check_interval:
+            return self._values
+
+        with self._lock:
+            if self._values is not None and now - self._checked_at < self.check_interval:
+                return self._values
+
+            version = self._current_version()
+            if self._values is None or version != self._version:
+                self._values = dict(AppSettings.objects.values_list('key', 'value'))
+                self._version = version
+            self._checked_at = now
+            return self._values
+
+    def invalidate(self):
+        """Forcer le rechargement à la prochaine lecture"""
+        with self._lock:
+            self._values = None
+
+    @property
+    def version(self):
+        """Version des réglages chargés (dernière modification, nombre de lignes)"""
+        self._ensure_loaded()
+        return self._version
+
+    def all(self):
+        return dict(self._ensure_loaded())
+
+    def get(self, key, default=None):
+        """Valeur brute (texte) ou default"""
+        return self._ensure_loaded().get(key, default)
+
+    def _typed(self, key, default, convert):
+        value = self.get(key)
+        if value is None:
+            return default
+        try:
+            return convert(value)
+        except (TypeError, ValueError):
+            logger.warning(f"Réglage {key} invalide ({value!r}), valeur par défaut {default!r} utilisée")
+            return default
+
+    def get_str(self, key, default=''):
+        return self._typed(key, default, str)
+
+    def get_int(self, key, default=0):
+        return self._typed(key, default, lambda value: int(value.strip()))
+
+    def get_float(self, key, default=0.0):
+        return self._typed(key, default, lambda value: float(value.strip().replace(',', '.')))
+
+    def get_bool(self, key, default=False):
+        def convert(value):
+            value = value.strip().lower()
+            if value in TRUE_VALUES:
+                return True
+            if value in FALSE_VALUES:
+                return False
+            raise ValueError(value)
+        return self._typed(key, default, convert)
+
+    def get_json(self, key, default=None):
+        return self._typed(key, default, json.loads)
+
+    def _scoped_keys(self, key, city=None):
+        keys = []
+        if city:
+            keys.append(f"{key}@city:{city}")
+            region = city_index.region_of(city)
+            if region:
+                keys.append(f"{key}@region:{region}")
+        keys.append(key)
+        return keys
+
+    def get_scoped(self, key, city=None, default=None):
+        """Valeur de la ville, sinon de sa région, sinon globale"""
+        values = self._ensure_loaded()
+        for scoped_key in self._scoped_keys(key, city):
+            if scoped_key in values:
+                return scoped_key, values[scoped_key]
+        return None, default
+
+    def get_scoped_float(self, key, city=None, default=0.0):
+        scoped_key, value = self.get_scoped(key, city)
+        if scoped_key is None:
+            return default
+        return self._typed(scoped_key, default, lambda raw: float(raw.strip().replace(',', '.')))
+
+
+@receiver(post_save, sender=AppSettings)
+@receiver(post_delete, sender=AppSettings)
+def app_settings_changed(sender, **kwargs):
+    """Recharger le registre (et invalider les réponses qui en dépendent)"""
+    registry.invalidate()
+    invalidate('weather', 'forecast', 'alerts')
+
+
+# Instance globale du registre
+registry = SettingsRegistry()
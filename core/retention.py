@@ -0,0 +1,229 @@
+"""
+Rétention des tables qui ne font que grandir (lectures météo, notifications)
+
+Les mois entièrement plus anciens que la durée de rétention sont écrits dans
+une archive CSV compressée, un fichier par mois
+(`<ARCHIVE_ROOT>/<jeu>/AAAA-MM.csv.gz`), puis supprimés de la table. Sous
+PostgreSQL, la partition du mois (core.partitions), alors vide, est
+détachée et supprimée. La table active ne garde ainsi que quelques mois,
+quelle que soit l'ancienneté du projet. Les agrégats horaires et
+journaliers (WeatherHourly, WeatherDaily) sont conservés.
+
+Un mois n'est supprimé qu'une fois son archive écrite et synchronisée sur
+disque. Des lignes arrivées plus tard pour un mois déjà archivé sont
+ajoutées au même fichier (nouveau membre gzip, sans en-tête). Après une
+interruption entre l'écriture et la suppression, une ligne peut figurer
+deux fois dans l'archive : read_archive() dédoublonne sur l'id.
+"""
+import csv
+import gzip
+import io
+import itertools
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .export import DATASETS, ExportDataset
+from .partitions import (
+    add_months, convert_to_partitioned, drop_partition_if_empty, ensure_partitions,
+    is_partitioned, month_start
+)
+
+
+class RetentionPolicy:
+    """Jeu de données, durée de rétention (réglage, jours) et archives"""
+
+    def __init__(self, name, dataset, setting, default_days):
+        self.name = name
+        self.dataset = dataset
+        self.setting = setting
+        self.default_days = default_days
+
+    @property
+    def model(self):
+        return self.dataset.model
+
+    @property
+    def table(self):
+        return self.model._meta.db_table
+
+    @property
+    def retention_days(self):
+        return int(getattr(settings, self.setting, self.default_days))
+
+    @property
+    def archive_dir(self):
+        return Path(getattr(settings, 'ARCHIVE_ROOT', Path(settings.BASE_DIR) / 'archives')) / self.name
+
+    def archive_path(self, month):
+        return self.archive_dir / f"{month:%Y-%m}.csv.gz"
+
+    def cutoff(self, days=None, now=None):
+        """Début du mois le plus ancien conservé : seuls des mois entiers sont archivés"""
+        now = now or timezone.now()
+        oldest_kept = (now - timedelta(days=self.retention_days if days is None else days)).astimezone(dt_timezone.utc)
+        return _month_datetime(month_start(oldest_kept))
+
+
+RETENTION_POLICIES = {
+    'weather': RetentionPolicy('weather', DATASETS['weather'], 'WEATHER_DATA_RETENTION_DAYS', 180),
+    'notifications': RetentionPolicy(
+        'notifications',
+        ExportDataset(
+            'notifications', 'alerts.AlertNotification', 'sent_at',
+            columns=[
+                ('id', 'int64'), ('alert_id', 'int64'), ('user_id', 'int64'),
+                ('sent_via', 'string'), ('is_read', 'bool'), ('sent_at', 'timestamp'),
+            ],
+        ),
+        'NOTIFICATION_RETENTION_DAYS', 365,
+    ),
+}
+
+
+def _month_datetime(month):
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def expired_months(policy, cutoff):
+    """Mois (dates du 1er) ayant encore des lignes avant cutoff"""
+    first = policy.model.objects.filter(
+        **{f'{policy.dataset.date_field}__lt': cutoff}
+    ).order_by().aggregate(first=Min(policy.dataset.date_field))['first']
+    if first is None:
+        return []
+    months = []
+    month = month_start(first.astimezone(dt_timezone.utc))
+    while _month_datetime(month) < cutoff:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def _write_archive(policy, month, rows):
+    """Ajouter des lignes (tuples) à l'archive du mois ; retourne leurs ids"""
+    first = next(rows, None)
+    if first is None:
+        return []
+    path = policy.archive_path(month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    is_new = not path.exists()
+
+    ids = []
+    text = io.StringIO()
+    writer = csv.writer(text)
+    with open(path, 'ab') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+        if is_new:
+            writer.writerow(policy.dataset.column_names)
+        for row in itertools.chain([first], rows):
+            writer.writerow(row)
+            ids.append(row[0])
+            if text.tell() > 1 << 20:
+                archive.write(text.getvalue().encode())
+                text.seek(0)
+                text.truncate()
+        archive.write(text.getvalue().encode())
+        archive.close()  # Écrit la fin du membre gzip avant la synchronisation
+        raw.flush()
+        os.fsync(raw.fileno())
+    return ids
+
+
+def archive_month(policy, month, chunk_size=10000, dry_run=False):
+    """
+    Archiver puis supprimer les lignes d'un mois ; retourne le nombre de lignes
+
+    Sous PostgreSQL, la partition du mois est ensuite supprimée si elle est vide.
+    """
+    date_field = policy.dataset.date_field
+    rows = policy.dataset.queryset().filter(**{
+        f'{date_field}__gte': _month_datetime(month),
+        f'{date_field}__lt': _month_datetime(add_months(month, 1)),
+    })
+    if dry_run:
+        return rows.count()
+
+    ids = _write_archive(policy, month, rows.iterator(chunk_size=chunk_size))
+    with transaction.atomic():
+        for i in range(0, len(ids), chunk_size):
+            policy.model.objects.filter(id__in=ids[i:i + chunk_size]).delete()
+    if is_partitioned(connection, policy.table):
+        drop_partition_if_empty(connection, policy.table, month)
+    return len(ids)
+
+
+def apply_retention(policy, days=None, chunk_size=10000, dry_run=False):
+    """Archiver tous les mois expirés ; retourne [(mois, lignes)]"""
+    cutoff = policy.cutoff(days)
+    return [
+        (month, archive_month(policy, month, chunk_size, dry_run))
+        for month in expired_months(policy, cutoff)
+    ]
+
+
+def ensure_future_partitions(policy, months_ahead=None):
+    """Sous PostgreSQL, créer d'avance les partitions des prochains mois"""
+    if not is_partitioned(connection, policy.table):
+        return []
+    months_ahead = months_ahead if months_ahead is not None else getattr(settings, 'PARTITION_MONTHS_AHEAD', 3)
+    this_month = month_start(datetime.now(dt_timezone.utc))
+    return ensure_partitions(connection, policy.table, this_month, add_months(this_month, months_ahead))
+
+
+def partition_table(policy):
+    """Convertir la table en table partitionnée (PARTITION_TABLES, PostgreSQL) ; True si convertie"""
+    with connection.schema_editor() as schema_editor:
+        return convert_to_partitioned(
+            schema_editor, policy.table, policy.dataset.date_field,
+            getattr(settings, 'PARTITION_MONTHS_AHEAD', 3)
+        )
+
+
+def _parse_value(kind, value):
+    if kind == 'int64':
+        return int(value)
+    if kind == 'float64':
+        return float(value)
+    if kind == 'bool':
+        return value == 'True'
+    if kind == 'timestamp':
+        moment = parse_datetime(value)
+        return moment if timezone.is_aware(moment) else moment.replace(tzinfo=dt_timezone.utc)
+    return value
+
+
+def read_archive(policy, start, end=None, city=None):
+    """
+    Lignes archivées (dicts typés) entre start et end, mois par mois, triées par date puis id
+
+    Ne lit que les fichiers des mois concernés ; chaque mois est filtré puis
+    trié en mémoire.
+    """
+    date_field = policy.dataset.date_field
+    columns = policy.dataset.columns
+    header = policy.dataset.column_names
+    end = end or timezone.now()
+    city = city.lower() if city else None
+
+    month = month_start(start.astimezone(dt_timezone.utc))
+    while _month_datetime(month) < end:
+        path = policy.archive_path(month)
+        month = add_months(month, 1)
+        if not path.exists():
+            continue
+
+        rows = {}
+        with gzip.open(path, 'rt', newline='') as archive:
+            for values in csv.reader(archive):
+                if values == header:
+                    continue
+                row = {name: _parse_value(kind, value) for (name, kind), value in zip(columns, values)}
+                if city and row.get('city', '').lower() != city:
+                    continue
+                if start <= row[date_field] < end:
+                    rows[row['id']] = row
+        yield from sorted(rows.values(), key=lambda row: (row[date_field], row['id']))
@@ -1,3 +1,261 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta, timezone as dt_timezone
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from weather.models import WeatherData
+from weather.services import weather_service
+from .cities import NearestCityIndex
+from .geo import covering_geohashes, encode_geohash, geohash_cell_size, point_in_polygon
+from .models import ApiQuota, SenegalCity
+from .partitions import month_start
+from .quota import DatabaseQuotaBackend, QuotaExceeded, TokenBucketLimiter, quota_priority
+from .retention import (
+    RETENTION_POLICIES, _month_datetime, _write_archive, apply_retention, expired_months, read_archive
+)
 
-# Create your tests here.
+
+class NearestCityIndexTests(TestCase):
+    def setUp(self):
+        SenegalCity.objects.create(name='Nord', region='A', latitude=14.51, longitude=-16.0)
+        SenegalCity.objects.create(name='Sud', region='B', latitude=14.01, longitude=-16.0)
+        self.index = NearestCityIndex(cell_size=0.5)
+
+    def test_nearest_city_across_cell_boundary(self):
+        # Point dans la cellule de 'Sud', mais à 2 km de 'Nord' (cellule voisine)
+        nearest = self.index.nearest(14.49, -16.0)
+        self.assertEqual(nearest.name, 'Nord')
+        self.assertLess(nearest.distance_km, 3)
+
+    def test_max_distance(self):
+        self.assertEqual(self.index.nearest(14.49, -16.0, max_distance_km=30).name, 'Nord')
+        self.assertIsNone(self.index.nearest(15.5, -16.0, max_distance_km=30))
+
+
+class GeoTests(SimpleTestCase):
+    """Couverture geohash des rectangles et appartenance à un polygone"""
+
+    def _assert_covered(self, min_lat, min_lon, max_lat, max_lon, max_cells=32):
+        prefixes = covering_geohashes(min_lat, min_lon, max_lat, max_lon, max_cells=max_cells)
+        self.assertLessEqual(len(prefixes), max_cells)
+        steps = 12
+        for i in range(steps + 1):
+            for j in range(steps + 1):
+                lat = min_lat + (max_lat - min_lat) * i / steps
+                lon = min_lon + (max_lon - min_lon) * j / steps
+                geohash = encode_geohash(lat, lon)
+                self.assertTrue(
+                    any(geohash.startswith(prefix) for prefix in prefixes),
+                    f"({lat}, {lon}) hors de la couverture {prefixes}"
+                )
+
+    def test_cover_straddling_cell_edges(self):
+        # Bords de cellules de précision 5 : le rectangle déborde d'un cheveu sur les voisines
+        cell_height, cell_width = geohash_cell_size(5)
+        edge_lat = -90 + cell_height * round((14.69 + 90) / cell_height)
+        edge_lon = -180 + cell_width * round((-17.44 + 180) / cell_width)
+        for margin in (1e-9, 1e-4, cell_height / 2):
+            self._assert_covered(edge_lat - margin, edge_lon - margin, edge_lat + margin, edge_lon + margin)
+        # Rectangle qui se termine exactement sur un bord
+        self._assert_covered(edge_lat - cell_height, edge_lon - cell_width, edge_lat, edge_lon)
+
+    def test_cover_size_bounded(self):
+        for size in (0.001, 0.01, 0.1, 0.5, 1.0, 3.0):
+            for max_cells in (4, 8, 32):
+                self._assert_covered(14.6, -17.5, 14.6 + size, -17.5 + size * 1.7, max_cells=max_cells)
+
+    def test_point_in_polygon(self):
+        # Polygone en L : l'encoche n'en fait pas partie
+        polygon = [(0, 0), (0, 2), (1, 2), (1, 1), (2, 1), (2, 0)]
+        self.assertTrue(point_in_polygon(0.5, 0.5, polygon))
+        self.assertTrue(point_in_polygon(0.5, 1.5, polygon))
+        self.assertTrue(point_in_polygon(1.5, 0.5, polygon))
+        self.assertFalse(point_in_polygon(1.5, 1.5, polygon))
+        self.assertFalse(point_in_polygon(-0.1, 0.5, polygon))
+        self.assertFalse(point_in_polygon(0.5, 2.1, polygon))
+
+
+class TokenBucketLimiterTests(TestCase):
+    """Réserves par classe de priorité et mises à jour conditionnelles du seau"""
+
+    def setUp(self):
+        # Sans remplissage : un refus n'attend jamais
+        self.backend = DatabaseQuotaBackend()
+        self.limiter = TokenBucketLimiter('owm-test', rate_per_minute=0, burst=4, backend=self.backend)
+
+    def test_priority_reserves(self):
+        with quota_priority('test'):
+            self.limiter.acquire()
+            self.limiter.acquire()
+            # Les appels de test laissent la moitié du seau
+            with self.assertRaises(QuotaExceeded):
+                self.limiter.acquire()
+
+        self.limiter.acquire(priority='interactive')
+        with self.assertRaises(QuotaExceeded):
+            self.limiter.acquire(priority='interactive')
+
+        # Le rafraîchissement planifié utilise la réserve
+        self.limiter.acquire(priority='scheduled')
+        with self.assertRaises(QuotaExceeded):
+            self.limiter.acquire(priority='scheduled')
+
+        priorities = self.limiter.status()['priorities']
+        self.assertEqual((priorities['test']['allowed'], priorities['test']['denied']), (2, 1))
+        self.assertEqual((priorities['scheduled']['allowed'], priorities['scheduled']['denied']), (1, 1))
+        self.assertEqual(self.limiter.status()['used_today'], 4)
+
+    def test_daily_limit_reserve(self):
+        limiter = TokenBucketLimiter('owm-daily', rate_per_minute=600, burst=100, daily_limit=4,
+                                     backend=self.backend)
+        limiter.acquire(priority='test')
+        limiter.acquire(priority='test')
+        with self.assertRaises(QuotaExceeded):
+            limiter.acquire(priority='test')
+        limiter.acquire(priority='scheduled')
+        limiter.acquire(priority='scheduled')
+        self.assertEqual(limiter.status()['remaining_today'], 0)
+
+    def test_concurrent_update_is_retried(self):
+        self.limiter.acquire(priority='scheduled')
+        compare_and_set = self.backend._compare_and_set
+        calls = []
+
+        def other_process_first(quota, **values):
+            # Un autre processus consomme un jeton entre la lecture et l'écriture
+            if not calls:
+                ApiQuota.objects.filter(name='owm-test').update(
+                    tokens=F('tokens') - 1, used_today=F('used_today') + 1, revision=F('revision') + 1
+                )
+            calls.append(quota.revision)
+            return compare_and_set(quota, **values)
+
+        with mock.patch.object(self.backend, '_compare_and_set', side_effect=other_process_first):
+            self.limiter.acquire(priority='scheduled')
+
+        # Première écriture rejetée (révision périmée), la seconde repart de l'état à jour
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[1], calls[0] + 1)
+        quota = ApiQuota.objects.get(name='owm-test')
+        self.assertEqual(quota.tokens, 1)
+        self.assertEqual(quota.used_today, 3)
+
+    def test_contention_gives_up_with_short_delay(self):
+        with mock.patch.object(self.backend, '_compare_and_set', return_value=0):
+            retry_after = self.backend.take('owm-test', 1, 'scheduled', 4, 0, 0, 0)
+        self.assertEqual(retry_after, 0.05)
+
+    def test_quota_exceeded_returns_429(self):
+        limiter = TokenBucketLimiter('owm-empty', rate_per_minute=60, burst=0, backend=self.backend)
+        session = mock.Mock()
+        with mock.patch.object(weather_service.provider, 'limiter', limiter), \
+                mock.patch.object(weather_service.provider, 'api_key', 'cle'), \
+                mock.patch.object(weather_service, '_session', session):
+            weather_service.geo_cache.clear()
+            response = self.client.get('/api/weather/test/?city=Dakar')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        session.get.assert_not_called()
+
+
+class RetentionTests(TestCase):
+    """Archivage des mois expirés avant suppression, relecture des archives"""
+
+    def setUp(self):
+        self.archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_root)
+        override = override_settings(ARCHIVE_ROOT=self.archive_root, WEATHER_DATA_RETENTION_DAYS=180)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.policy = RETENTION_POLICIES['weather']
+        self.now = timezone.now()
+
+    def _reading(self, days_ago, city='Matam'):
+        return WeatherData.objects.create(
+            city=city, latitude=15.65, longitude=-13.25, temperature=40.0, temp_max=42.0,
+            temp_min=30.0, feels_like=43.0, humidity=20, alert_level='orange',
+            recorded_at=self.now - timedelta(days=days_ago)
+        )
+
+    def test_expired_months(self):
+        self.assertEqual(expired_months(self.policy, self.policy.cutoff()), [])
+        old = self._reading(300)
+        self._reading(10)
+        months = expired_months(self.policy, self.policy.cutoff())
+        self.assertEqual(months[0], month_start(old.recorded_at.astimezone(dt_timezone.utc)))
+        self.assertLess(_month_datetime(months[-1]), self.policy.cutoff())
+
+    def test_apply_retention_archives_then_deletes(self):
+        old = [self._reading(300), self._reading(250, city='Podor')]
+        recent = self._reading(10)
+
+        results = apply_retention(self.policy)
+        self.assertEqual(sum(rows for _, rows in results), 2)
+        self.assertEqual(list(WeatherData.objects.values_list('id', flat=True)), [recent.id])
+
+        archived = list(read_archive(self.policy, self.now - timedelta(days=366)))
+        self.assertEqual([row['id'] for row in archived], [row.id for row in old])
+        self.assertEqual(archived[1]['city'], 'Podor')
+        self.assertEqual(archived[0]['recorded_at'], old[0].recorded_at)
+
+        matam = list(read_archive(self.policy, self.now - timedelta(days=366), city='matam'))
+        self.assertEqual([row['id'] for row in matam], [old[0].id])
+
+    def test_late_rows_are_appended_to_the_month(self):
+        first = self._reading(300)
+        apply_retention(self.policy)
+        late = self._reading(300)
+        apply_retention(self.policy)
+
+        self.assertFalse(WeatherData.objects.exists())
+        archived = read_archive(self.policy, self.now - timedelta(days=366))
+        self.assertEqual([row['id'] for row in archived], [first.id, late.id])
+
+    def test_rows_kept_when_archive_fails(self):
+        self._reading(300)
+        with mock.patch('core.retention._write_archive', side_effect=OSError('disque plein')):
+            with self.assertRaises(OSError):
+                apply_retention(self.policy)
+        self.assertEqual(WeatherData.objects.count(), 1)
+
+    def test_read_archive_deduplicates(self):
+        # Interruption entre l'écriture de l'archive et la suppression : lignes écrites deux fois
+        reading = self._reading(300)
+        month = month_start(reading.recorded_at.astimezone(dt_timezone.utc))
+        rows = list(self.policy.dataset.queryset())
+        _write_archive(self.policy, month, iter(rows))
+        _write_archive(self.policy, month, iter(rows))
+
+        archived = list(read_archive(self.policy, self.now - timedelta(days=366)))
+        self.assertEqual([row['id'] for row in archived], [reading.id])
+
+    def test_dry_run_command(self):
+        self._reading(300)
+        output = io.StringIO()
+        call_command('apply_retention', '--dry-run', '--dataset', 'weather', stdout=output)
+        self.assertIn('1 lignes archivées', output.getvalue())
+        self.assertEqual(WeatherData.objects.count(), 1)
+        self.assertFalse(os.path.exists(self.policy.archive_dir))
+
+    def test_history_includes_archive(self):
+        old = self._reading(300)
+        recent = self._reading(10)
+        self._reading(300, city='Podor')
+        call_command('apply_retention', '--dataset', 'weather', stdout=io.StringIO())
+
+        response = self.client.get('/api/weather/city/Matam/history/?days=366&include_archive=true')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([row['id'] for row in data['history']], [old.id, recent.id])
+        self.assertEqual(data['data_points'], 2)
+
+    def test_partition_requires_postgresql(self):
+        with self.assertRaises(CommandError):
+            call_command('apply_retention', '--partition', stdout=io.StringIO())
@@ -118,4 +118,109 @@ STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # OpenWeatherMap settings
-OPENWEATHER_BASE_URL = 'https://api.openweathermap.org/data/2.5/'
\ No newline at end of file
+OPENWEATHER_BASE_URL = os.environ.get('OPENWEATHER_BASE_URL', 'https://api.openweathermap.org/data/2.5/')
+# Identifiants de villes OpenWeatherMap (« Ville=ID,Ville=ID ») : ces villes
+# sont rafraîchies par lots via l'endpoint /group, les autres ville par ville
+OPENWEATHER_CITY_IDS = os.environ.get('OPENWEATHER_CITY_IDS', '')
+# Seuils des niveaux d'alerte chaleur (°C, temp_max) ; après un changement,
+# `python manage.py reclassify_weather` met l'historique à jour. Avec l'indice
+# de chaleur, l'humidité est prise en compte (température ressentie).
+# Valeurs par défaut : les réglages AppSettings (weather.alert.*) priment.
+WEATHER_ALERT_YELLOW = float(os.environ.get('WEATHER_ALERT_YELLOW', 35))
+WEATHER_ALERT_ORANGE = float(os.environ.get('WEATHER_ALERT_ORANGE', 40))
+WEATHER_ALERT_RED = float(os.environ.get('WEATHER_ALERT_RED', 45))
+WEATHER_ALERT_USE_HEAT_INDEX = os.environ.get('WEATHER_ALERT_USE_HEAT_INDEX', 'False').lower() in ['true', '1', 'yes']
+
+# Registre des réglages AppSettings : délai (s) avant qu'une modification
+# faite dans un autre processus soit prise en compte
+APP_SETTINGS_CHECK_INTERVAL = float(os.environ.get('APP_SETTINGS_CHECK_INTERVAL', 30))
+
+# Rafraîchissement météo concurrent (secondes)
+WEATHER_REFRESH_MAX_WORKERS = int(os.environ.get('WEATHER_REFRESH_MAX_WORKERS', 8))
+WEATHER_CITY_TIMEOUT = float(os.environ.get('WEATHER_CITY_TIMEOUT', 10))
+WEATHER_BATCH_TIMEOUT = float(os.environ.get('WEATHER_BATCH_TIMEOUT', 30))
+
+# Budget d'appels OpenWeatherMap partagé entre processus (seau à jetons en
+# base, ou dans Redis si REDIS_URL est défini) ; 0 = pas de plafond journalier
+WEATHER_API_RATE_PER_MINUTE = float(os.environ.get('WEATHER_API_RATE_PER_MINUTE', 60))
+WEATHER_API_BURST = float(os.environ.get('WEATHER_API_BURST', 60))
+WEATHER_API_DAILY_LIMIT = int(os.environ.get('WEATHER_API_DAILY_LIMIT', 0))
+WEATHER_API_QUOTA_BACKEND = os.environ.get('WEATHER_API_QUOTA_BACKEND', '')  # 'db' ou 'redis' (auto si vide)
+
+# Disjoncteur OpenWeatherMap : échecs consécutifs avant ouverture, puis délai
+# (s) avant une sonde ; circuit ouvert, les lectures servent la dernière
+# donnée connue (stale) sans attendre le délai réseau
+WEATHER_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('WEATHER_CIRCUIT_FAILURE_THRESHOLD', 3))
+WEATHER_CIRCUIT_RESET_TIMEOUT = float(os.environ.get('WEATHER_CIRCUIT_RESET_TIMEOUT', 30))
+
+# Session HTTP OpenWeatherMap (pool keep-alive et tentatives avec backoff)
+WEATHER_HTTP_POOL_SIZE = int(os.environ.get('WEATHER_HTTP_POOL_SIZE', 10))
+WEATHER_HTTP_RETRIES = int(os.environ.get('WEATHER_HTTP_RETRIES', 3))
+WEATHER_HTTP_BACKOFF = float(os.environ.get('WEATHER_HTTP_BACKOFF', 0.5))
+
+# Cache des réponses publiques (mémoire locale par défaut, Redis si REDIS_URL).
+# Avec la mémoire locale, chaque processus a son propre cache : les
+# invalidations faites par `update_weather` (cron) n'atteignent les workers
+# web qu'avec un cache partagé ; API_CACHE_TIMEOUT borne alors la durée de vie.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'fagaru',
+        }
+    }
+
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', 300))
+
+# Notifications d'alertes : envoi en arrière-plan (manage.py process_notifications)
+ALERT_NOTIFICATIONS_ASYNC = os.environ.get('ALERT_NOTIFICATIONS_ASYNC', 'True').lower() in ['true', '1', 'yes']
+ALERT_NOTIFICATION_CHUNK_SIZE = int(os.environ.get('ALERT_NOTIFICATION_CHUNK_SIZE', 1000))
+# Tâche en échec : tentatives maximales, délai (s) avant le 2e essai, doublé ensuite
+ALERT_NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get('ALERT_NOTIFICATION_MAX_ATTEMPTS', 5))
+ALERT_NOTIFICATION_RETRY_DELAY = float(os.environ.get('ALERT_NOTIFICATION_RETRY_DELAY', 60))
+
+# Ville la plus proche : distance maximale de rattachement (km), fréquence de
+# vérification des changements de villes (s) et âge maximal d'une lecture en
+# base servie à la place d'un appel OpenWeatherMap (minutes)
+NEAREST_CITY_MAX_KM = float(os.environ.get('NEAREST_CITY_MAX_KM', 30))
+CITY_INDEX_CHECK_INTERVAL = float(os.environ.get('CITY_INDEX_CHECK_INTERVAL', 30))
+WEATHER_SNAPSHOT_MAX_AGE = float(os.environ.get('WEATHER_SNAPSHOT_MAX_AGE', 180))
+
+# Rétention : les mois entièrement plus anciens que ces durées (jours) sont
+# archivés (CSV gzip par mois dans ARCHIVE_ROOT) puis retirés des tables par
+# `python manage.py apply_retention` ; sous PostgreSQL avec PARTITION_TABLES,
+# tables partitionnées par mois (PARTITION_MONTHS_AHEAD mois créés d'avance)
+WEATHER_DATA_RETENTION_DAYS = int(os.environ.get('WEATHER_DATA_RETENTION_DAYS', 180))
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 365))
+ARCHIVE_ROOT = os.environ.get('ARCHIVE_ROOT') or str(BASE_DIR / 'archives')
+PARTITION_TABLES = os.environ.get('PARTITION_TABLES', 'False').lower() in ['true', '1', 'yes']
+PARTITION_MONTHS_AHEAD = int(os.environ.get('PARTITION_MONTHS_AHEAD', 3))
+
+# Flux en direct des alertes (SSE, /api/alerts/stream/, serveur ASGI) :
+# backend entre processus ('db', 'redis' ou 'local' ; redis si REDIS_URL est
+# défini, base sinon), intervalle de lecture de la base (s), battement de
+# cœur (s), événements gardés pour la reprise, file maximale par client et
+# connexions maximales par processus
+LIVE_EVENTS_BACKEND = os.environ.get('LIVE_EVENTS_BACKEND', '')
+LIVE_EVENTS_POLL_INTERVAL = float(os.environ.get('LIVE_EVENTS_POLL_INTERVAL', 1.0))
+LIVE_EVENTS_RETENTION_HOURS = float(os.environ.get('LIVE_EVENTS_RETENTION_HOURS', 24))
+LIVE_EVENTS_HEARTBEAT = float(os.environ.get('LIVE_EVENTS_HEARTBEAT', 15))
+LIVE_EVENTS_RETRY_MS = int(os.environ.get('LIVE_EVENTS_RETRY_MS', 5000))
+LIVE_EVENTS_REPLAY_SIZE = int(os.environ.get('LIVE_EVENTS_REPLAY_SIZE', 500))
+LIVE_EVENTS_MAX_PENDING = int(os.environ.get('LIVE_EVENTS_MAX_PENDING', 100))
+LIVE_EVENTS_MAX_SUBSCRIBERS = int(os.environ.get('LIVE_EVENTS_MAX_SUBSCRIBERS', 10000))
+
+# Cache géographique des appels OpenWeatherMap par coordonnées
+WEATHER_GEO_CACHE_PRECISION = int(os.environ.get('WEATHER_GEO_CACHE_PRECISION', 2))  # décimales (2 ≈ 1,1 km)
+WEATHER_GEO_CACHE_TTL = float(os.environ.get('WEATHER_GEO_CACHE_TTL', 600))
+WEATHER_GEO_CACHE_MAX_ENTRIES = int(os.environ.get('WEATHER_GEO_CACHE_MAX_ENTRIES', 2048))
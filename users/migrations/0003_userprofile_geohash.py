@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:16
+
+from django.db import migrations, models
+
+from core.geo import encode_geohash
+
+
+def backfill_geohash(apps, schema_editor):
+    UserProfile = apps.get_model("users", "UserProfile")
+
+    profiles = UserProfile.objects.filter(
+        location_lat__isnull=False, location_lng__isnull=False
+    ).only("id", "location_lat", "location_lng")
+
+    batch = []
+    for profile in profiles.iterator(chunk_size=2000):
+        profile.geohash = encode_geohash(profile.location_lat, profile.location_lng)
+        batch.append(profile)
+        if len(batch) >= 2000:
+            UserProfile.objects.bulk_update(batch, ["geohash"])
+            batch = []
+    if batch:
+        UserProfile.objects.bulk_update(batch, ["geohash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_profile_city_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
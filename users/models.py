@@ -1,5 +1,7 @@
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models.functions import Upper
+from core.geo import encode_geohash
 
 class UserProfile(models.Model):
     """Profil utilisateur étendu"""
@@ -18,6 +20,8 @@ class UserProfile(models.Model):
     location_lat = models.FloatField(blank=True, null=True)
     location_lng = models.FloatField(blank=True, null=True)
     city = models.CharField(max_length=100, blank=True, null=True)
+    # Cellule geohash de la position (index spatial), recalculée à chaque sauvegarde
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True)
     receive_sms = models.BooleanField(default=True)
     receive_push = models.BooleanField(default=True)
     language = models.CharField(max_length=10, default='fr', choices=[
@@ -28,5 +32,24 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Audience des alertes : UPPER(city) IN (...)
+            models.Index(Upper('city'), name='profile_city_upper_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.user.username} ({self.get_profile_type_display()})"
\ No newline at end of file
+        return f"{self.user.username} ({self.get_profile_type_display()})"
+
+    def save(self, *args, **kwargs):
+        self.geohash = self.compute_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'geohash' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['geohash']
+        super().save(*args, **kwargs)
+
+    def compute_geohash(self):
+        """Geohash de la position du profil ('' si inconnue)"""
+        if self.location_lat is None or self.location_lng is None:
+            return ''
+        return encode_geohash(self.location_lat, self.location_lng)
\ No newline at end of file
@@ -5,6 +5,7 @@ from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from .models import UserProfile
+from core.cities import resolve_city
 from .serializers import (
     UserSerializer, UserRegistrationSerializer, LoginSerializer,
     UserProfileSerializer, UserProfileUpdateSerializer
@@ -103,7 +104,8 @@ def update_location(request):
         profile = request.user.profile
         profile.location_lat = float(latitude)
         profile.location_lng = float(longitude)
-        profile.city = city
+        # La ville connue la plus proche prime sur le nom saisi par le client
+        profile.city = resolve_city(profile.location_lat, profile.location_lng) or city
         profile.save()
         
         return Response({
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import WeatherData
+from .models import WeatherData, LatestWeather, WeatherForecast, WeatherHourly, WeatherDaily
 
 @admin.register(WeatherData)
 class WeatherDataAdmin(admin.ModelAdmin):
@@ -10,4 +10,34 @@ class WeatherDataAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at']
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related()
\ No newline at end of file
+        return super().get_queryset(request).select_related()
+
+@admin.register(LatestWeather)
+class LatestWeatherAdmin(admin.ModelAdmin):
+    list_display = ['city', 'temperature', 'temp_max', 'alert_level', 'recorded_at', 'updated_at']
+    list_filter = ['alert_level']
+    search_fields = ['city']
+    readonly_fields = ['updated_at']
+
+@admin.register(WeatherForecast)
+class WeatherForecastAdmin(admin.ModelAdmin):
+    list_display = ['city', 'valid_at', 'temp_max', 'alert_level', 'fetched_at']
+    list_filter = ['alert_level', 'city']
+    search_fields = ['city']
+    ordering = ['city', 'valid_at']
+    readonly_fields = ['fetched_at']
+@admin.register(WeatherHourly)
+class WeatherHourlyAdmin(admin.ModelAdmin):
+    list_display = ['city', 'hour', 'samples', 'temperature_min', 'temperature_max', 'temp_max', 'alert_level']
+    list_filter = ['alert_level', 'city']
+    search_fields = ['city']
+    ordering = ['-hour']
+    readonly_fields = ['updated_at']
+
+@admin.register(WeatherDaily)
+class WeatherDailyAdmin(admin.ModelAdmin):
+    list_display = ['city', 'day', 'samples', 'temperature_min', 'temperature_max', 'temp_max', 'alert_level']
+    list_filter = ['alert_level', 'city']
+    search_fields = ['city']
+    ordering = ['-day']
+    readonly_fields = ['updated_at']
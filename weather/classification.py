@@ -0,0 +1,143 @@
+"""
+Classification des niveaux d'alerte chaleur (vert, jaune, orange, rouge)
+
+Une seule définition des seuils pour tout le projet. classify_temperatures()
+traite des tableaux entiers avec NumPy (reclassification de l'historique) ;
+classify_temperature() est la version scalaire utilisée à l'ingestion et par
+les alertes.
+
+Avec WEATHER_ALERT_USE_HEAT_INDEX, la température comparée aux seuils est
+l'indice de chaleur (température ressentie selon l'humidité, formule de
+Rothfusz du NWS) quand l'humidité est connue.
+
+Seuils et indice de chaleur se règlent à chaud dans AppSettings (registre
+core.registry), globalement ou par région / ville :
+`weather.alert.yellow`, `weather.alert.orange@region:Matam`,
+`weather.alert.red@city:Podor`, `weather.alert.use_heat_index`. Les
+réglages WEATHER_ALERT_* ne sont que les valeurs par défaut.
+"""
+import numpy as np
+from django.conf import settings
+from core.registry import registry
+
+# Codes numériques des niveaux : indice dans ce tuple
+ALERT_LEVEL_CODES = ('green', 'yellow', 'orange', 'red')
+
+DEFAULT_THRESHOLDS = {
+    'yellow': 35,  # Très inconfortable
+    'orange': 40,  # Dangereux
+    'red': 45,     # Très dangereux
+}
+
+
+def get_thresholds(city=None):
+    """Seuils (°C) des niveaux jaune, orange et rouge, pour une ville ou globaux"""
+    thresholds = {}
+    for level, default in DEFAULT_THRESHOLDS.items():
+        default = float(getattr(settings, f'WEATHER_ALERT_{level.upper()}', default))
+        thresholds[level] = registry.get_scoped_float(f'weather.alert.{level}', city=city, default=default)
+    return thresholds
+
+
+def use_heat_index():
+    return registry.get_bool(
+        'weather.alert.use_heat_index',
+        default=bool(getattr(settings, 'WEATHER_ALERT_USE_HEAT_INDEX', False))
+    )
+
+
+def heat_index(temperature, humidity):
+    """
+    Indice de chaleur (°C) pour des tableaux de températures (°C) et d'humidités (%)
+
+    Régression de Rothfusz au-delà de 26,7 °C (80 °F), température inchangée
+    en dessous ; jamais inférieur à la température.
+    """
+    t = np.asarray(temperature, dtype=np.float64)
+    rh = np.asarray(humidity, dtype=np.float64)
+    f = t * 9 / 5 + 32
+
+    hi = (
+        -42.379 + 2.04901523 * f + 10.14333127 * rh
+        - 0.22475541 * f * rh - 6.83783e-3 * f * f
+        - 5.481717e-2 * rh * rh + 1.22874e-3 * f * f * rh
+        + 8.5282e-4 * f * rh * rh - 1.99e-6 * f * f * rh * rh
+    )
+    hi_celsius = (hi - 32) * 5 / 9
+
+    # Humidité inconnue (NaN) : température seule
+    valid = (f >= 80) & ~np.isnan(rh)
+    return np.where(valid, np.maximum(hi_celsius, t), t)
+
+
+def _compared_values(temp_max, humidity):
+    """Température comparée aux seuils : temp_max, ou indice de chaleur si activé"""
+    values = np.asarray(temp_max, dtype=np.float64)
+    if humidity is not None and use_heat_index():
+        values = heat_index(values, humidity)
+    return values
+
+
+def _bounds(thresholds):
+    bounds = np.array([thresholds['yellow'], thresholds['orange'], thresholds['red']], dtype=np.float64)
+    # Seuils mal ordonnés (réglage incohérent) : chaque niveau au moins égal au précédent
+    return np.maximum.accumulate(bounds)
+
+
+def classify_temperatures(temp_max, humidity=None, thresholds=None):
+    """
+    Codes de niveau (int8, indices de ALERT_LEVEL_CODES) pour un tableau de temp_max
+
+    humidity (même forme, % ; NaN si inconnue) n'est utilisée que si l'indice
+    de chaleur est activé. Une température inconnue (NaN) est classée verte.
+    """
+    values = _compared_values(temp_max, humidity)
+    # side='right' : une valeur égale au seuil atteint le niveau
+    codes = np.searchsorted(_bounds(thresholds or get_thresholds()), values, side='right').astype(np.int8)
+    codes[np.isnan(values)] = 0
+    return codes
+
+
+def classify_for_cities(temp_max, humidity, cities):
+    """
+    Comme classify_temperatures, avec les seuils propres à la ville de chaque lecture
+
+    Les seuils sont résolus une fois par ville distincte, puis comparés à
+    toutes les lectures en une seule opération.
+    """
+    values = _compared_values(temp_max, humidity)
+    names, inverse = np.unique(np.asarray(cities, dtype=str), return_inverse=True)
+    table = np.array([_bounds(get_thresholds(name)) for name in names]).reshape(-1, 3)
+    # Nombre de seuils atteints = code du niveau (NaN n'en atteint aucun)
+    return (values[:, None] >= table[inverse]).sum(axis=1).astype(np.int8)
+
+
+def levels_from_codes(codes):
+    """Noms des niveaux (tableau d'objets str) à partir des codes"""
+    return np.array(ALERT_LEVEL_CODES, dtype=object)[np.asarray(codes)]
+
+
+def classify_readings(readings, humidity_field='humidity'):
+    """
+    Niveaux d'alerte ('green' ... 'red') d'objets ayant city, temp_max et une
+    humidité, recalculés avec les seuils courants de leur ville
+    """
+    readings = list(readings)
+    if not readings:
+        return []
+    codes = classify_for_cities(
+        [reading.temp_max for reading in readings],
+        [getattr(reading, humidity_field) for reading in readings],
+        [reading.city for reading in readings]
+    )
+    return list(levels_from_codes(codes))
+
+
+def classify_temperature(temp_max, humidity=None, city=None):
+    """Niveau d'alerte ('green' ... 'red') d'une seule lecture, avec les seuils de sa ville"""
+    if temp_max is None:
+        return 'green'
+    codes = classify_temperatures(
+        [temp_max], None if humidity is None else [humidity], get_thresholds(city)
+    )
+    return ALERT_LEVEL_CODES[int(codes[0])]
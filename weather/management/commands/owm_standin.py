@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from weather.standin import OpenWeatherMapStandIn
+
+
+class Command(BaseCommand):
+    help = 'Démarre un serveur local imitant OpenWeatherMap (/weather, /forecast, /group)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Adresse d\'écoute')
+        parser.add_argument('--port', type=int, default=8081, help='Port d\'écoute')
+        parser.add_argument(
+            '--latency', type=float, default=0,
+            help='Latence ajoutée à chaque réponse (ms)',
+        )
+        parser.add_argument(
+            '--jitter', type=float, default=0,
+            help='Latence aléatoire supplémentaire, entre 0 et cette valeur (ms)',
+        )
+        parser.add_argument(
+            '--error-rate', type=float, default=0,
+            help='Proportion de réponses 503 (0 à 1)',
+        )
+        parser.add_argument('--seed', type=int, help='Graine du générateur aléatoire')
+        parser.add_argument('--verbose', action='store_true', help='Journaliser chaque requête')
+
+    def handle(self, *args, **options):
+        server = OpenWeatherMapStandIn(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            seed=options['seed'],
+            verbose=options['verbose'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"🌍 Stand-in OpenWeatherMap sur {server.base_url}"))
+        self.stdout.write(f"   OPENWEATHER_BASE_URL={server.base_url}")
+        self.stdout.write(
+            f"   Latence {options['latency']:g} ms (+0-{options['jitter']:g} ms), "
+            f"erreurs {options['error_rate']:.0%}"
+        )
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            total = sum(server.requests.values())
+            details = ', '.join(f"{endpoint}: {count}" for endpoint, count in sorted(server.requests.items()))
+            self.stdout.write(f"\n📊 {total} requêtes servies ({details or 'aucune'})")
@@ -0,0 +1,49 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from core.cache import invalidate
+from weather.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les agrégats horaires et journaliers (WeatherHourly, WeatherDaily) "
+        "depuis l'historique brut, par tranches de quelques jours"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=str, help='Premier jour à recalculer (AAAA-MM-JJ)')
+        parser.add_argument('--until', type=str, help='Dernier jour à recalculer (AAAA-MM-JJ, inclus)')
+        parser.add_argument(
+            '--chunk-days', type=int, default=7,
+            help='Jours traités par transaction (défaut: 7)',
+        )
+        parser.add_argument('--city', type=str, help='Ne recalculer que cette ville')
+
+    def _parse(self, value):
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f"Date invalide: {value}")
+        return parsed
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] <= 0:
+            raise CommandError('--chunk-days doit être positif')
+
+        since = self._parse(options['since'])
+        until = self._parse(options['until'])
+        if since and until and since > until:
+            raise CommandError('--since doit précéder --until')
+
+        start = time.monotonic()
+        hours, days = rebuild_rollups(
+            since, until, chunk_days=options['chunk_days'],
+            cities=[options['city']] if options['city'] else None,
+        )
+        invalidate('weather')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Agrégats recalculés en {time.monotonic() - start:.1f}s: {hours} heures, {days} jours"
+        ))
@@ -0,0 +1,138 @@
+import time
+from datetime import datetime
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from core.cache import invalidate
+from weather.classification import ALERT_LEVEL_CODES, classify_for_cities
+from weather.models import WeatherData, LatestWeather, WeatherForecast
+from weather.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule alert_level de l'historique météo après un changement de seuils "
+        "(lecture par lots triés par id, classification NumPy, mises à jour groupées)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=50000,
+            help='Lignes lues par lot (défaut: 50000)',
+        )
+        parser.add_argument(
+            '--since', type=str,
+            help='Ne traiter que les lectures à partir de cette date (AAAA-MM-JJ)',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Compter les changements sans rien écrire',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size <= 0:
+            raise CommandError('--chunk-size doit être positif')
+
+        queryset = WeatherData.objects.all()
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError(f"Date invalide: {options['since']}")
+            # Début du jour en heure locale : comparaison directe, l'index sur recorded_at reste utilisable
+            since_start = timezone.make_aware(datetime.combine(since, datetime.min.time()))
+            queryset = queryset.filter(recorded_at__gte=since_start)
+
+        dry_run = options['dry_run']
+        start = time.monotonic()
+        scanned = 0
+        transitions = {}
+        last_id = 0
+        # Plage des lots modifiés, pour recalculer ensuite leurs agrégats
+        changed_range = None
+
+        # Lecture par clé (id > dernier id vu) : chaque lot coûte le même prix
+        while True:
+            rows = list(
+                queryset.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'city', 'temp_max', 'humidity', 'alert_level', 'recorded_at')[:chunk_size]
+            )
+            if not rows:
+                break
+
+            ids, cities, temps, humidities, levels, recorded = zip(*rows)
+            last_id = ids[-1]
+            scanned += len(rows)
+
+            changed = self._reclassify(
+                WeatherData, np.array(ids, dtype=np.int64), cities,
+                np.array(temps, dtype=np.float64), np.array(humidities, dtype=np.float64),
+                np.array(levels, dtype=object), dry_run,
+            )
+            for transition, count in changed.items():
+                transitions[transition] = transitions.get(transition, 0) + count
+            if changed:
+                first, last = min(recorded), max(recorded)
+                if changed_range:
+                    first, last = min(first, changed_range[0]), max(last, changed_range[1])
+                changed_range = (first, last)
+
+            elapsed = time.monotonic() - start
+            self.stdout.write(f"   {scanned} lignes lues ({scanned / elapsed:,.0f}/s)")
+
+        # Instantanés et prévisions : quelques centaines de lignes
+        for model in (LatestWeather, WeatherForecast):
+            rows = list(model.objects.order_by('id').values_list('id', 'city', 'temp_max', 'humidity', 'alert_level'))
+            if rows:
+                ids, cities, temps, humidities, levels = zip(*rows)
+                self._reclassify(
+                    model, np.array(ids, dtype=np.int64), cities,
+                    np.array(temps, dtype=np.float64), np.array(humidities, dtype=np.float64),
+                    np.array(levels, dtype=object), dry_run,
+                )
+
+        if not dry_run:
+            if changed_range:
+                hours, days = rebuild_rollups(
+                    timezone.localtime(changed_range[0]).date(), timezone.localtime(changed_range[1]).date()
+                )
+                self.stdout.write(f"   Agrégats recalculés: {hours} heures, {days} jours")
+            invalidate('weather', 'forecast')
+
+        elapsed = time.monotonic() - start
+        updated = sum(transitions.values())
+        prefix = '[simulation] ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {prefix}{scanned} lectures reclassées en {elapsed:.1f}s, {updated} changements"
+        ))
+        for (old, new), count in sorted(transitions.items()):
+            self.stdout.write(f"   - {old} → {new}: {count}")
+
+    def _reclassify(self, model, ids, cities, temps, humidities, levels, dry_run):
+        """Reclasser un lot (seuils de chaque ville) ; retourne {(ancien, nouveau): nombre}"""
+        codes = classify_for_cities(temps, humidities, cities)
+        new_levels = np.array(ALERT_LEVEL_CODES, dtype=object)[codes]
+        changed = new_levels != levels
+
+        transitions = {}
+        if not changed.any():
+            return transitions
+
+        for old, new in zip(levels[changed], new_levels[changed]):
+            transitions[(old, new)] = transitions.get((old, new), 0) + 1
+
+        if dry_run:
+            return transitions
+
+        # Une requête UPDATE ... WHERE id IN (...) par niveau et par paquet
+        batch_size = min(connection.features.max_query_params or 10000, 10000) - 1
+        with transaction.atomic():
+            for code, level in enumerate(ALERT_LEVEL_CODES):
+                level_ids = ids[changed & (codes == code)].tolist()
+                for i in range(0, len(level_ids), batch_size):
+                    model.objects.filter(id__in=level_ids[i:i + batch_size]).update(alert_level=level)
+
+        return transitions
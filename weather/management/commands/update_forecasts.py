@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from weather.services import weather_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Rafraîchit les prévisions météo stockées (tous les créneaux de 3 h, toutes les villes prioritaires)'
+
+    def handle(self, *args, **options):
+        start_time = timezone.now()
+        self.stdout.write(f"🔮 Début mise à jour des prévisions - {start_time}")
+
+        try:
+            result = weather_service.update_forecasts_for_all_cities()
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✅ Prévisions mises à jour en {(timezone.now() - start_time).seconds}s"
+                )
+            )
+            self.stdout.write(f"   - Villes mises à jour: {result['total_updated']}")
+            self.stdout.write(f"   - Créneaux enregistrés: {result['total_slots']}")
+
+            if result['errors']:
+                self.stdout.write(
+                    self.style.WARNING(f"   - Erreurs: {len(result['errors'])}")
+                )
+                for error in result['errors']:
+                    self.stdout.write(f"     ⚠️ {error}")
+
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f"❌ Erreur lors de la mise à jour des prévisions: {str(e)}")
+            )
+            logger.error(f"Erreur update_forecasts: {e}")
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from weather.services import weather_service
+from core.quota import quota_priority
 from alerts.models import Alert
 import logging
 
@@ -47,6 +48,17 @@ class Command(BaseCommand):
                 )
                 for error in result['errors']:
                     self.stdout.write(f"     ⚠️ {error}")
+            
+            http_stats = weather_service.get_http_stats()
+            self.stdout.write(
+                f"   - Connexions HTTP: {http_stats['connections_opened']} ouvertes, "
+                f"{http_stats['connections_reused']} réutilisées"
+            )
+            quota = weather_service.provider.limiter.status()
+            self.stdout.write(
+                f"   - Quota API: {quota['tokens_available']:g}/{quota['burst']:g} jetons, "
+                f"{quota['used_today']} appels aujourd'hui"
+            )
 
             # Générer les alertes après mise à jour météo
             self._generate_automatic_alerts(result['updated_cities'])
@@ -60,8 +72,10 @@ class Command(BaseCommand):
     def _update_single_city(self, city_name):
         """Mettre à jour une seule ville"""
         try:
-            weather_data = weather_service.get_current_weather(city_name)
+            with quota_priority('scheduled'):
+                weather_data = weather_service.get_current_weather(city_name, allow_stale=False)
             if weather_data:
+                weather_service.save_weather_batch([weather_data])
                 return {
                     'updated_cities': [city_name],
                     'errors': [],
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:10
+
+from django.db import migrations, models
+
+
+SNAPSHOT_FIELDS = [
+    "city", "latitude", "longitude", "temperature", "temp_max", "temp_min",
+    "feels_like", "humidity", "description", "alert_level", "source", "recorded_at",
+]
+
+
+def backfill_latest_weather(apps, schema_editor):
+    WeatherData = apps.get_model("weather", "WeatherData")
+    LatestWeather = apps.get_model("weather", "LatestWeather")
+
+    snapshots = {}
+    for row in WeatherData.objects.order_by("city", "-recorded_at").values(*SNAPSHOT_FIELDS).iterator():
+        snapshots.setdefault(row["city"], row)
+
+    LatestWeather.objects.bulk_create(
+        [LatestWeather(**row) for row in snapshots.values()], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0002_weatherdata_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestWeather',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100, unique=True)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('temperature', models.FloatField()),
+                ('temp_max', models.FloatField()),
+                ('temp_min', models.FloatField()),
+                ('feels_like', models.FloatField()),
+                ('humidity', models.FloatField()),
+                ('description', models.CharField(blank=True, default='', max_length=200)),
+                ('alert_level', models.CharField(choices=[('green', 'Normal'), ('yellow', 'Très inconfortable'), ('orange', 'Dangereux'), ('red', 'Très dangereux')], default='green', max_length=10)),
+                ('source', models.CharField(default='openweathermap', max_length=50)),
+                ('recorded_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['city'],
+            },
+        ),
+        migrations.RunPython(backfill_latest_weather, migrations.RunPython.noop),
+    ]
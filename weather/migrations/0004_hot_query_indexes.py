@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:11
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0003_latestweather'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='weatherdata',
+            index=models.Index(django.db.models.functions.text.Upper('city'), models.OrderBy(models.F('recorded_at'), descending=True), name='weather_city_upper_rec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherdata',
+            index=models.Index(fields=['-recorded_at'], name='weather_recorded_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherdata',
+            index=models.Index(fields=['alert_level', '-recorded_at'], name='weather_level_rec_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('valid_at', models.DateTimeField()),
+                ('temp_max', models.FloatField()),
+                ('temp_min', models.FloatField()),
+                ('feels_like', models.FloatField()),
+                ('humidity', models.FloatField()),
+                ('description', models.CharField(blank=True, default='', max_length=200)),
+                ('alert_level', models.CharField(choices=[('green', 'Normal'), ('yellow', 'Très inconfortable'), ('orange', 'Dangereux'), ('red', 'Très dangereux')], default='green', max_length=10)),
+                ('source', models.CharField(default='openweathermap', max_length=50)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['city', 'valid_at'],
+                'indexes': [models.Index(fields=['valid_at'], name='forecast_valid_at_idx')],
+                'unique_together': {('city', 'valid_at')},
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:30
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0005_weatherforecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('temperature_min', models.FloatField()),
+                ('temperature_max', models.FloatField()),
+                ('temperature_sum', models.FloatField()),
+                ('feels_like_min', models.FloatField()),
+                ('feels_like_max', models.FloatField()),
+                ('feels_like_sum', models.FloatField()),
+                ('humidity_min', models.FloatField()),
+                ('humidity_max', models.FloatField()),
+                ('humidity_sum', models.FloatField()),
+                ('temp_max', models.FloatField()),
+                ('alert_level', models.CharField(choices=[('green', 'Normal'), ('yellow', 'Très inconfortable'), ('orange', 'Dangereux'), ('red', 'Très dangereux')], default='green', max_length=10)),
+                ('first_recorded_at', models.DateTimeField()),
+                ('last_recorded_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('day', models.DateField()),
+            ],
+            options={
+                'ordering': ['city', 'day'],
+                'indexes': [models.Index(django.db.models.functions.text.Upper('city'), models.F('day'), name='daily_city_upper_day_idx'), models.Index(fields=['day'], name='daily_day_idx')],
+                'unique_together': {('city', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='WeatherHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('temperature_min', models.FloatField()),
+                ('temperature_max', models.FloatField()),
+                ('temperature_sum', models.FloatField()),
+                ('feels_like_min', models.FloatField()),
+                ('feels_like_max', models.FloatField()),
+                ('feels_like_sum', models.FloatField()),
+                ('humidity_min', models.FloatField()),
+                ('humidity_max', models.FloatField()),
+                ('humidity_sum', models.FloatField()),
+                ('temp_max', models.FloatField()),
+                ('alert_level', models.CharField(choices=[('green', 'Normal'), ('yellow', 'Très inconfortable'), ('orange', 'Dangereux'), ('red', 'Très dangereux')], default='green', max_length=10)),
+                ('first_recorded_at', models.DateTimeField()),
+                ('last_recorded_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('hour', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['city', 'hour'],
+                'indexes': [models.Index(django.db.models.functions.text.Upper('city'), models.F('hour'), name='hourly_city_upper_hour_idx')],
+                'unique_together': {('city', 'hour')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:34
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0006_weather_rollups'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='weatherdata',
+            name='weather_city_upper_rec_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='weatherdata',
+            name='weather_recorded_at_idx',
+        ),
+        migrations.AddIndex(
+            model_name='weatherdata',
+            index=models.Index(django.db.models.functions.text.Upper('city'), models.OrderBy(models.F('recorded_at'), descending=True), models.OrderBy(models.F('id'), descending=True), name='weather_city_upper_rec_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherdata',
+            index=models.Index(fields=['-recorded_at', '-id'], name='weather_rec_id_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:49
+
+from django.db import migrations
+from core.partitions import convert_to_partitioned
+
+
+def partition_weatherdata(apps, schema_editor):
+    # PostgreSQL uniquement : partitions mensuelles sur recorded_at
+    convert_to_partitioned(schema_editor, 'weather_weatherdata', 'recorded_at')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0007_weather_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='weatherdata',
+            options={},
+        ),
+        # Sans retour arrière : la table partitionnée reste utilisable telle quelle
+        migrations.RunPython(partition_weatherdata, migrations.RunPython.noop),
+    ]
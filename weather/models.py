@@ -1,4 +1,12 @@
 from django.db import models
+from django.db.models.functions import Upper
+
+ALERT_COLORS = {
+    'green': '#4CAF50',
+    'yellow': '#FFC107',
+    'orange': '#FF9800',
+    'red': '#F44336'
+}
 
 class WeatherData(models.Model):
     """Données météorologiques par ville"""
@@ -25,18 +33,165 @@ class WeatherData(models.Model):
 
     class Meta:
         app_label = 'weather'
-        ordering = ['-recorded_at']
+        # Pas de tri par défaut : chaque requête trie explicitement, sur un index
         unique_together = ['city', 'recorded_at']
+        indexes = [
+            # city__iexact (UPPER(city) = UPPER(...)) + tri/plage sur recorded_at ;
+            # id départage les lectures de même instant (pagination par curseur)
+            models.Index(
+                Upper('city'), models.F('recorded_at').desc(), models.F('id').desc(),
+                name='weather_city_upper_rec_id_idx'
+            ),
+            models.Index(fields=['-recorded_at', '-id'], name='weather_rec_id_idx'),
+            models.Index(fields=['alert_level', '-recorded_at'], name='weather_level_rec_idx'),
+        ]
 
     def __str__(self):
         return f"{self.city} - {self.temperature}°C ({self.alert_level})"
 
     def get_alert_color(self):
         """Retourne la couleur associée au niveau d'alerte"""
-        colors = {
-            'green': '#4CAF50',
-            'yellow': '#FFC107',
-            'orange': '#FF9800',
-            'red': '#F44336'
-        }
-        return colors.get(self.alert_level, '#4CAF50')
\ No newline at end of file
+        return ALERT_COLORS.get(self.alert_level, '#4CAF50')
+
+class LatestWeather(models.Model):
+    """
+    Dernière lecture météo connue par ville (une ligne par ville)
+    
+    Tenue à jour par l'ingestion (WeatherService.save_weather_batch) pour
+    répondre à « la météo actuelle de chaque ville » sans parcourir WeatherData.
+    """
+    city = models.CharField(max_length=100, unique=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    temperature = models.FloatField()
+    temp_max = models.FloatField()
+    temp_min = models.FloatField()
+    feels_like = models.FloatField()
+    humidity = models.FloatField()
+    description = models.CharField(max_length=200, blank=True, default='')
+    alert_level = models.CharField(max_length=10, choices=WeatherData.ALERT_LEVELS, default='green')
+    source = models.CharField(max_length=50, default='openweathermap')
+    recorded_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'weather'
+        ordering = ['city']
+
+    def __str__(self):
+        return f"{self.city} - {self.temperature}°C ({self.alert_level}, {self.recorded_at})"
+
+    def get_alert_color(self):
+        """Retourne la couleur associée au niveau d'alerte"""
+        return ALERT_COLORS.get(self.alert_level, '#4CAF50')
+
+class WeatherForecast(models.Model):
+    """
+    Prévisions météo stockées par ville et par créneau de 3 h
+
+    Remplies par un rafraîchissement groupé (WeatherService.update_forecasts_for_all_cities) :
+    les endpoints de prévisions lisent la base, jamais l'API externe.
+    """
+    city = models.CharField(max_length=100)
+    valid_at = models.DateTimeField()  # Début du créneau prévu
+    temp_max = models.FloatField()
+    temp_min = models.FloatField()
+    feels_like = models.FloatField()
+    humidity = models.FloatField()
+    description = models.CharField(max_length=200, blank=True, default='')
+    alert_level = models.CharField(max_length=10, choices=WeatherData.ALERT_LEVELS, default='green')
+    source = models.CharField(max_length=50, default='openweathermap')
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        app_label = 'weather'
+        ordering = ['city', 'valid_at']
+        unique_together = ['city', 'valid_at']
+        indexes = [
+            models.Index(fields=['valid_at'], name='forecast_valid_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.city} - {self.valid_at} : {self.temp_max}°C ({self.alert_level})"
+
+    def get_alert_color(self):
+        """Retourne la couleur associée au niveau d'alerte"""
+        return ALERT_COLORS.get(self.alert_level, '#4CAF50')
+
+
+class WeatherRollup(models.Model):
+    """
+    Agrégats d'une ville sur une période (min / max / somme, moyenne = somme / samples)
+
+    Recalculés à partir des lectures brutes à chaque ingestion
+    (weather.rollups.refresh_rollups) : les sommes permettent d'agréger à
+    nouveau les heures en jours sans relire WeatherData.
+    """
+    city = models.CharField(max_length=100)
+    samples = models.PositiveIntegerField(default=0)
+    temperature_min = models.FloatField()
+    temperature_max = models.FloatField()
+    temperature_sum = models.FloatField()
+    feels_like_min = models.FloatField()
+    feels_like_max = models.FloatField()
+    feels_like_sum = models.FloatField()
+    humidity_min = models.FloatField()
+    humidity_max = models.FloatField()
+    humidity_sum = models.FloatField()
+    temp_max = models.FloatField()  # Plus haute temp_max de la période
+    alert_level = models.CharField(max_length=10, choices=WeatherData.ALERT_LEVELS, default='green')  # Pire niveau
+    first_recorded_at = models.DateTimeField()
+    last_recorded_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def temperature_mean(self):
+        return round(self.temperature_sum / self.samples, 1) if self.samples else None
+
+    @property
+    def feels_like_mean(self):
+        return round(self.feels_like_sum / self.samples, 1) if self.samples else None
+
+    @property
+    def humidity_mean(self):
+        return round(self.humidity_sum / self.samples, 1) if self.samples else None
+
+    def get_alert_color(self):
+        """Retourne la couleur associée au pire niveau d'alerte de la période"""
+        return ALERT_COLORS.get(self.alert_level, '#4CAF50')
+
+
+class WeatherHourly(WeatherRollup):
+    """Agrégats horaires par ville"""
+    hour = models.DateTimeField()  # Début de l'heure
+
+    class Meta:
+        app_label = 'weather'
+        ordering = ['city', 'hour']
+        unique_together = ['city', 'hour']
+        indexes = [
+            models.Index(Upper('city'), 'hour', name='hourly_city_upper_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.city} - {self.hour} : {self.temperature_min}-{self.temperature_max}°C"
+
+
+class WeatherDaily(WeatherRollup):
+    """Agrégats journaliers par ville (jour local)"""
+    day = models.DateField()
+
+    class Meta:
+        app_label = 'weather'
+        ordering = ['city', 'day']
+        unique_together = ['city', 'day']
+        indexes = [
+            models.Index(Upper('city'), 'day', name='daily_city_upper_day_idx'),
+            models.Index(fields=['day'], name='daily_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.city} - {self.day} : {self.temperature_min}-{self.temperature_max}°C"
@@ -0,0 +1,184 @@
+"""
+Agrégats horaires et journaliers des lectures météo (WeatherHourly, WeatherDaily)
+
+Après chaque ingestion, les heures touchées sont recalculées à partir de
+WeatherData (GROUP BY ville, heure sur une plage étroite), puis les jours
+correspondants à partir des heures. Recalculer plutôt qu'incrémenter rend
+l'opération idempotente : une lecture réenregistrée (upsert) n'est jamais
+comptée deux fois.
+
+Les historiques longs lisent ces tables : un graphique sur 90 jours lit
+environ 90 lignes par ville.
+"""
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Min, Sum, Count, Value, When
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+from .classification import ALERT_LEVEL_CODES
+from .models import WeatherData, WeatherHourly, WeatherDaily
+
+ROLLUP_FIELDS = [
+    'samples', 'temperature_min', 'temperature_max', 'temperature_sum',
+    'feels_like_min', 'feels_like_max', 'feels_like_sum',
+    'humidity_min', 'humidity_max', 'humidity_sum',
+    'temp_max', 'alert_level', 'first_recorded_at', 'last_recorded_at', 'updated_at',
+]
+
+
+def _alert_code(field='alert_level'):
+    """Niveau d'alerte en entier (0 = vert ... 3 = rouge) pour un MAX() SQL"""
+    return Case(
+        *[When(**{field: level}, then=Value(code)) for code, level in enumerate(ALERT_LEVEL_CODES)],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _aggregate_raw(cities, start, end):
+    """Agrégats horaires calculés depuis WeatherData sur [start, end[ (cities=None : toutes)"""
+    queryset = WeatherData.objects.filter(recorded_at__gte=start, recorded_at__lt=end)
+    if cities is not None:
+        queryset = queryset.filter(city__in=cities)
+    return (
+        queryset
+        .annotate(bucket=TruncHour('recorded_at'))
+        .order_by()
+        .values('city', 'bucket')
+        .annotate(
+            samples=Count('id'),
+            temperature_min=Min('temperature'),
+            temperature_max=Max('temperature'),
+            temperature_sum=Sum('temperature'),
+            feels_like_min=Min('feels_like'),
+            feels_like_max=Max('feels_like'),
+            feels_like_sum=Sum('feels_like'),
+            humidity_min=Min('humidity'),
+            humidity_max=Max('humidity'),
+            humidity_sum=Sum('humidity'),
+            temp_max_max=Max('temp_max'),
+            alert_code=Max(_alert_code()),
+            first_recorded_at=Min('recorded_at'),
+            last_recorded_at=Max('recorded_at'),
+        )
+    )
+
+
+def _aggregate_hourly(cities, start, end):
+    """Agrégats journaliers calculés depuis WeatherHourly sur [start, end[ (cities=None : toutes)"""
+    queryset = WeatherHourly.objects.filter(hour__gte=start, hour__lt=end)
+    if cities is not None:
+        queryset = queryset.filter(city__in=cities)
+    return (
+        queryset
+        .annotate(bucket=TruncDate('hour'))
+        .order_by()
+        .values('city', 'bucket')
+        .annotate(
+            samples=Sum('samples'),
+            temperature_min=Min('temperature_min'),
+            temperature_max=Max('temperature_max'),
+            temperature_sum=Sum('temperature_sum'),
+            feels_like_min=Min('feels_like_min'),
+            feels_like_max=Max('feels_like_max'),
+            feels_like_sum=Sum('feels_like_sum'),
+            humidity_min=Min('humidity_min'),
+            humidity_max=Max('humidity_max'),
+            humidity_sum=Sum('humidity_sum'),
+            temp_max_max=Max('temp_max'),
+            alert_code=Max(_alert_code()),
+            first_recorded_at=Min('first_recorded_at'),
+            last_recorded_at=Max('last_recorded_at'),
+        )
+    )
+
+
+def _to_rollup(model, bucket_field, row, now):
+    values = {field: row[field] for field in ROLLUP_FIELDS if field in row and field != 'alert_level'}
+    return model(
+        city=row['city'],
+        temp_max=row['temp_max_max'],
+        alert_level=ALERT_LEVEL_CODES[row['alert_code'] or 0],
+        updated_at=now,
+        **{bucket_field: row['bucket']},
+        **values,
+    )
+
+
+def _upsert(model, bucket_field, rows):
+    now = timezone.now()
+    objects = [_to_rollup(model, bucket_field, row, now) for row in rows]
+    if objects:
+        model.objects.bulk_create(
+            objects,
+            update_conflicts=True,
+            unique_fields=['city', bucket_field],
+            update_fields=ROLLUP_FIELDS,
+        )
+    return len(objects)
+
+
+def _day_bounds(first_day, last_day):
+    """[début du premier jour, début du lendemain du dernier[ en heure locale"""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(first_day, time.min), tz)
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def refresh_rollups(readings):
+    """
+    Recalculer les heures et les jours touchés par des lectures
+
+    readings : itérable d'objets ou de dicts portant city et recorded_at.
+    À appeler dans la transaction d'ingestion.
+    """
+    pairs = set()
+    for reading in readings:
+        if isinstance(reading, dict):
+            pairs.add((reading['city'], reading['recorded_at']))
+        else:
+            pairs.add((reading.city, reading.recorded_at))
+    if not pairs:
+        return
+
+    cities = {city for city, _ in pairs}
+    days = [timezone.localtime(recorded_at).date() for _, recorded_at in pairs]
+    start, end = _day_bounds(min(days), max(days))
+    earliest = min(recorded_at for _, recorded_at in pairs)
+    latest = max(recorded_at for _, recorded_at in pairs)
+
+    with transaction.atomic():
+        # Heures touchées seulement (entières), puis leurs jours complets
+        hour_start = timezone.localtime(earliest).replace(minute=0, second=0, microsecond=0)
+        hour_end = timezone.localtime(latest).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        _upsert(WeatherHourly, 'hour', _aggregate_raw(cities, hour_start, hour_end))
+        _upsert(WeatherDaily, 'day', _aggregate_hourly(cities, start, end))
+
+
+def rebuild_rollups(start=None, end=None, chunk_days=7, cities=None):
+    """
+    Reconstruire les agrégats depuis WeatherData, chunk_days jours à la fois
+
+    start / end : dates locales (bornes incluses) ; par défaut toute la plage
+    présente en base. Retourne (heures, jours) écrits.
+    """
+    if start is None or end is None:
+        bounds = WeatherData.objects.order_by().aggregate(first=Min('recorded_at'), last=Max('recorded_at'))
+        if bounds['first'] is None:
+            return 0, 0
+        start = start or timezone.localtime(bounds['first']).date()
+        end = end or timezone.localtime(bounds['last']).date()
+
+    hours_written = 0
+    days_written = 0
+    day = start
+    while day <= end:
+        last_day = min(end, day + timedelta(days=chunk_days - 1))
+        range_start, range_end = _day_bounds(day, last_day)
+        with transaction.atomic():
+            hours_written += _upsert(WeatherHourly, 'hour', _aggregate_raw(cities, range_start, range_end))
+            days_written += _upsert(WeatherDaily, 'day', _aggregate_hourly(cities, range_start, range_end))
+        day = last_day + timedelta(days=1)
+
+    return hours_written, days_written
@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from .models import WeatherData
+from .models import WeatherData, LatestWeather, WeatherForecast, WeatherHourly, WeatherDaily
 from core.models import SenegalCity
+from .classification import classify_readings
 
 class WeatherDataSerializer(serializers.ModelSerializer):
     """Serializer pour les données météorologiques"""
@@ -20,11 +21,11 @@ class WeatherDataSerializer(serializers.ModelSerializer):
         return obj.get_alert_color()
 
 class CurrentWeatherSerializer(serializers.ModelSerializer):
-    """Serializer simplifié pour la météo actuelle"""
+    """Serializer simplifié pour la météo actuelle (dernière lecture par ville)"""
     alert_color = serializers.SerializerMethodField()
     
     class Meta:
-        model = WeatherData
+        model = LatestWeather
         fields = [
             'city', 'temperature', 'feels_like', 'alert_level', 'alert_color', 'recorded_at'
         ]
@@ -32,31 +33,84 @@ class CurrentWeatherSerializer(serializers.ModelSerializer):
     def get_alert_color(self, obj):
         return obj.get_alert_color()
 
-class WeatherForecastSerializer(serializers.Serializer):
-    """Serializer pour les prévisions météo (données externes)"""
-    city = serializers.CharField()
-    date = serializers.DateTimeField()
-    temp_max = serializers.FloatField()
-    temp_min = serializers.FloatField()
-    description = serializers.CharField()
-    alert_level = serializers.CharField()
-    alert_color = serializers.CharField()
+class WeatherForecastSerializer(serializers.ModelSerializer):
+    """Serializer pour les prévisions météo stockées (un créneau de 3 h)"""
+    alert_color = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = WeatherForecast
+        fields = [
+            'valid_at', 'temp_max', 'temp_min', 'feels_like', 'humidity',
+            'description', 'alert_level', 'alert_color'
+        ]
+    
+    def get_alert_color(self, obj):
+        return obj.get_alert_color()
+
+class WeatherRollupSerializer(serializers.ModelSerializer):
+    """Serializer pour les agrégats horaires ou journaliers (historiques longs)"""
+    period_start = serializers.SerializerMethodField()
+    temperature_mean = serializers.FloatField(read_only=True)
+    feels_like_mean = serializers.FloatField(read_only=True)
+    humidity_mean = serializers.FloatField(read_only=True)
+    alert_color = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = WeatherDaily
+        fields = [
+            'city', 'period_start', 'samples',
+            'temperature_min', 'temperature_max', 'temperature_mean',
+            'feels_like_min', 'feels_like_max', 'feels_like_mean',
+            'humidity_min', 'humidity_max', 'humidity_mean',
+            'temp_max', 'alert_level', 'alert_color'
+        ]
+    
+    def get_period_start(self, obj):
+        if isinstance(obj, WeatherHourly):
+            return serializers.DateTimeField().to_representation(obj.hour)
+        return obj.day.isoformat()
+    
+    def get_alert_color(self, obj):
+        return obj.get_alert_color()
 
 class SenegalCitySerializer(serializers.ModelSerializer):
-    """Serializer pour les villes du Sénégal"""
+    """
+    Serializer pour les villes du Sénégal
+    
+    Pour une liste de villes, passer context={'latest_weather': ...} construit
+    avec latest_weather_map() : la météo de toutes les villes est alors lue en
+    une seule requête au lieu d'une par ville.
+    """
     current_weather = serializers.SerializerMethodField()
     
     class Meta:
         model = SenegalCity
         fields = ['id', 'name', 'region', 'latitude', 'longitude', 'is_priority', 'current_weather']
     
+    @staticmethod
+    def latest_weather_map(cities):
+        """
+        Dernière lecture météo de chaque ville, indexée par nom (une requête)
+        
+        Le niveau d'alerte est recalculé avec les seuils courants : un
+        réglage modifié à chaud s'applique sans attendre la prochaine ingestion.
+        """
+        names = [city.name for city in cities]
+        readings = list(LatestWeather.objects.filter(city__in=names))
+        for weather, alert_level in zip(readings, classify_readings(readings)):
+            weather.alert_level = alert_level
+        return {weather.city: weather for weather in readings}
+    
     def get_current_weather(self, obj):
         # Récupérer la météo la plus récente pour cette ville
-        try:
-            latest_weather = WeatherData.objects.filter(city=obj.name).latest('recorded_at')
-            return CurrentWeatherSerializer(latest_weather).data
-        except WeatherData.DoesNotExist:
+        latest_map = self.context.get('latest_weather')
+        if latest_map is not None:
+            latest_weather = latest_map.get(obj.name)
+        else:
+            latest_weather = LatestWeather.objects.filter(city=obj.name).first()
+        if latest_weather is None:
             return None
+        return CurrentWeatherSerializer(latest_weather).data
 
 class WeatherAlertSerializer(serializers.Serializer):
     """Serializer pour les alertes météo basées sur la température"""
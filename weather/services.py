@@ -1,16 +1,359 @@
+import contextvars
 import requests
 import os
-from datetime import datetime
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import connections, transaction
 from django.utils import timezone
 from django.conf import settings
-from .models import WeatherData
+from requests.adapters import HTTPAdapter
+from core.cache import invalidate
+from core.cities import resolve_city
+from core.quota import QuotaExceeded, TokenBucketLimiter, quota_priority
+from .classification import classify_readings, classify_temperature
+from .rollups import refresh_rollups
+from .models import WeatherData, LatestWeather, WeatherForecast
+
+# Champs mis à jour quand une lecture (ville, recorded_at) existe déjà
+WEATHER_UPSERT_FIELDS = [
+    'latitude', 'longitude', 'temperature', 'temp_max', 'temp_min',
+    'feels_like', 'humidity', 'description', 'alert_level', 'source',
+]
+
+# Champs mis à jour quand un créneau de prévision (ville, valid_at) existe déjà
+FORECAST_UPSERT_FIELDS = [
+    'temp_max', 'temp_min', 'feels_like', 'humidity', 'description',
+    'alert_level', 'source', 'fetched_at',
+]
+
+
+def build_http_session(pool_size=10):
+    """
+    Créer une session HTTP persistante (keep-alive) avec un pool de connexions
+    
+    Aucune nouvelle tentative automatique : elles sont faites par le
+    fournisseur, qui consomme un jeton du limiteur à chacune.
+    """
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+    
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Connection': 'keep-alive'})
+    return session
+
+
+class GeoCellCache:
+    """
+    Cache en mémoire des lectures météo par cellule de coordonnées
+    
+    Les coordonnées sont arrondies à `precision` décimales (2 ≈ 1,1 km) : des
+    utilisateurs voisins partagent la même entrée. Les entrées expirent après
+    `ttl` secondes et les moins récemment utilisées sont évincées au-delà de
+    `max_entries`, ce qui borne la mémoire occupée.
+    """
+    
+    def __init__(self, precision=2, ttl=600, max_entries=2048):
+        self.precision = precision
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def cell(self, lat, lon):
+        """Cellule (clé de cache) contenant des coordonnées"""
+        return round(float(lat), self.precision), round(float(lon), self.precision)
+    
+    def get(self, lat, lon):
+        key = self.cell(lat, lon)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+    
+    def set(self, lat, lon, value):
+        key = self.cell(lat, lon)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def get_or_fetch(self, lat, lon, fetch):
+        """Lecture à travers le cache : fetch() n'est appelé qu'en cas d'absence"""
+        value = self.get(lat, lon)
+        if value is None:
+            value = fetch()
+            if value:
+                self.set(lat, lon, value)
+        return value
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+class CircuitOpenError(Exception):
+    """Appel refusé sans contacter le fournisseur : circuit ouvert"""
+    
+    def __init__(self, name, retry_after):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Fournisseur {name} indisponible (circuit ouvert, sonde dans {retry_after:.0f}s)")
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'un fournisseur externe (en mémoire, par processus)
+    
+    Après failure_threshold échecs consécutifs (délai dépassé, connexion
+    impossible, erreur 5xx), le circuit s'ouvre : les appels échouent
+    immédiatement au lieu d'attendre le délai réseau. Après reset_timeout
+    secondes, une seule sonde est autorisée (état semi-ouvert) ; son succès
+    referme le circuit, son échec le rouvre pour reset_timeout secondes.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold=3, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+    
+    def allow_request(self):
+        """Un appel peut-il partir ? (toujours vrai pour le thread de la sonde)"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            return self.state == self.HALF_OPEN and getattr(self._local, 'probing', False)
+    
+    def retry_after(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 0
+            return max(0, self.reset_timeout - (time.monotonic() - self.opened_at))
+    
+    def start_probe(self):
+        """Passer en semi-ouvert si la sonde est due ; un seul appelant obtient True"""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+    
+    @contextmanager
+    def probing(self):
+        """Autoriser les appels du thread courant pendant la sonde"""
+        self._local.probing = True
+        try:
+            yield
+        finally:
+            self._local.probing = False
+            with self._lock:
+                # Sonde terminée sans succès ni échec enregistré (exception
+                # avant l'appel réseau) : nouvelle période d'ouverture complète
+                if self.state == self.HALF_OPEN:
+                    self.state = self.OPEN
+                    self.opened_at = time.monotonic()
+    
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'times_opened': self.times_opened,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+            }
+
+
+def parse_city_ids(value):
+    """
+    Identifiants de villes OpenWeatherMap : dict, ou chaîne « Ville=ID,Ville=ID »
+    """
+    if isinstance(value, dict):
+        return {name: str(city_id) for name, city_id in value.items()}
+    
+    city_ids = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, city_id = item.split('=', 1)
+            if name.strip() and city_id.strip():
+                city_ids[name.strip()] = city_id.strip()
+    return city_ids
+
+
+class OpenWeatherMapProvider:
+    """
+    Accès HTTP à OpenWeatherMap : /weather, /forecast et /group
+    
+    /group renvoie la météo actuelle de plusieurs villes (20 au plus) en un
+    seul appel, mais n'accepte que des identifiants de villes OpenWeatherMap :
+    seules les villes présentes dans city_ids en profitent, les autres restent
+    en appels unitaires par coordonnées.
+    
+    Chaque tentative consomme un jeton du limiteur partagé (limiter), avec
+    la classe de priorité courante (core.quota.quota_priority), et passe par
+    le disjoncteur (breaker) : circuit ouvert, elle échoue sans appel réseau.
+    Les erreurs 429/5xx et réseau sont retentées au plus `retries` fois, avec
+    un backoff exponentiel (ou le délai Retry-After, s'il est plus long).
+    """
+    name = 'openweathermap'
+    max_group_size = 20
+    retry_statuses = (429, 500, 502, 503, 504)
+    
+    def __init__(self, base_url, api_key=None, city_ids=None, limiter=None, breaker=None,
+                 retries=3, backoff_factor=0.5):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.city_ids = parse_city_ids(city_ids)
+        self.limiter = limiter
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+    
+    def _backoff(self, attempt, response=None):
+        """Attendre avant la tentative suivante"""
+        delay = self.backoff_factor * (2 ** attempt)
+        retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+        if retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        time.sleep(delay)
+    
+    def _get(self, session, endpoint, params, timeout):
+        query = {
+            'appid': self.api_key,
+            'units': 'metric',  # Celsius
+            'lang': 'fr'
+        }
+        query.update(params)
+        
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow_request():
+                raise CircuitOpenError(self.name, self.breaker.retry_after())
+            if self.limiter is not None:
+                self.limiter.acquire()
+            last_attempt = attempt == self.retries
+            try:
+                response = session.get(f"{self.base_url}/{endpoint}", params=query, timeout=timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if last_attempt:
+                    self.breaker.record_failure()
+                    raise
+                self._backoff(attempt)
+                continue
+            if response.status_code in self.retry_statuses and not last_attempt:
+                self._backoff(attempt, response)
+                continue
+            # Un 4xx vient d'un fournisseur joignable : seuls les 5xx comptent comme panne
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            response.raise_for_status()
+            return response.json()
+    
+    def current(self, session, params, timeout):
+        """Météo actuelle d'un lieu (réponse brute de /weather)"""
+        return self._get(session, 'weather', params, timeout)
+    
+    def forecast(self, session, params, timeout):
+        """Prévisions 5 jours d'un lieu (réponse brute de /forecast)"""
+        return self._get(session, 'forecast', params, timeout)
+    
+    def supports_group(self, city_name):
+        return city_name in self.city_ids
+    
+    def group_chunks(self, city_names):
+        """Découper les villes groupables en lots de max_group_size"""
+        groupable = [name for name in city_names if self.supports_group(name)]
+        return [
+            groupable[i:i + self.max_group_size]
+            for i in range(0, len(groupable), self.max_group_size)
+        ]
+    
+    def current_group(self, session, city_names, timeout):
+        """
+        Météo actuelle de plusieurs villes en un appel : {ville: réponse brute}
+        
+        Une ville absente de la réponse est simplement absente du résultat.
+        """
+        names_by_id = {self.city_ids[name]: name for name in city_names}
+        data = self._get(session, 'group', {'id': ','.join(names_by_id)}, timeout)
+        return {
+            names_by_id[str(item['id'])]: item
+            for item in data.get('list', [])
+            if str(item.get('id')) in names_by_id
+        }
+
 
 class WeatherService:
     """Service pour récupérer et traiter les données météorologiques"""
     
     def __init__(self):
-        self.api_key = getattr(settings, 'OPENWEATHER_API_KEY', os.environ.get('OPENWEATHER_API_KEY'))
-        self.base_url = "https://api.openweathermap.org/data/2.5"
+        self.provider = OpenWeatherMapProvider(
+            base_url=getattr(settings, 'OPENWEATHER_BASE_URL', 'https://api.openweathermap.org/data/2.5'),
+            api_key=getattr(settings, 'OPENWEATHER_API_KEY', os.environ.get('OPENWEATHER_API_KEY')),
+            city_ids=getattr(settings, 'OPENWEATHER_CITY_IDS', ''),
+            limiter=TokenBucketLimiter(
+                'openweathermap',
+                rate_per_minute=float(getattr(settings, 'WEATHER_API_RATE_PER_MINUTE', 60)),
+                burst=float(getattr(settings, 'WEATHER_API_BURST', 60)),
+                daily_limit=int(getattr(settings, 'WEATHER_API_DAILY_LIMIT', 0))
+            ),
+            breaker=CircuitBreaker(
+                failure_threshold=int(getattr(settings, 'WEATHER_CIRCUIT_FAILURE_THRESHOLD', 3)),
+                reset_timeout=float(getattr(settings, 'WEATHER_CIRCUIT_RESET_TIMEOUT', 30))
+            ),
+            retries=int(getattr(settings, 'WEATHER_HTTP_RETRIES', 3)),
+            backoff_factor=float(getattr(settings, 'WEATHER_HTTP_BACKOFF', 0.5))
+        )
         
         # Villes prioritaires du Sénégal avec coordonnées
         self.priority_cities = {
@@ -23,56 +366,223 @@ class WeatherService:
             'Tambacounda': {'lat': 13.7667, 'lon': -13.6667},
             'Ziguinchor': {'lat': 12.5833, 'lon': -16.2833},
         }
+        
+        # Rafraîchissement concurrent : nombre d'appels simultanés,
+        # délai maximal par ville et délai maximal pour tout le lot (secondes)
+        self.max_workers = int(getattr(settings, 'WEATHER_REFRESH_MAX_WORKERS', 8))
+        self.city_timeout = float(getattr(settings, 'WEATHER_CITY_TIMEOUT', 10))
+        self.batch_timeout = float(getattr(settings, 'WEATHER_BATCH_TIMEOUT', 30))
+        
+        # Session HTTP partagée (créée à la première utilisation)
+        self.http_pool_size = int(getattr(settings, 'WEATHER_HTTP_POOL_SIZE', 10))
+        self._session = None
+        self._session_lock = threading.Lock()
+        
+        # Cache des lectures par coordonnées (appels ad hoc, hors rafraîchissement planifié)
+        self.geo_cache = GeoCellCache(
+            precision=int(getattr(settings, 'WEATHER_GEO_CACHE_PRECISION', 2)),
+            ttl=float(getattr(settings, 'WEATHER_GEO_CACHE_TTL', 600)),
+            max_entries=int(getattr(settings, 'WEATHER_GEO_CACHE_MAX_ENTRIES', 2048))
+        )
+    
+    @property
+    def api_key(self):
+        return self.provider.api_key
+    
+    @api_key.setter
+    def api_key(self, value):
+        self.provider.api_key = value
+    
+    @property
+    def base_url(self):
+        return self.provider.base_url
+    
+    @base_url.setter
+    def base_url(self, value):
+        self.provider.base_url = value.rstrip('/')
+    
+    @property
+    def session(self):
+        """Session HTTP persistante, partagée par tous les threads du service"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = build_http_session(pool_size=self.http_pool_size)
+        return self._session
+    
+    def get_http_stats(self):
+        """
+        Compteurs du pool de connexions : connexions ouvertes et réutilisées
+        """
+        opened = 0
+        requests_sent = 0
+        
+        if self._session is not None:
+            # Le même adaptateur est monté sur http:// et https://
+            adapters = {id(adapter): adapter for adapter in self._session.adapters.values()}
+            for adapter in adapters.values():
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    opened += pool.num_connections
+                    requests_sent += pool.num_requests
+        
+        return {
+            'requests': requests_sent,
+            'connections_opened': opened,
+            'connections_reused': max(0, requests_sent - opened),
+        }
     
-    def get_current_weather(self, city_name=None, lat=None, lon=None):
+    def get_current_weather(self, city_name=None, lat=None, lon=None, cached=False, allow_stale=True):
         """
         Récupérer la météo actuelle pour une ville ou des coordonnées
+        
+        Les lectures par coordonnées passent par le cache géographique ; avec
+        cached=True, les villes prioritaires aussi (appels ad hoc). Le
+        rafraîchissement planifié appelle toujours l'API.
+        
+        Si l'appel échoue ou que le circuit est ouvert, la dernière lecture
+        connue est renvoyée, marquée stale=True avec son âge (age_seconds).
+        Le rafraîchissement passe allow_stale=False : il reçoit alors None ou
+        CircuitOpenError, jamais une ancienne lecture à réenregistrer.
         """
         if not self.api_key:
             raise Exception("Clé API OpenWeatherMap manquante")
         
-        params = {
-            'appid': self.api_key,
-            'units': 'metric',  # Celsius
-            'lang': 'fr'
-        }
+        params = {}
         
         if city_name and city_name in self.priority_cities:
             coords = self.priority_cities[city_name]
             params['lat'] = coords['lat']
             params['lon'] = coords['lon']
         elif lat and lon:
+            # Coordonnées proches d'une ville connue : lecture déjà en base
+            snapshot = self.get_snapshot_for_coordinates(lat, lon)
+            if snapshot:
+                return snapshot
             params['lat'] = lat
             params['lon'] = lon
         else:
             raise Exception("Ville non supportée ou coordonnées manquantes")
         
         try:
-            response = requests.get(f"{self.base_url}/weather", params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            if city_name in self.priority_cities and cached:
+                weather_data = self.geo_cache.get_or_fetch(
+                    params['lat'], params['lon'], lambda: self._fetch_current(params, city_name)
+                )
+            elif city_name in self.priority_cities:
+                weather_data = self._fetch_current(params, city_name)
+            else:
+                weather_data = self.geo_cache.get_or_fetch(lat, lon, lambda: self._fetch_current(params))
+        except CircuitOpenError:
+            self._schedule_probe(params, city_name)
+            if not allow_stale:
+                raise
+            weather_data = None
+        
+        if weather_data is None and allow_stale:
+            return self.get_stale_weather(city_name, lat, lon)
+        return weather_data
+    
+    def get_stale_weather(self, city_name=None, lat=None, lon=None):
+        """
+        Dernière lecture connue (LatestWeather) d'une ville, ou de la ville la
+        plus proche des coordonnées, quel que soit son âge ; None si aucune
+        """
+        if city_name is None and lat is not None and lon is not None:
+            city_name = resolve_city(float(lat), float(lon))
+        if not city_name:
+            return None
+        
+        latest = LatestWeather.objects.filter(city=city_name).first()
+        if latest is None:
+            return None
+        
+        weather_data = self._snapshot_to_dict(latest)
+        weather_data['stale'] = True
+        weather_data['age_seconds'] = int((timezone.now() - latest.recorded_at).total_seconds())
+        return weather_data
+    
+    def _schedule_probe(self, params, city_name=None):
+        """
+        Circuit ouvert depuis reset_timeout : sonder le fournisseur en arrière-plan
+        
+        Un seul appel, hors requête client ; en cas de succès le circuit se
+        referme et, pour une ville prioritaire, la lecture est enregistrée.
+        """
+        breaker = self.provider.breaker
+        if not breaker.start_probe():
+            return
+        
+        def probe():
+            try:
+                with breaker.probing():
+                    weather_data = self._fetch_current(params, city_name)
+                if weather_data and city_name in self.priority_cities:
+                    self.save_weather_batch([weather_data])
+            except Exception as e:
+                print(f"Sonde OpenWeatherMap en échec: {e}")
+            finally:
+                connections.close_all()
+        
+        threading.Thread(
+            target=contextvars.copy_context().run, args=(probe,),
+            daemon=True, name='weather-probe'
+        ).start()
+    
+    def _fetch_current(self, params, city_name=None):
+        """Appel de l'endpoint /weather d'OpenWeatherMap"""
+        try:
+            data = self.provider.current(self.session, params, self.city_timeout)
             
             return self._process_weather_data(data, city_name)
             
         except requests.exceptions.RequestException as e:
             print(f"Erreur API OpenWeatherMap: {e}")
             return None
+        except (QuotaExceeded, CircuitOpenError):
+            raise
         except Exception as e:
             print(f"Erreur traitement données météo: {e}")
             return None
     
-    def get_forecast(self, city_name=None, lat=None, lon=None, days=5):
+    def get_snapshot_for_coordinates(self, lat, lon):
+        """
+        Dernière lecture de la ville connue la plus proche, si elle est assez
+        récente (WEATHER_SNAPSHOT_MAX_AGE minutes) ; None sinon
+        """
+        city_name = resolve_city(float(lat), float(lon))
+        if not city_name:
+            return None
+        
+        max_age = timedelta(minutes=float(getattr(settings, 'WEATHER_SNAPSHOT_MAX_AGE', 180)))
+        latest = LatestWeather.objects.filter(
+            city=city_name, recorded_at__gte=timezone.now() - max_age
+        ).first()
+        if latest is None:
+            return None
+        
+        return self._snapshot_to_dict(latest)
+    
+    def _snapshot_to_dict(self, latest):
+        """Convertir une ligne LatestWeather au format de _process_weather_data"""
+        weather_data = {field: getattr(latest, field) for field in WEATHER_UPSERT_FIELDS}
+        weather_data['city'] = latest.city
+        weather_data['recorded_at'] = latest.recorded_at
+        return weather_data
+    
+    def get_forecast(self, city_name=None, lat=None, lon=None, days=5, limit=15):
         """
         Récupérer les prévisions météo (5 jours)
+        
+        limit borne le nombre de créneaux de 3 h renvoyés (None : tous).
         """
         if not self.api_key:
             raise Exception("Clé API OpenWeatherMap manquante")
         
-        params = {
-            'appid': self.api_key,
-            'units': 'metric',
-            'lang': 'fr'
-        }
+        params = {}
         
         if city_name and city_name in self.priority_cities:
             coords = self.priority_cities[city_name]
@@ -85,11 +595,9 @@ class WeatherService:
             raise Exception("Ville non supportée ou coordonnées manquantes")
         
         try:
-            response = requests.get(f"{self.base_url}/forecast", params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self.provider.forecast(self.session, params, self.city_timeout)
             
-            return self._process_forecast_data(data, city_name)
+            return self._process_forecast_data(data, city_name, limit=limit)
             
         except requests.exceptions.RequestException as e:
             print(f"Erreur API prévisions: {e}")
@@ -108,7 +616,14 @@ class WeatherService:
             humidity = data['main']['humidity']
             
             # Déterminer le niveau d'alerte basé sur la température max
-            alert_level = self._calculate_alert_level(temp_max)
+            alert_level = self._calculate_alert_level(temp_max, humidity, city_name or data.get('name'))
+            
+            # Horodatage de l'observation fourni par l'API : deux appels qui
+            # renvoient la même observation aboutissent à la même ligne
+            if data.get('dt'):
+                recorded_at = datetime.fromtimestamp(data['dt'], tz=dt_timezone.utc)
+            else:
+                recorded_at = timezone.now()
             
             weather_data = {
                 'city': city_name or data.get('name', 'Unknown'),
@@ -121,7 +636,7 @@ class WeatherService:
                 'humidity': humidity,
                 'alert_level': alert_level,
                 'source': 'openweathermap',
-                'recorded_at': timezone.now(),
+                'recorded_at': recorded_at,
                 'description': data['weather'][0]['description'] if data['weather'] else ''
             }
             
@@ -131,20 +646,22 @@ class WeatherService:
             print(f"Données météo incomplètes: {e}")
             return None
     
-    def _process_forecast_data(self, data, city_name=None):
+    def _process_forecast_data(self, data, city_name=None, limit=15):
         """
         Traiter les données de prévisions
         """
         forecasts = []
         
         try:
-            for item in data['list'][:15]:  # 5 jours * 3 prévisions par jour
+            for item in data['list'][:limit]:  # Créneaux de 3 h
                 temp_max = item['main']['temp_max']
-                alert_level = self._calculate_alert_level(temp_max)
+                alert_level = self._calculate_alert_level(
+                    temp_max, item['main'].get('humidity'), city_name or data['city']['name']
+                )
                 
                 forecast = {
                     'city': city_name or data['city']['name'],
-                    'datetime': datetime.fromtimestamp(item['dt']),
+                    'datetime': datetime.fromtimestamp(item['dt'], tz=dt_timezone.utc),
                     'temp_max': round(temp_max, 1),
                     'temp_min': round(item['main']['temp_min'], 1),
                     'feels_like': round(item['main']['feels_like'], 1),
@@ -161,48 +678,249 @@ class WeatherService:
             print(f"Erreur traitement prévisions: {e}")
             return []
     
-    def _calculate_alert_level(self, temperature):
+    def _calculate_alert_level(self, temperature, humidity=None, city=None):
         """
         Calculer le niveau d'alerte basé sur la température
-        Seuils adaptés au climat sénégalais
-        """
-        if temperature >= 45:
-            return 'red'      # Très dangereux
-        elif temperature >= 40:
-            return 'orange'   # Dangereux
-        elif temperature >= 35:
-            return 'yellow'   # Très inconfortable
-        else:
-            return 'green'    # Normal
+        Seuils adaptés au climat sénégalais, réglables par région ou ville
+        (weather.classification)
+        """
+        return classify_temperature(temperature, humidity, city)
+    
+    def fetch_weather_concurrently(self, city_names, fetch=None):
+        """
+        Récupérer la météo de plusieurs villes en parallèle
+        
+        Les appels passent par un pool de threads borné (max_workers). Chaque
+        ville dispose de son propre délai (city_timeout) à partir du moment où
+        son appel démarre, et l'ensemble du lot s'arrête après batch_timeout :
+        une ville lente ne bloque jamais les autres.
+        
+        Retourne un tuple (résultats, erreurs) : {ville: données} et {ville: message}.
+        """
+        fetch = fetch or (lambda city_name: self.get_current_weather(city_name, allow_stale=False))
+        results = {}
+        errors = {}
+        
+        if not city_names:
+            return results, errors
+        
+        started = {}
+        
+        def run(city_name):
+            started[city_name] = time.monotonic()
+            try:
+                return fetch(city_name)
+            finally:
+                # Connexions ouvertes par ce thread (limiteur, instantanés)
+                connections.close_all()
+        
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, min(self.max_workers, len(city_names))),
+            thread_name_prefix='weather-refresh'
+        )
+        # Chaque thread hérite du contexte courant (classe de priorité du quota)
+        futures = {
+            executor.submit(contextvars.copy_context().run, run, city_name): city_name
+            for city_name in city_names
+        }
+        pending = set(futures)
+        batch_deadline = time.monotonic() + self.batch_timeout
+        
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= batch_deadline:
+                    break
+                
+                # Abandonner les villes qui ont dépassé leur propre délai
+                for future in list(pending):
+                    city_name = futures[future]
+                    if city_name in started and now - started[city_name] >= self.city_timeout:
+                        pending.discard(future)
+                        errors[city_name] = f"Délai dépassé pour {city_name} ({self.city_timeout:g}s)"
+                
+                deadlines = [batch_deadline] + [
+                    started[futures[future]] + self.city_timeout
+                    for future in pending if futures[future] in started
+                ]
+                done, pending = wait(
+                    pending,
+                    timeout=max(0, min(deadlines) - now),
+                    return_when=FIRST_COMPLETED
+                )
+                
+                for future in done:
+                    city_name = futures[future]
+                    try:
+                        results[city_name] = future.result()
+                    except Exception as e:
+                        errors[city_name] = f"Erreur {city_name}: {str(e)}"
+        finally:
+            # Ne pas attendre les appels abandonnés
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        for future in pending:
+            city_name = futures[future]
+            errors[city_name] = f"Délai global dépassé pour {city_name} ({self.batch_timeout:g}s)"
+        
+        return results, errors
+    
+    def fetch_current_batch(self, city_names):
+        """
+        Météo actuelle de plusieurs villes avec le moins d'appels possible
+        
+        Les villes dont le fournisseur connaît l'identifiant sont demandées par
+        lots (un appel /group par lot), les autres ville par ville ; lots et
+        appels unitaires partagent le même pool de threads. Les villes d'un lot
+        en échec ou absentes de sa réponse sont redemandées une par une.
+        
+        Retourne un tuple (résultats, erreurs) comme fetch_weather_concurrently.
+        """
+        groups = {', '.join(chunk): chunk for chunk in self.provider.group_chunks(city_names)}
+        grouped = {name for chunk in groups.values() for name in chunk}
+        singles = [name for name in city_names if name not in grouped]
+        
+        def fetch(unit):
+            if unit in groups:
+                return self._fetch_group(groups[unit])
+            return self.get_current_weather(unit, allow_stale=False)
+        
+        raw_results, raw_errors = self.fetch_weather_concurrently(list(groups) + singles, fetch=fetch)
+        
+        results = {}
+        errors = {}
+        fallback = []
+        for unit, value in raw_results.items():
+            if unit in groups:
+                results.update(value)
+                fallback.extend(name for name in groups[unit] if name not in value)
+            else:
+                results[unit] = value
+        for unit, message in raw_errors.items():
+            if unit in groups:
+                print(f"⚠️ Requête groupée en échec, repli ville par ville: {message}")
+                fallback.extend(groups[unit])
+            else:
+                errors[unit] = message
+        
+        if fallback:
+            fallback_results, fallback_errors = self.fetch_weather_concurrently(
+                fallback, fetch=lambda city_name: self.get_current_weather(city_name, allow_stale=False)
+            )
+            results.update(fallback_results)
+            errors.update(fallback_errors)
+        
+        return results, errors
+    
+    def _fetch_group(self, city_names):
+        """Un appel /group pour un lot de villes : {ville: données traitées}"""
+        raw = self.provider.current_group(self.session, city_names, self.city_timeout)
+        results = {}
+        for city_name, data in raw.items():
+            weather_data = self._process_weather_data(data, city_name)
+            if weather_data:
+                results[city_name] = weather_data
+        return results
+    
+    def save_weather_batch(self, weather_list):
+        """
+        Enregistrer un cycle complet de lectures météo en une seule transaction
+        
+        Un seul INSERT ... ON CONFLICT (city, recorded_at) DO UPDATE, quel que
+        soit le nombre de villes. L'instantané LatestWeather et les agrégats
+        horaires / journaliers sont mis à jour dans la même transaction.
+        """
+        # Dédoublonner sur la clé unique (la dernière lecture gagne)
+        readings = {}
+        for weather_data in weather_list:
+            readings[(weather_data['city'], weather_data['recorded_at'])] = weather_data
+        
+        if not readings:
+            return []
+        
+        objects = [WeatherData(**weather_data) for weather_data in readings.values()]
+        
+        with transaction.atomic():
+            WeatherData.objects.bulk_create(
+                objects,
+                update_conflicts=True,
+                unique_fields=['city', 'recorded_at'],
+                update_fields=WEATHER_UPSERT_FIELDS,
+            )
+            self._update_latest_weather(objects)
+            refresh_rollups(objects)
+        
+        invalidate('weather')
+        return objects
+    
+    def _update_latest_weather(self, readings):
+        """
+        Mettre à jour l'instantané LatestWeather (une ligne par ville)
+        sans jamais remplacer une lecture plus récente
+        """
+        newest = {}
+        for reading in readings:
+            if reading.city not in newest or reading.recorded_at > newest[reading.city].recorded_at:
+                newest[reading.city] = reading
+        
+        known = dict(
+            LatestWeather.objects.filter(city__in=newest.keys()).values_list('city', 'recorded_at')
+        )
+        
+        snapshots = [
+            LatestWeather(
+                city=city,
+                recorded_at=reading.recorded_at,
+                **{field: getattr(reading, field) for field in WEATHER_UPSERT_FIELDS}
+            )
+            for city, reading in newest.items()
+            if city not in known or reading.recorded_at >= known[city]
+        ]
+        
+        if snapshots:
+            LatestWeather.objects.bulk_create(
+                snapshots,
+                update_conflicts=True,
+                unique_fields=['city'],
+                update_fields=WEATHER_UPSERT_FIELDS + ['recorded_at', 'updated_at'],
+            )
     
-    def update_weather_for_all_cities(self):
+    def update_weather_for_all_cities(self, priority='scheduled'):
         """
         Mettre à jour la météo pour toutes les villes prioritaires
+        
+        Les appels réseau sont faits en parallèle (et groupés quand le
+        fournisseur le permet), puis tout le cycle est enregistré en base en
+        une seule écriture groupée. priority est la classe de quota des appels.
         """
         updated_cities = []
         errors = []
+        readings = []
+        
+        with quota_priority(priority):
+            results, fetch_errors = self.fetch_current_batch(list(self.priority_cities.keys()))
         
         for city_name in self.priority_cities.keys():
-            try:
-                weather_data = self.get_current_weather(city_name)
-                
-                if weather_data:
-                    # Sauvegarder en base de données
-                    weather_obj, created = WeatherData.objects.update_or_create(
-                        city=weather_data['city'],
-                        recorded_at__date=timezone.now().date(),
-                        defaults=weather_data
-                    )
-                    
-                    updated_cities.append(city_name)
-                    print(f"✅ Météo mise à jour pour {city_name}: {weather_data['temp_max']}°C ({weather_data['alert_level']})")
-                else:
-                    errors.append(f"Aucune donnée pour {city_name}")
-                    
-            except Exception as e:
-                error_msg = f"Erreur {city_name}: {str(e)}"
-                errors.append(error_msg)
-                print(f"❌ {error_msg}")
+            if city_name in fetch_errors:
+                errors.append(fetch_errors[city_name])
+                print(f"❌ {fetch_errors[city_name]}")
+            elif results.get(city_name):
+                readings.append(results[city_name])
+            else:
+                errors.append(f"Aucune donnée pour {city_name}")
+        
+        try:
+            # Sauvegarder en base de données
+            self.save_weather_batch(readings)
+        except Exception as e:
+            error_msg = f"Erreur enregistrement météo: {str(e)}"
+            errors.append(error_msg)
+            print(f"❌ {error_msg}")
+            readings = []
+        
+        for weather_data in readings:
+            updated_cities.append(weather_data['city'])
+            print(f"✅ Météo mise à jour pour {weather_data['city']}: {weather_data['temp_max']}°C ({weather_data['alert_level']})")
         
         return {
             'updated_cities': updated_cities,
@@ -210,9 +928,100 @@ class WeatherService:
             'total_updated': len(updated_cities)
         }
     
+    def save_forecast_batch(self, forecast_list, fetched_at=None):
+        """
+        Enregistrer les prévisions d'un cycle en une seule transaction
+        
+        Upsert groupé sur (city, valid_at) : un créneau déjà connu est remplacé
+        par la prévision la plus récente. Les créneaux passés sont purgés.
+        """
+        fetched_at = fetched_at or timezone.now()
+        
+        # Dédoublonner sur la clé unique (la dernière prévision gagne)
+        slots = {}
+        for forecast in forecast_list:
+            slots[(forecast['city'], forecast['datetime'])] = forecast
+        
+        objects = [
+            WeatherForecast(
+                city=forecast['city'],
+                valid_at=forecast['datetime'],
+                temp_max=forecast['temp_max'],
+                temp_min=forecast['temp_min'],
+                feels_like=forecast['feels_like'],
+                humidity=forecast['humidity'],
+                description=forecast.get('description', ''),
+                alert_level=forecast['alert_level'],
+                fetched_at=fetched_at,
+            )
+            for forecast in slots.values()
+        ]
+        
+        with transaction.atomic():
+            if objects:
+                WeatherForecast.objects.bulk_create(
+                    objects,
+                    update_conflicts=True,
+                    unique_fields=['city', 'valid_at'],
+                    update_fields=FORECAST_UPSERT_FIELDS,
+                )
+            # Un créneau de 3 h commencé il y a plus de 3 h est terminé
+            WeatherForecast.objects.filter(valid_at__lt=fetched_at - timedelta(hours=3)).delete()
+        
+        invalidate('forecast')
+        return objects
+    
+    def update_forecasts_for_all_cities(self, priority='scheduled'):
+        """
+        Rafraîchir les prévisions (tous les créneaux) de toutes les villes prioritaires
+        
+        Même parallélisme que la météo actuelle, puis une seule écriture groupée.
+        """
+        updated_cities = []
+        errors = []
+        forecasts = []
+        
+        with quota_priority(priority):
+            results, fetch_errors = self.fetch_weather_concurrently(
+                list(self.priority_cities.keys()),
+                fetch=lambda city_name: self.get_forecast(city_name, limit=None)
+            )
+        
+        for city_name in self.priority_cities.keys():
+            if city_name in fetch_errors:
+                errors.append(fetch_errors[city_name])
+                print(f"❌ {fetch_errors[city_name]}")
+            elif results.get(city_name):
+                forecasts.extend(results[city_name])
+                updated_cities.append(city_name)
+            else:
+                errors.append(f"Aucune prévision pour {city_name}")
+        
+        try:
+            saved = self.save_forecast_batch(forecasts)
+        except Exception as e:
+            error_msg = f"Erreur enregistrement prévisions: {str(e)}"
+            errors.append(error_msg)
+            print(f"❌ {error_msg}")
+            saved = []
+            updated_cities = []
+        
+        for city_name in updated_cities:
+            print(f"✅ Prévisions mises à jour pour {city_name}")
+        
+        return {
+            'updated_cities': updated_cities,
+            'errors': errors,
+            'total_updated': len(updated_cities),
+            'total_slots': len(saved)
+        }
+    
     def get_cities_in_alert(self, min_alert_level='yellow'):
         """
         Récupérer les villes en état d'alerte
+        
+        Le niveau est recalculé avec les seuils courants (réglages modifiés à
+        chaud), pas lu dans la lecture enregistrée.
         """
         alert_levels_priority = {
             'green': 0,
@@ -225,24 +1034,18 @@ class WeatherService:
         
         cities_in_alert = []
         
-        for city_name in self.priority_cities.keys():
-            try:
-                latest_weather = WeatherData.objects.filter(
-                    city=city_name
-                ).latest('recorded_at')
-                
-                city_priority = alert_levels_priority.get(latest_weather.alert_level, 0)
-                
-                if city_priority >= min_priority:
-                    cities_in_alert.append({
-                        'city': city_name,
-                        'temperature': latest_weather.temp_max,
-                        'alert_level': latest_weather.alert_level,
-                        'last_updated': latest_weather.recorded_at
-                    })
-                    
-            except WeatherData.DoesNotExist:
-                continue
+        latest_readings = list(LatestWeather.objects.filter(city__in=self.priority_cities.keys()))
+        
+        for latest_weather, alert_level in zip(latest_readings, classify_readings(latest_readings)):
+            city_priority = alert_levels_priority.get(alert_level, 0)
+            
+            if city_priority >= min_priority:
+                cities_in_alert.append({
+                    'city': latest_weather.city,
+                    'temperature': latest_weather.temp_max,
+                    'alert_level': alert_level,
+                    'last_updated': latest_weather.recorded_at
+                })
         
         return sorted(cities_in_alert, 
                      key=lambda x: alert_levels_priority.get(x['alert_level'], 0), 
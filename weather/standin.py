@@ -0,0 +1,154 @@
+"""
+Serveur HTTP local imitant OpenWeatherMap, pour les tests et mesures hors ligne
+
+Répond à /weather, /forecast et /group (avec ou sans préfixe /data/2.5) au
+format d'OpenWeatherMap, avec une latence et un taux d'erreurs configurables.
+Les valeurs sont synthétiques : température dérivée de la latitude, plus un
+bruit aléatoire. Démarrage : `python manage.py owm_standin`, puis
+OPENWEATHER_BASE_URL=http://127.0.0.1:8081/data/2.5.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Coordonnées attribuées aux identifiants inconnus de /group (centre du Sénégal)
+DEFAULT_COORDS = (14.5, -14.5)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        server.count(endpoint)
+        server.simulate_latency()
+
+        if server.should_fail():
+            return self._send(503, {'cod': 503, 'message': 'stand-in: erreur simulée'})
+        if not query.get('appid'):
+            return self._send(401, {'cod': 401, 'message': 'Invalid API key'})
+
+        try:
+            if endpoint == 'weather':
+                lat, lon = float(query['lat']), float(query['lon'])
+                return self._send(200, server.current_payload(lat, lon))
+            if endpoint == 'forecast':
+                lat, lon = float(query['lat']), float(query['lon'])
+                return self._send(200, server.forecast_payload(lat, lon))
+            if endpoint == 'group':
+                ids = [city_id for city_id in query.get('id', '').split(',') if city_id]
+                if not ids or len(ids) > 20:
+                    return self._send(400, {'cod': 400, 'message': 'id: 1 à 20 identifiants'})
+                items = [server.current_payload(*DEFAULT_COORDS, city_id=city_id) for city_id in ids]
+                return self._send(200, {'cnt': len(items), 'list': items})
+        except (KeyError, ValueError):
+            return self._send(400, {'cod': 400, 'message': 'Paramètres invalides'})
+
+        return self._send(404, {'cod': 404, 'message': 'Endpoint inconnu'})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class OpenWeatherMapStandIn(ThreadingHTTPServer):
+    """
+    Serveur imitant OpenWeatherMap
+
+    latency et jitter sont en millisecondes (délai = latency + uniforme(0, jitter)),
+    error_rate est la proportion de réponses 503.
+    """
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, jitter=0, error_rate=0.0, seed=None, verbose=False):
+        super().__init__((host, port), StandInHandler)
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.requests = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/data/2.5"
+
+    def count(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] += 1
+
+    def _uniform(self, low, high):
+        with self._lock:
+            return self._random.uniform(low, high)
+
+    def simulate_latency(self):
+        delay = self.latency + (self._uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def should_fail(self):
+        return self.error_rate > 0 and self._uniform(0, 1) < self.error_rate
+
+    def _temperature(self, lat):
+        # Plus chaud vers le nord (Podor, Matam) que sur la côte sud
+        return 30 + (lat - 12.5) * 2 + self._uniform(-2, 2)
+
+    def current_payload(self, lat, lon, city_id=None, dt=None):
+        temp = self._temperature(lat)
+        payload = {
+            'coord': {'lat': lat, 'lon': lon},
+            'weather': [{'id': 800, 'main': 'Clear', 'description': 'ciel dégagé'}],
+            'main': {
+                'temp': round(temp, 2),
+                'feels_like': round(temp + 1.5, 2),
+                'temp_min': round(temp - 3, 2),
+                'temp_max': round(temp + 3, 2),
+                'humidity': int(self._uniform(15, 80)),
+            },
+            'dt': int(dt or time.time()),
+            'name': f"Stand-in {lat:.2f},{lon:.2f}",
+            'cod': 200,
+        }
+        if city_id is not None:
+            payload['id'] = int(city_id) if city_id.isdigit() else city_id
+            payload['name'] = f"Stand-in {city_id}"
+        return payload
+
+    def forecast_payload(self, lat, lon):
+        start = int(time.time()) // 10800 * 10800 + 10800  # Prochain créneau de 3 h
+        slots = [self.current_payload(lat, lon, dt=start + i * 10800) for i in range(40)]
+        return {
+            'cod': '200',
+            'cnt': len(slots),
+            'list': slots,
+            'city': {'name': f"Stand-in {lat:.2f},{lon:.2f}", 'coord': {'lat': lat, 'lon': lon}},
+        }
+
+    def start(self):
+        """Servir dans un thread d'arrière-plan (tests, mesures)"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True, name='owm-standin')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
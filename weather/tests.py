@@ -1,3 +1,631 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import requests
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core.cache import invalidate
+from core.models import AppSettings, SenegalCity
+from core.quota import QuotaExceeded
+from core.registry import registry
+from .models import LatestWeather, WeatherData, WeatherDaily, WeatherHourly
+from .rollups import rebuild_rollups, refresh_rollups
+from .services import (
+    CircuitBreaker, GeoCellCache, OpenWeatherMapProvider, WeatherService, build_http_session,
+    weather_service
+)
 
-# Create your tests here.
+
+class CityWeatherQueryCountTests(TestCase):
+    """Le nombre de requêtes des listes de villes ne dépend pas du nombre de villes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        # Registre en mémoire : ne pas garder les réglages d'un test annulé
+        self.addCleanup(registry.invalidate)
+
+    def _create_cities(self, start, count):
+        for i in range(start, start + count):
+            name = f"Ville {i}"
+            SenegalCity.objects.create(
+                name=name, region='Test', latitude=14.0 + i / 100,
+                longitude=-16.0, is_priority=True
+            )
+            LatestWeather.objects.create(
+                city=name, latitude=14.0, longitude=-16.0, temperature=38.0,
+                temp_max=41.0, temp_min=30.0, feels_like=40.0, humidity=30,
+                alert_level='orange', recorded_at=timezone.now()
+            )
+
+    def _warm_up(self, url):
+        # Index des villes et registre des réglages : chargés une fois par processus
+        self.client.get(url)
+        cache.clear()
+
+    def _assert_constant_queries(self, url, max_queries=3):
+        self._create_cities(0, 3)
+        self._warm_up(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        query_count = len(queries)  # Le journal des requêtes est vidé à chaque requête HTTP
+        self.assertLessEqual(query_count, max_queries)
+
+        self._create_cities(3, 10)
+        self._warm_up(url)
+        with self.assertNumQueries(query_count):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_current_weather_constant_queries(self):
+        response = self._assert_constant_queries('/api/weather/current/')
+        cities = response.data['cities']
+        self.assertEqual(len(cities), 13)
+        self.assertEqual(cities[0]['current_weather']['alert_level'], 'orange')
+
+    def test_cities_list_constant_queries(self):
+        # Jeton de version : météo actuelle, puis villes
+        response = self._assert_constant_queries('/api/weather/cities/?priority=true', max_queries=4)
+        self.assertEqual(len(response.data), 13)
+        self.assertIsNotNone(response.data[0]['current_weather'])
+
+    def test_city_without_weather(self):
+        SenegalCity.objects.create(name='Podor', region='Saint-Louis', latitude=16.65, longitude=-14.97)
+        response = self.client.get('/api/weather/cities/')
+        self.assertIsNone(response.data[0]['current_weather'])
+
+    def test_etag_changes_after_invalidate(self):
+        self._create_cities(0, 2)
+        response = self.client.get('/api/weather/current/')
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/weather/current/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        invalidate('weather')
+        response = self.client.get('/api/weather/current/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_threshold_change_reaches_revalidating_clients(self):
+        self._create_cities(0, 1)
+        response = self.client.get('/api/weather/current/')
+        self.assertEqual(response.data['cities'][0]['current_weather']['alert_level'], 'orange')
+
+        # temp_max 41 °C : jaune avec un seuil orange relevé à 42 °C
+        AppSettings.objects.create(key='weather.alert.orange', value='42')
+        response = self.client.get('/api/weather/current/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['cities'][0]['current_weather']['alert_level'], 'yellow')
+
+
+class CachedViewVersionTests(TestCase):
+    """
+    Réponses en cache à jour sans invalidate() : une ingestion faite dans un
+    autre processus (cron) n'invalide pas le cache mémoire des workers web
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        # Registre en mémoire : ne pas garder les réglages d'un test annulé
+        self.addCleanup(registry.invalidate)
+        SenegalCity.objects.create(name='Matam', region='Matam', latitude=15.65, longitude=-13.25)
+
+    def _daily(self, city, temp_max):
+        now = timezone.now()
+        return WeatherDaily(
+            city=city, day=timezone.localdate(), samples=1,
+            temperature_min=temp_max, temperature_max=temp_max, temperature_sum=temp_max,
+            feels_like_min=temp_max, feels_like_max=temp_max, feels_like_sum=temp_max,
+            humidity_min=20, humidity_max=20, humidity_sum=20, temp_max=temp_max,
+            alert_level='green', first_recorded_at=now, last_recorded_at=now,
+        )
+
+    def test_stats_follow_new_rollups(self):
+        # bulk_create : pas de signal, donc pas d'invalidation
+        WeatherDaily.objects.bulk_create([self._daily('Matam', 38.0)])
+        response = self.client.get('/api/weather/statistics/')
+        self.assertEqual(response.data['total_cities'], 1)
+
+        WeatherDaily.objects.bulk_create([self._daily('Podor', 44.0)])
+        response = self.client.get('/api/weather/statistics/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_cities'], 2)
+        self.assertEqual(response.data['hottest_city'], 'Podor')
+
+    def test_stats_follow_alert_thresholds(self):
+        # Agrégat enregistré vert : le niveau est recalculé à la lecture
+        WeatherDaily.objects.bulk_create([self._daily('Matam', 41.0)])
+        response = self.client.get('/api/weather/statistics/')
+        self.assertEqual(response.data['cities_in_alert'], 1)
+
+        AppSettings.objects.create(key='weather.alert.yellow', value='42')
+        response = self.client.get('/api/weather/statistics/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['cities_in_alert'], 0)
+
+        # Réglage modifié par un autre processus : ni signal ni invalidate(),
+        # seulement le rechargement du registre
+        AppSettings.objects.bulk_create([AppSettings(key='weather.alert.yellow@city:Matam', value='40')])
+        registry.invalidate()
+        self.assertEqual(self.client.get('/api/weather/statistics/').data['cities_in_alert'], 1)
+
+    def test_cities_in_alert_follow_alert_thresholds(self):
+        LatestWeather.objects.create(
+            city='Matam', latitude=15.65, longitude=-13.25, temperature=40.0, temp_max=41.0,
+            temp_min=30.0, feels_like=42.0, humidity=20, alert_level='green', recorded_at=timezone.now()
+        )
+        self.assertEqual(
+            [(city['city'], city['alert_level']) for city in weather_service.get_cities_in_alert()],
+            [('Matam', 'orange')]
+        )
+        AppSettings.objects.create(key='weather.alert.orange', value='42')
+        self.assertEqual(weather_service.get_cities_in_alert()[0]['alert_level'], 'yellow')
+        self.assertEqual(weather_service.get_cities_in_alert('orange'), [])
+
+    def test_cities_list_follows_new_cities(self):
+        self.assertEqual(len(self.client.get('/api/weather/cities/').data), 1)
+        SenegalCity.objects.bulk_create([
+            SenegalCity(name='Podor', region='Saint-Louis', latitude=16.65, longitude=-14.97)
+        ])
+        self.assertEqual(len(self.client.get('/api/weather/cities/').data), 2)
+
+
+class SaveWeatherBatchTests(TestCase):
+    """Un cycle enregistré en une écriture groupée : une ligne par observation"""
+
+    def setUp(self):
+        self.service = WeatherService()
+        self.observed_at = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+
+    def _reading(self, city, minutes=0, temp_max=38.0):
+        return {
+            'city': city, 'latitude': 15.65, 'longitude': -13.25, 'temperature': temp_max - 2,
+            'temp_max': temp_max, 'temp_min': 28.0, 'feels_like': temp_max, 'humidity': 20,
+            'description': 'ciel dégagé', 'alert_level': 'yellow', 'source': 'openweathermap',
+            'recorded_at': self.observed_at + timedelta(minutes=minutes),
+        }
+
+    def test_one_row_per_observation(self):
+        self.service.save_weather_batch([self._reading('Matam'), self._reading('Podor')])
+        # Nouvelle observation le même jour, et la même observation renvoyée corrigée
+        self.service.save_weather_batch([
+            self._reading('Matam', minutes=30, temp_max=41.0),
+            self._reading('Podor', temp_max=39.0),
+            self._reading('Podor', temp_max=40.0),
+        ])
+
+        rows = list(WeatherData.objects.order_by('city', 'recorded_at').values_list('city', 'temp_max'))
+        self.assertEqual(rows, [('Matam', 38.0), ('Matam', 41.0), ('Podor', 40.0)])
+        latest = dict(LatestWeather.objects.values_list('city', 'temp_max'))
+        self.assertEqual(latest, {'Matam': 41.0, 'Podor': 40.0})
+
+    def test_older_reading_keeps_latest_snapshot(self):
+        self.service.save_weather_batch([self._reading('Matam', minutes=30, temp_max=41.0)])
+        self.service.save_weather_batch([self._reading('Matam', temp_max=36.0)])
+        self.assertEqual(WeatherData.objects.count(), 2)
+        self.assertEqual(LatestWeather.objects.get(city='Matam').temp_max, 41.0)
+
+    def test_query_count_independent_of_city_count(self):
+        counts = []
+        for cities in (2, 8):
+            readings = [self._reading(f"Ville {cities}-{i}") for i in range(cities)]
+            with CaptureQueriesContext(connection) as queries:
+                self.service.save_weather_batch(readings)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(WeatherData.objects.count(), 10)
+
+
+class WeatherRollupTests(TestCase):
+    """Agrégats horaires recalculés à l'ingestion"""
+
+    def _reading(self, recorded_at, temperature):
+        return WeatherData.objects.create(
+            city='Matam', latitude=15.65, longitude=-13.25, temperature=temperature,
+            temp_max=temperature, temp_min=temperature, feels_like=temperature, humidity=20,
+            alert_level='green', recorded_at=recorded_at
+        )
+
+    def test_late_reading_keeps_whole_next_hour(self):
+        hour = timezone.localtime().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+        refresh_rollups([
+            self._reading(hour + timedelta(hours=1, minutes=10), 36.0),
+            self._reading(hour + timedelta(hours=1, minutes=40), 38.0),
+        ])
+
+        # Lecture arrivée en retard, une demi-heure avant l'heure déjà agrégée
+        refresh_rollups([self._reading(hour + timedelta(minutes=30), 30.0)])
+
+        rollups = {row.hour: row for row in WeatherHourly.objects.filter(city='Matam')}
+        self.assertEqual(rollups[hour].samples, 1)
+        self.assertEqual(rollups[hour + timedelta(hours=1)].samples, 2)
+        self.assertEqual(rollups[hour + timedelta(hours=1)].temperature_max, 38.0)
+
+
+class GeoCellCacheTests(SimpleTestCase):
+    """Cache par cellule de coordonnées : expiration et éviction LRU"""
+
+    def setUp(self):
+        self.clock = 1000.0
+        patcher = mock.patch('weather.services.time.monotonic', side_effect=lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = GeoCellCache(precision=2, ttl=60, max_entries=2)
+
+    def test_neighbours_share_a_cell(self):
+        fetch = mock.Mock(return_value={'temperature': 39.0})
+        self.assertEqual(self.cache.get_or_fetch(14.6931, -17.4441, fetch), {'temperature': 39.0})
+        self.assertEqual(self.cache.get_or_fetch(14.6949, -17.4412, fetch), {'temperature': 39.0})
+        fetch.assert_called_once()
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_entries_expire_after_ttl(self):
+        self.cache.set(14.69, -17.44, {'temperature': 39.0})
+        self.clock += 59
+        self.assertIsNotNone(self.cache.get(14.69, -17.44))
+        self.clock += 2
+        self.assertIsNone(self.cache.get(14.69, -17.44))
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.set(14.69, -17.44, {'city': 'Dakar'})
+        self.cache.set(15.65, -13.25, {'city': 'Matam'})
+        # Dakar relue : Matam devient la moins récemment utilisée
+        self.cache.get(14.69, -17.44)
+        self.cache.set(16.65, -14.97, {'city': 'Podor'})
+
+        self.assertIsNone(self.cache.get(15.65, -13.25))
+        self.assertEqual(self.cache.get(14.69, -17.44), {'city': 'Dakar'})
+        self.assertEqual(self.cache.get(16.65, -14.97), {'city': 'Podor'})
+        self.assertEqual(self.cache.stats()['entries'], 2)
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_failed_fetch_is_not_cached(self):
+        fetch = mock.Mock(return_value=None)
+        self.assertIsNone(self.cache.get_or_fetch(14.69, -17.44, fetch))
+        self.assertIsNone(self.cache.get_or_fetch(14.69, -17.44, fetch))
+        self.assertEqual(fetch.call_count, 2)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """Une sonde en échec rouvre le circuit pour reset_timeout secondes"""
+
+    def setUp(self):
+        self.clock = 1000.0
+        patcher = mock.patch('weather.services.time.monotonic', side_effect=lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        self.breaker.record_failure()
+        self.clock += 31
+
+    def test_failed_probe_restarts_open_interval(self):
+        self.assertTrue(self.breaker.start_probe())
+        with self.breaker.probing():
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.retry_after(), 30)
+        self.assertFalse(self.breaker.start_probe())
+
+    def test_probe_aborted_before_call_restarts_open_interval(self):
+        self.assertTrue(self.breaker.start_probe())
+        with self.assertRaises(RuntimeError):
+            with self.breaker.probing():
+                raise RuntimeError('quota épuisé')
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.retry_after(), 30)
+        self.assertFalse(self.breaker.start_probe())
+
+        self.clock += 30
+        self.assertTrue(self.breaker.start_probe())
+
+
+class ProviderRetryTests(SimpleTestCase):
+    """Chaque nouvelle tentative sur 429/5xx consomme un jeton du limiteur"""
+
+    def setUp(self):
+        self.limiter = mock.Mock()
+        self.provider = OpenWeatherMapProvider(
+            'https://owm.test', api_key='cle', limiter=self.limiter, retries=2, backoff_factor=0
+        )
+        patcher = mock.patch('weather.services.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def response(self, status_code, payload=None, headers=None):
+        response = mock.Mock(status_code=status_code, headers=headers or {})
+        response.json.return_value = payload or {}
+        response.raise_for_status.side_effect = (
+            requests.HTTPError(str(status_code)) if status_code >= 400 else None
+        )
+        return response
+
+    def test_retry_after_429_takes_a_token_per_attempt(self):
+        session = mock.Mock()
+        session.get.side_effect = [
+            self.response(429, headers={'Retry-After': '2'}),
+            self.response(200, {'name': 'Dakar'}),
+        ]
+        self.assertEqual(self.provider.current(session, {'q': 'Dakar'}, 5), {'name': 'Dakar'})
+        self.assertEqual(session.get.call_count, 2)
+        self.assertEqual(self.limiter.acquire.call_count, 2)
+        self.sleep.assert_called_once_with(2.0)
+
+    def test_retries_exhausted(self):
+        session = mock.Mock()
+        session.get.return_value = self.response(503)
+        with self.assertRaises(requests.HTTPError):
+            self.provider.current(session, {'q': 'Dakar'}, 5)
+        self.assertEqual(session.get.call_count, 3)
+        self.assertEqual(self.limiter.acquire.call_count, 3)
+        # Un seul échec enregistré par appel, après la dernière tentative
+        self.assertEqual(self.provider.breaker.failures, 1)
+
+    def test_quota_exhausted_between_attempts(self):
+        session = mock.Mock()
+        session.get.return_value = self.response(500)
+        self.limiter.acquire.side_effect = [None, QuotaExceeded('openweathermap', 'test', 30)]
+        with self.assertRaises(QuotaExceeded):
+            self.provider.current(session, {'q': 'Dakar'}, 5)
+        self.assertEqual(session.get.call_count, 1)
+
+
+class ConcurrentFetchTests(SimpleTestCase):
+    """Rafraîchissement parallèle : délai par ville, délai global et repli ville par ville"""
+
+    def setUp(self):
+        self.service = WeatherService()
+        self.service.city_timeout = 0.2
+        self.service.batch_timeout = 2
+        # Libère les appels « lents » restés en cours à la fin du test
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def fetch(self, city_name):
+        if city_name.startswith('Lente'):
+            self.release.wait(5)
+        if city_name == 'Cassée':
+            raise ValueError('réponse invalide')
+        return {'city': city_name}
+
+    def test_slow_city_does_not_hold_up_others(self):
+        started = time.monotonic()
+        results, errors = self.service.fetch_weather_concurrently(
+            ['Dakar', 'Lente', 'Matam', 'Cassée'], fetch=self.fetch
+        )
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(sorted(results), ['Dakar', 'Matam'])
+        self.assertEqual(sorted(errors), ['Cassée', 'Lente'])
+        self.assertIn('Délai dépassé', errors['Lente'])
+        self.assertIn('réponse invalide', errors['Cassée'])
+
+    def test_batch_deadline(self):
+        # Un seul thread : la seconde ville lente ne démarre jamais avant le délai global
+        self.service.max_workers = 1
+        self.service.city_timeout = 5
+        self.service.batch_timeout = 0.2
+        started = time.monotonic()
+        results, errors = self.service.fetch_weather_concurrently(['Lente 1', 'Lente 2'], fetch=self.fetch)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(results, {})
+        self.assertEqual(
+            {city: message.split(' pour ')[0] for city, message in errors.items()},
+            {'Lente 1': 'Délai global dépassé', 'Lente 2': 'Délai global dépassé'}
+        )
+
+    def test_group_failure_falls_back_to_single_calls(self):
+        self.service.provider.city_ids = {'Dakar': '1', 'Matam': '2', 'Podor': '3'}
+        self.service.provider.max_group_size = 2
+
+        def fetch_group(city_names):
+            if 'Podor' in city_names:
+                raise requests.ConnectionError('lot en échec')
+            # Matam absente de la réponse du lot
+            return {'Dakar': {'city': 'Dakar', 'via': 'group'}}
+
+        single = mock.Mock(side_effect=lambda city_name, allow_stale: {'city': city_name, 'via': 'single'})
+        with mock.patch.object(self.service, '_fetch_group', side_effect=fetch_group), \
+                mock.patch.object(self.service, 'get_current_weather', single):
+            results, errors = self.service.fetch_current_batch(['Dakar', 'Matam', 'Podor', 'Kaffrine'])
+
+        self.assertEqual(errors, {})
+        self.assertEqual(
+            {city: data['via'] for city, data in results.items()},
+            {'Dakar': 'group', 'Matam': 'single', 'Podor': 'single', 'Kaffrine': 'single'}
+        )
+        self.assertEqual(
+            sorted(call.args[0] for call in single.call_args_list), ['Kaffrine', 'Matam', 'Podor']
+        )
+        # Jamais une ancienne lecture pour un rafraîchissement
+        self.assertTrue(all(call.kwargs == {'allow_stale': False} for call in single.call_args_list))
+
+
+class HTTPSessionTests(SimpleTestCase):
+    """Session HTTP persistante : connexions réutilisées, aucune nouvelle tentative cachée"""
+
+    def setUp(self):
+        self.hits = []
+        self.statuses = []
+        test = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+
+            def do_GET(self):
+                test.hits.append(self.path)
+                status_code = test.statuses.pop(0) if test.statuses else 200
+                body = json.dumps({'name': 'Dakar'}).encode()
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def test_session_configuration(self):
+        session = build_http_session(pool_size=5)
+        adapter = session.get_adapter('https://api.openweathermap.org')
+        self.assertIs(adapter, session.get_adapter('http://localhost'))
+        self.assertEqual(adapter._pool_maxsize, 5)
+        self.assertEqual(adapter.max_retries.total, 0)
+        self.assertEqual(session.headers['Connection'], 'keep-alive')
+
+    def test_connections_are_reused(self):
+        service = WeatherService()
+        service.http_pool_size = 2
+        for _ in range(3):
+            service.session.get(f"{self.base_url}/weather", timeout=5).raise_for_status()
+        self.assertEqual(
+            service.get_http_stats(), {'requests': 3, 'connections_opened': 1, 'connections_reused': 2}
+        )
+        self.assertIs(service.session, service._session)
+
+    def test_error_status_is_not_retried_by_the_session(self):
+        self.statuses = [503]
+        response = build_http_session().get(f"{self.base_url}/weather", timeout=5)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.hits), 1)
+
+    def test_provider_retry_over_the_session(self):
+        self.statuses = [503, 429]
+        limiter = mock.Mock()
+        provider = OpenWeatherMapProvider(self.base_url, api_key='cle', limiter=limiter, backoff_factor=0)
+        data = provider.current(build_http_session(), {'q': 'Dakar'}, 5)
+        self.assertEqual(data, {'name': 'Dakar'})
+        self.assertEqual(len(self.hits), 3)
+        self.assertEqual(limiter.acquire.call_count, 3)
+
+
+class WeatherDataKeysetPaginationTests(TestCase):
+    """Pagination par curseur : chaque ligne une seule fois, une requête par page"""
+
+    def setUp(self):
+        self.client = APIClient()
+        recorded_at = timezone.now().replace(microsecond=0)
+        # Lectures de même instant pour plusieurs villes : id départage
+        WeatherData.objects.bulk_create([
+            WeatherData(
+                city=f"Ville {i % 4}", latitude=14.0, longitude=-16.0, temperature=30.0,
+                temp_max=32.0, temp_min=28.0, feels_like=31.0, humidity=40,
+                alert_level='green', recorded_at=recorded_at - timedelta(hours=i // 4)
+            )
+            for i in range(25)
+        ])
+
+    def test_pages_cover_every_row_once(self):
+        url = '/api/weather/data/?page_size=7'
+        ids = []
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(set(ids), set(WeatherData.objects.values_list('id', flat=True)))
+
+    def test_stream_returns_all_rows(self):
+        response = self.client.get('/api/weather/data/?stream=true')
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['data_points'], 25)
+        self.assertEqual(len({row['id'] for row in data['results']}), 25)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/weather/data/?cursor=invalide')
+        self.assertEqual(response.status_code, 404)
+
+    def test_history_defaults_to_raw_readings(self):
+        response = self.client.get('/api/weather/city/Ville 0/history/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['resolution'], 'raw')
+        self.assertEqual(len(response.data['history']), 7)
+        self.assertIn('recorded_at', response.data['history'][0])
+
+        rebuild_rollups()
+        response = self.client.get('/api/weather/city/Ville 0/history/?days=30&resolution=auto')
+        self.assertEqual(response.data['resolution'], 'daily')
+
+
+class WeatherExportTests(TestCase):
+    """Export en flux (CSV, Parquet, Arrow) avec filtres, réservé aux administrateurs"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', is_staff=True))
+        recorded_at = timezone.now().replace(microsecond=0)
+        self.readings = WeatherData.objects.bulk_create([
+            WeatherData(
+                city=city, latitude=14.0, longitude=-16.0, temperature=30.0,
+                temp_max=temp_max, temp_min=28.0, feels_like=31.0, humidity=40,
+                alert_level=level, recorded_at=recorded_at - timedelta(days=days)
+            )
+            for city, temp_max, level, days in [
+                ('Dakar', 32.0, 'green', 0), ('Dakar', 41.0, 'orange', 1),
+                ('Matam', 46.0, 'red', 0), ('Dakar', 36.0, 'yellow', 10),
+            ]
+        ])
+
+    def _content(self, export_format, query=''):
+        response = self.client.get(f'/api/weather/export/{export_format}/{query}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def _export(self, query=''):
+        return list(csv.DictReader(io.StringIO(self._content('csv', query).decode())))
+
+    def _assert_round_trip(self, table):
+        self.assertEqual(table.num_rows, len(self.readings))
+        expected = sorted((reading.city, reading.recorded_at) for reading in self.readings)
+        exported = sorted(zip(table.column('city').to_pylist(), table.column('recorded_at').to_pylist()))
+        self.assertEqual(exported, expected)
+
+    def test_export_filters(self):
+        self.assertEqual(len(self._export()), 4)
+        start = (timezone.localdate() - timedelta(days=2)).isoformat()
+        rows = self._export(f'?city=dakar&start={start}')
+        self.assertEqual([row['alert_level'] for row in rows], ['orange', 'green'])
+        self.assertEqual(len(self._export('?alert_level=red')), 1)
+
+    def test_parquet_round_trip(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow n'est pas installé")
+        self._assert_round_trip(pq.read_table(io.BytesIO(self._content('parquet'))))
+
+    def test_arrow_round_trip(self):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            self.skipTest("pyarrow n'est pas installé")
+        self._assert_round_trip(pa.ipc.open_stream(self._content('arrow')).read_all())
+
+    def test_unknown_format(self):
+        response = self.client.get('/api/weather/export/xml/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_requires_admin(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/weather/export/csv/').status_code, 401)
+        self.client.force_authenticate(User.objects.create_user('citoyen'))
+        self.assertEqual(self.client.get('/api/weather/export/csv/').status_code, 403)
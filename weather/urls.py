@@ -9,12 +9,17 @@ urlpatterns = [
     path('city/<str:city_name>/', views.weather_by_city, name='weather_by_city'),
     path('city/<str:city_name>/history/', views.weather_history, name='weather_history'),
     
+    # Prévisions (lues en base, rafraîchies par update_forecasts)
+    path('forecast/', views.forecast_list, name='forecast_list'),
+    path('forecast/<str:city_name>/', views.forecast_by_city, name='forecast_by_city'),
+    
     # Alertes météo
     path('alerts/', views.weather_alerts, name='weather_alerts'),
     path('statistics/', views.weather_stats, name='weather_stats'),
     
     # Données météo
     path('data/', views.WeatherDataListView.as_view(), name='weather_data_list'),
+    path('export/<str:export_format>/', views.export_weather_data, name='weather_export'),
     
     # Villes
     path('cities/', views.cities_list, name='cities_list'),
@@ -22,4 +27,5 @@ urlpatterns = [
     # Mise à jour et test
     path('update/', views.update_weather_data, name='update_weather_data'),
     path('test/', views.test_weather_api, name='test_weather_api'),
+    path('quota/', views.weather_api_quota, name='weather_api_quota'),
 ]
\ No newline at end of file
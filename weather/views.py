@@ -2,22 +2,44 @@ from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.utils import timezone
-from django.db.models import Q, Max
+from django.db.models import Q, Max, Count
+import itertools
 from datetime import datetime, timedelta
-from .models import WeatherData
+from .models import WeatherData, LatestWeather, WeatherForecast, WeatherHourly, WeatherDaily
 from core.models import SenegalCity
+from core.cache import cached_response, version_token
+from core.quota import QuotaExceeded, quota_priority
+from core.registry import registry
+from core.export import ExportError, export_response, get_dataset
+from core.retention import RETENTION_POLICIES, read_archive
+from core.pagination import KeysetPagination, stream_keyset, streaming_json_response
 from .serializers import (
     WeatherDataSerializer, CurrentWeatherSerializer, SenegalCitySerializer,
-    WeatherAlertSerializer, WeatherStatsSerializer
+    WeatherAlertSerializer, WeatherStatsSerializer, WeatherForecastSerializer,
+    WeatherRollupSerializer
 )
 from .services import weather_service
+from .classification import classify_readings
+
+def weather_version(request):
+    """
+    Jeton de version des données météo actuelles : une requête d'agrégat sur
+    LatestWeather (une ligne par ville), mise à jour à chaque ingestion, et
+    version des réglages (seuils d'alerte modifiés dans un autre processus)
+    """
+    state = LatestWeather.objects.aggregate(last_update=Max('updated_at'), cities=Count('id'))
+    return version_token(state['last_update'], state['cities'], registry.version)
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@cached_response('weather', version_func=weather_version)
 def current_weather(request):
     """Météo actuelle pour toutes les villes prioritaires"""
-    cities = SenegalCity.objects.filter(is_priority=True)
-    serializer = SenegalCitySerializer(cities, many=True)
+    cities = list(SenegalCity.objects.filter(is_priority=True))
+    serializer = SenegalCitySerializer(
+        cities, many=True,
+        context={'latest_weather': SenegalCitySerializer.latest_weather_map(cities)}
+    )
     
     return Response({
         'cities': serializer.data,
@@ -57,55 +79,30 @@ def weather_by_city(request, city_name):
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@cached_response('weather', version_func=weather_version)
 def weather_alerts(request):
     """Alertes météo basées sur les températures"""
-    # Définir les seuils de température
-    TEMP_THRESHOLDS = {
-        'yellow': 35,  # Très inconfortable
-        'orange': 40,  # Dangereux
-        'red': 45      # Très dangereux
+    alert_messages = {
+        'yellow': 'Vigilance requise - Restez hydraté',
+        'orange': 'Danger élevé - Limitez les sorties',
+        'red': 'Danger extrême - Évitez toute exposition'
     }
     
-    # Récupérer les dernières données météo par ville
-    latest_weather = WeatherData.objects.values('city').annotate(
-        latest_time=Max('recorded_at')
-    )
+    # Dernières données météo par ville, classées en une passe
+    readings = list(LatestWeather.objects.all())
+    levels = classify_readings(readings)
     
     alerts = []
-    for item in latest_weather:
-        try:
-            weather = WeatherData.objects.get(
-                city=item['city'],
-                recorded_at=item['latest_time']
-            )
-            
-            # Déterminer le niveau d'alerte
-            max_temp = weather.temp_max
-            alert_level = 'green'
-            alert_message = 'Conditions normales'
-            
-            if max_temp >= TEMP_THRESHOLDS['red']:
-                alert_level = 'red'
-                alert_message = 'Danger extrême - Évitez toute exposition'
-            elif max_temp >= TEMP_THRESHOLDS['orange']:
-                alert_level = 'orange'
-                alert_message = 'Danger élevé - Limitez les sorties'
-            elif max_temp >= TEMP_THRESHOLDS['yellow']:
-                alert_level = 'yellow'
-                alert_message = 'Vigilance requise - Restez hydraté'
-            
-            if alert_level != 'green':
-                alerts.append({
-                    'city': weather.city,
-                    'current_temp': weather.temperature,
-                    'max_temp': max_temp,
-                    'alert_level': alert_level,
-                    'alert_message': alert_message,
-                    'recommendations': get_weather_recommendations(alert_level)
-                })
-                
-        except WeatherData.DoesNotExist:
-            continue
+    for weather, alert_level in zip(readings, levels):
+        if alert_level != 'green':
+            alerts.append({
+                'city': weather.city,
+                'current_temp': weather.temperature,
+                'max_temp': weather.temp_max,
+                'alert_level': alert_level,
+                'alert_message': alert_messages[alert_level],
+                'recommendations': get_weather_recommendations(alert_level)
+            })
     
     # Trier par niveau de danger (rouge > orange > jaune)
     severity_order = {'red': 3, 'orange': 2, 'yellow': 1}
@@ -117,6 +114,87 @@ def weather_alerts(request):
         'last_updated': timezone.now()
     })
 
+# Historique : durée maximale, et résolution choisie selon la durée (jours) avec ?resolution=auto
+HISTORY_MAX_DAYS = 366
+RAW_HISTORY_MAX_DAYS = 2                 # Lectures brutes
+HOURLY_HISTORY_MAX_DAYS = 14             # Agrégats horaires, journaliers au-delà
+HISTORY_PAGE_SIZE = 500                  # Points par page (un an de journaliers tient en une page)
+HISTORY_MAX_PAGE_SIZE = 5000
+
+FORECAST_MAX_HOURS = 120  # Horizon des prévisions OpenWeatherMap (5 jours)
+
+def _forecast_window(request):
+    """Fenêtre [maintenant, maintenant + hours] demandée (?hours=, 72 par défaut)"""
+    try:
+        hours = int(request.query_params.get('hours', 72))
+    except (TypeError, ValueError):
+        hours = 72
+    hours = max(1, min(hours, FORECAST_MAX_HOURS))
+    now = timezone.now()
+    # Le créneau de 3 h en cours reste visible
+    return hours, now - timedelta(hours=3), now + timedelta(hours=hours)
+
+def _forecast_payload(city, slots):
+    """Créneaux d'une ville et niveau d'alerte maximal sur la fenêtre"""
+    severity_order = {'green': 0, 'yellow': 1, 'orange': 2, 'red': 3}
+    max_alert_level = max(
+        (slot.alert_level for slot in slots),
+        key=lambda level: severity_order.get(level, 0),
+        default='green'
+    )
+    return {
+        'city': city,
+        'max_alert_level': max_alert_level,
+        'forecasts': WeatherForecastSerializer(slots, many=True).data
+    }
+
+def forecast_version(request):
+    """
+    Jeton de version des prévisions : dernier rafraîchissement et nombre de
+    créneaux, plus l'heure courante pour que la fenêtre glissante avance
+    """
+    state = WeatherForecast.objects.aggregate(last_fetch=Max('fetched_at'), slots=Count('id'))
+    now = timezone.now()
+    return version_token(state['last_fetch'], state['slots'], now.strftime('%Y%m%d%H'))
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@cached_response('forecast', version_func=forecast_version)
+def forecast_list(request):
+    """Prévisions stockées pour toutes les villes (sans appel à l'API externe)"""
+    hours, start, end = _forecast_window(request)
+    slots = WeatherForecast.objects.filter(valid_at__gte=start, valid_at__lte=end).order_by('city', 'valid_at')
+    
+    by_city = {}
+    for slot in slots:
+        by_city.setdefault(slot.city, []).append(slot)
+    
+    return Response({
+        'hours': hours,
+        'cities': [_forecast_payload(city, city_slots) for city, city_slots in by_city.items()],
+        'last_updated': max((slot.fetched_at for slots in by_city.values() for slot in slots), default=None)
+    })
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@cached_response('forecast', version_func=forecast_version)
+def forecast_by_city(request, city_name):
+    """Prévisions stockées pour une ville"""
+    hours, start, end = _forecast_window(request)
+    slots = list(WeatherForecast.objects.filter(
+        city__iexact=city_name, valid_at__gte=start, valid_at__lte=end
+    ).order_by('valid_at'))
+    
+    if not slots:
+        return Response({
+            'error': f'Aucune prévision trouvée pour {city_name}'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    payload = _forecast_payload(slots[0].city, slots)
+    payload['hours'] = hours
+    payload['last_updated'] = max(slot.fetched_at for slot in slots)
+    return Response(payload)
+
 def get_weather_recommendations(alert_level):
     """Récupérer les recommandations selon le niveau d'alerte"""
     recommendations = {
@@ -141,42 +219,56 @@ def get_weather_recommendations(alert_level):
     }
     return recommendations.get(alert_level, [])
 
+def stats_version(request):
+    """
+    Jeton des statistiques du jour : agrégat sur les WeatherDaily du jour (une
+    ligne par ville) et version des réglages (seuils d'alerte)
+    """
+    today = timezone.localdate()
+    state = WeatherDaily.objects.filter(day=today).aggregate(
+        last_recorded=Max('last_recorded_at'), last_update=Max('updated_at'), cities=Count('id')
+    )
+    return version_token(today, state['last_recorded'], state['last_update'], state['cities'], registry.version)
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@cached_response('weather', version_func=stats_version)
 def weather_stats(request):
     """Statistiques météorologiques globales"""
-    now = timezone.now()
-    today = now.date()
-    
-    # Données d'aujourd'hui
-    today_data = WeatherData.objects.filter(
-        recorded_at__date=today
-    )
+    # Agrégat du jour : une ligne par ville, tenue à jour par l'ingestion
+    today = list(WeatherDaily.objects.filter(day=timezone.localdate()))
     
-    if not today_data.exists():
+    if not today:
         return Response({
             'error': 'Aucune donnée météo disponible pour aujourd\'hui'
         }, status=status.HTTP_404_NOT_FOUND)
     
     # Trouver la température la plus élevée
-    hottest = today_data.order_by('-temp_max').first()
+    hottest = max(today, key=lambda daily: daily.temp_max)
     
-    # Compter les villes en alerte
-    cities_in_alert = today_data.exclude(alert_level='green').values('city').distinct().count()
+    # Pire niveau de la journée avec les seuils courants : temp_max du jour et
+    # humidité maximale (majorant de l'indice de chaleur, si activé)
+    levels = classify_readings(today, humidity_field='humidity_max')
     
     stats = {
-        'total_cities': today_data.values('city').distinct().count(),
-        'cities_in_alert': cities_in_alert,
-        'highest_temp': hottest.temp_max if hottest else 0,
-        'hottest_city': hottest.city if hottest else '',
-        'last_updated': today_data.latest('recorded_at').recorded_at
+        'total_cities': len(today),
+        'cities_in_alert': sum(1 for level in levels if level != 'green'),
+        'highest_temp': hottest.temp_max,
+        'hottest_city': hottest.city,
+        'last_updated': max(daily.last_recorded_at for daily in today)
     }
     
     serializer = WeatherStatsSerializer(stats)
     return Response(serializer.data)
 
+def cities_version(request):
+    """Jeton de la liste des villes : météo actuelle et villes (ajout, modification, suppression)"""
+    state = SenegalCity.objects.aggregate(last_update=Max('updated_at'), cities=Count('id'))
+    return version_token(weather_version(request), state['last_update'], state['cities'])
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@cached_response('weather', version_func=cities_version)
 def cities_list(request):
     """Liste des villes du Sénégal avec météo"""
     cities = SenegalCity.objects.all().order_by('name')
@@ -191,31 +283,120 @@ def cities_list(request):
     if priority_only == 'true':
         cities = cities.filter(is_priority=True)
     
-    serializer = SenegalCitySerializer(cities, many=True)
+    cities = list(cities)
+    serializer = SenegalCitySerializer(
+        cities, many=True,
+        context={'latest_weather': SenegalCitySerializer.latest_weather_map(cities)}
+    )
     return Response(serializer.data)
 
+def _archived_weather(city_name, start_date, batch_size=2000):
+    """Lectures archivées d'une ville, en lots d'objets WeatherData non enregistrés"""
+    rows = (WeatherData(**row) for row in read_archive(RETENTION_POLICIES['weather'], start_date, city=city_name))
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def weather_history(request, city_name):
-    """Historique météo pour une ville (7 derniers jours)"""
-    days = int(request.query_params.get('days', 7))
-    start_date = timezone.now() - timedelta(days=days)
+    """
+    Historique météo pour une ville (7 derniers jours par défaut, ?days=)
+    
+    Lectures brutes par défaut ; ?resolution=hourly|daily pour les agrégats,
+    ?resolution=auto pour suivre la durée (brutes jusqu'à 2 jours, horaires
+    jusqu'à 14 jours, journalières au-delà).
+    Réponse paginée par curseur (?cursor=, lien next, ?page_size=) ; avec
+    ?stream=true toute la fenêtre est envoyée en flux, lot par lot.
+    ?include_archive=true ajoute en tête les lectures archivées (brutes, en flux).
+    """
+    try:
+        days = int(request.query_params.get('days', 7))
+    except ValueError:
+        return Response({'error': 'Paramètre days invalide'}, status=status.HTTP_400_BAD_REQUEST)
+    days = max(1, min(days, HISTORY_MAX_DAYS))
     
-    history = WeatherData.objects.filter(
-        city__iexact=city_name,
-        recorded_at__gte=start_date
-    ).order_by('recorded_at')
+    resolution = request.query_params.get('resolution')
+    stream = request.query_params.get('stream', '').lower() in ('true', '1')
     
-    if not history.exists():
+    # Lectures archivées (apply_retention) : brutes, lues depuis les fichiers, en flux
+    include_archive = request.query_params.get('include_archive', '').lower() in ('true', '1')
+    if include_archive:
+        if resolution not in (None, 'raw'):
+            return Response({
+                'error': 'include_archive ne porte que sur les lectures brutes'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        resolution = 'raw'
+        stream = True
+    
+    if resolution is None:
+        # Lignes WeatherData, comme avant les agrégats : les agrégats sont sur demande
+        resolution = 'raw'
+    elif resolution == 'auto':
+        if days <= RAW_HISTORY_MAX_DAYS:
+            resolution = 'raw'
+        elif days <= HOURLY_HISTORY_MAX_DAYS:
+            resolution = 'hourly'
+        else:
+            resolution = 'daily'
+    elif resolution not in ('raw', 'hourly', 'daily'):
         return Response({
-            'error': f'Aucun historique trouvé pour {city_name}'
-        }, status=status.HTTP_404_NOT_FOUND)
+            'error': 'Résolution invalide (raw, hourly, daily ou auto)'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    start_date = timezone.now() - timedelta(days=days)
+    
+    if resolution == 'raw':
+        history = WeatherData.objects.filter(
+            city__iexact=city_name,
+            recorded_at__gte=start_date
+        )
+        ordering = ('recorded_at', 'id')
+        serializer_class = WeatherDataSerializer
+    elif resolution == 'hourly':
+        history = WeatherHourly.objects.filter(
+            city__iexact=city_name,
+            hour__gte=start_date.replace(minute=0, second=0, microsecond=0)
+        )
+        ordering = ('hour', 'id')
+        serializer_class = WeatherRollupSerializer
+    else:
+        history = WeatherDaily.objects.filter(
+            city__iexact=city_name,
+            day__gte=timezone.localdate(start_date)
+        )
+        ordering = ('day', 'id')
+        serializer_class = WeatherRollupSerializer
+    
+    not_found = Response({
+        'error': f'Aucun historique trouvé pour {city_name}'
+    }, status=status.HTTP_404_NOT_FOUND)
+    envelope = {'city': city_name, 'period_days': days, 'resolution': resolution}
+    
+    if stream:
+        batches = stream_keyset(history, ordering)
+        if include_archive:
+            # Les mois archivés précèdent toujours les lectures en base
+            batches = itertools.chain(_archived_weather(city_name, start_date), batches)
+        first_batch = next(batches, None)
+        if first_batch is None:
+            return not_found
+        return streaming_json_response(
+            itertools.chain([first_batch], batches), serializer_class, envelope, key='history'
+        )
     
-    serializer = WeatherDataSerializer(history, many=True)
+    paginator = KeysetPagination(ordering, page_size=HISTORY_PAGE_SIZE, max_page_size=HISTORY_MAX_PAGE_SIZE)
+    page = paginator.paginate_queryset(history, request)
+    if not page and 'cursor' not in request.query_params:
+        return not_found
+    
+    serializer = serializer_class(page, many=True)
     return Response({
-        'city': city_name,
-        'period_days': days,
-        'data_points': history.count(),
+        **envelope,
+        'data_points': len(page),
+        'next': paginator.get_next_link(),
         'history': serializer.data
     })
 
@@ -224,7 +405,7 @@ def weather_history(request, city_name):
 def update_weather_data(request):
     """Mettre à jour les données météo pour toutes les villes"""
     try:
-        result = weather_service.update_weather_for_all_cities()
+        result = weather_service.update_weather_for_all_cities(priority='interactive')
         return Response({
             'message': 'Mise à jour météo terminée',
             'updated_cities': result['updated_cities'],
@@ -239,30 +420,78 @@ def update_weather_data(request):
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def test_weather_api(request):
-    """Tester l'API météo pour une ville"""
+    """Tester l'API météo pour une ville ou des coordonnées (?lat=&lon=)"""
     city = request.query_params.get('city', 'Dakar')
+    lat = request.query_params.get('lat')
+    lon = request.query_params.get('lon')
     
     try:
-        weather_data = weather_service.get_current_weather(city)
+        with quota_priority('test'):
+            if lat and lon:
+                city = f"{lat},{lon}"
+                weather_data = weather_service.get_current_weather(lat=float(lat), lon=float(lon))
+            else:
+                weather_data = weather_service.get_current_weather(city, cached=True)
         if weather_data:
             return Response({
                 'success': True,
                 'city': city,
-                'weather': weather_data
+                'weather': weather_data,
+                'geo_cache': weather_service.geo_cache.stats(),
+                'circuit': weather_service.provider.breaker.stats()
             })
         else:
             return Response({
                 'error': f'Impossible de récupérer la météo pour {city}'
             }, status=status.HTTP_404_NOT_FOUND)
+    except ValueError:
+        return Response({
+            'error': 'Coordonnées invalides'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except QuotaExceeded as e:
+        response = Response({
+            'error': str(e),
+            'retry_after': round(e.retry_after)
+        }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = str(max(1, round(e.retry_after)))
+        return response
     except Exception as e:
         return Response({
             'error': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def weather_api_quota(request):
+    """Budget d'appels OpenWeatherMap restant, partagé par tous les processus"""
+    return Response(weather_service.provider.limiter.status())
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def export_weather_data(request, export_format):
+    """
+    Export complet des lectures météo en flux (csv, parquet ou arrow), réservé
+    aux administrateurs : un export parcourt toute la table
+    
+    Filtres : ?city=, ?start= / ?end= (AAAA-MM-JJ ou date-heure ISO),
+    ?alert_level=, ?source=.
+    """
+    try:
+        return export_response(get_dataset('weather'), export_format, request.query_params)
+    except ExportError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 class WeatherDataListView(generics.ListAPIView):
-    """Vue générique pour lister les données météo"""
+    """
+    Vue générique pour lister les données météo (plus récentes d'abord)
+    
+    Paginée par curseur sur (recorded_at, id) : aucune page ne compte la
+    table. ?stream=true envoie toutes les lignes filtrées en flux.
+    """
     serializer_class = WeatherDataSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-recorded_at', '-id')
     
     def get_queryset(self):
         queryset = WeatherData.objects.all()
@@ -274,4 +503,12 @@ class WeatherDataListView(generics.ListAPIView):
         if alert_level:
             queryset = queryset.filter(alert_level=alert_level)
             
-        return queryset.order_by('-recorded_at')
\ No newline at end of file
+        return queryset.order_by(*self.keyset_ordering)
+    
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('stream', '').lower() in ('true', '1'):
+            return streaming_json_response(
+                stream_keyset(self.get_queryset(), self.keyset_ordering),
+                self.get_serializer_class(), context=self.get_serializer_context()
+            )
+        return super().list(request, *args, **kwargs)
\ No newline at end of file